@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booth, Table, TableUsage
+from .models import Booth, Table, TableSession, TableUsage
 
 
 @admin.register(Booth)
@@ -72,3 +72,18 @@ class TableUsageAdmin(admin.ModelAdmin):
     def table_num(self, obj):
         return obj.table.table_num
     table_num.short_description = "테이블 번호"
+
+
+@admin.register(TableSession)
+class TableSessionAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "booth_id",
+        "table",
+        "started_at",
+        "ended_at",
+        "has_ordered",
+        "seat_fee_ordered",
+    )
+    list_filter = ("booth__id",)
+    search_fields = ("id", "table__table_num")
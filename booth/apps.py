@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class BoothConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'booth'
+
+    def ready(self):
+        # Booth / Manager / Table / Menu 변경 시 손님용 부스 컨텍스트 무효화
+        from booth.utils.booth_context import connect_signals
+        connect_signals()
+        # 이용 제한 시간 변경 시 테이블 타이머 재예약
+        from booth.utils import table_timer
+        table_timer.connect_signals()
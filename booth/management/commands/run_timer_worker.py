@@ -0,0 +1,40 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from booth.utils.table_timer import ensure_table_timers
+from cart.utils.cart_sweeper import ensure_cart_sweeper
+
+
+class Command(BaseCommand):
+    help = "전용 워커: 테이블 타이머 휠 (만료 임박 / 만료 push) + 버려진 장바구니 주기 정리, 웹 프로세스와 별도로 실행"
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self):
+        tasks = []
+        timers = await ensure_table_timers()
+        if timers is None:
+            self.stdout.write(self.style.WARNING("TABLE_TIMER_ENABLED=False - 타이머 휠을 시작하지 않음"))
+        else:
+            tasks.extend(timers.tasks)
+            self.stdout.write(self.style.SUCCESS(f"타이머 휠 시작 (예약 {len(timers.wheel)}개)"))
+
+        sweeper = ensure_cart_sweeper()
+        if sweeper is None:
+            self.stdout.write(self.style.WARNING("CART_SWEEP_INTERVAL_SECONDS=0 - 장바구니 주기 정리를 시작하지 않음"))
+        else:
+            tasks.append(sweeper)
+            self.stdout.write(self.style.SUCCESS("장바구니 주기 정리 시작"))
+
+        if not tasks:
+            return
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booth', '0008_booth_booth_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(fields=['booth', 'table_num'], name='table_booth_num_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_sessions(apps, schema_editor):
+    # 지난 세션은 TableUsage 로그로, 현재 활성 테이블은 activated_at 으로 세션 생성
+    Table = apps.get_model("booth", "Table")
+    TableSession = apps.get_model("booth", "TableSession")
+    TableUsage = apps.get_model("booth", "TableUsage")
+
+    TableSession.objects.bulk_create(
+        (
+            TableSession(table_id=u.table_id, booth_id=u.booth_id, started_at=u.started_at, ended_at=u.ended_at)
+            for u in TableUsage.objects.order_by("id").iterator()
+        ),
+        batch_size=1000,
+    )
+
+    active = list(Table.objects.filter(activated_at__isnull=False))
+    sessions = TableSession.objects.bulk_create(
+        TableSession(table_id=t.id, booth_id=t.booth_id, started_at=t.activated_at) for t in active
+    )
+    for table, session in zip(active, sessions):
+        table.current_session_id = session.id
+    Table.objects.bulk_update(active, ["current_session"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booth', '0009_table_table_booth_num_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('has_ordered', models.BooleanField(default=False)),
+                ('seat_fee_ordered', models.BooleanField(default=False)),
+                ('booth', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booth.booth')),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='booth.table')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='table',
+            name='current_session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booth.tablesession'),
+        ),
+        migrations.AddIndex(
+            model_name='tablesession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['booth'], name='tablesession_open_booth_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tablesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('ended_at__isnull', True)), fields=('table',), name='tablesession_one_open_per_table'),
+        ),
+        migrations.RunPython(backfill_sessions, migrations.RunPython.noop),
+    ]
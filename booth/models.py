@@ -44,7 +44,17 @@ class Table(models.Model):
     status = models.CharField(max_length=16, default='out')  # 'inactive', 'activate' 등
     activated_at = models.DateTimeField(null=True, blank=True)
     deactivated_at = models.DateTimeField(null=True, blank=True)  # 테이블 초기화 시점
-    
+    # 진행 중인 이용 세션 (입장 ~ 초기화, booth/utils/table_session.py)
+    current_session = models.ForeignKey(
+        "TableSession", null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+
+    class Meta:
+        indexes = [
+            # (부스, table_num) → 테이블
+            models.Index(fields=["booth", "table_num"], name="table_booth_num_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.booth.booth_name}] - Table #{self.table_num}"
     
@@ -55,18 +65,58 @@ class Table(models.Model):
         if self.activated_at:
             ended = now()
             usage_minutes = int((ended - self.activated_at).total_seconds() // 60)
-            TableUsage.objects.create(
+            usage = TableUsage.objects.create(
                 table=self,
                 booth=self.booth,
                 started_at=self.activated_at,
                 ended_at=ended,
                 usage_minutes=usage_minutes,
             )
-            # 상태 초기화
+            # lazy import → 순환 참조 방지
+            from statistic.counters import record_table_usage
+            record_table_usage(usage)
+            # 상태 초기화 + 세션 종료
+            from booth.utils.table_session import end_session
             self.status = "out"
             self.activated_at = None
             self.deactivated_at = ended
-            self.save(update_fields=["status", "activated_at", "deactivated_at"])
+            end_session(self, ended)
+            self.save(update_fields=["status", "activated_at", "deactivated_at", "current_session"])
+
+
+def current_session_id(table_id):
+    """테이블의 진행 중인 세션 id (없으면 None)"""
+    return Table.objects.filter(pk=table_id).values_list("current_session_id", flat=True).first()
+
+
+class TableSession(models.Model):
+    """
+    테이블 이용 세션 (입장 ~ 초기화)
+    주문 / 장바구니는 session_id 로 연결 → 세션 범위 조회는 activated_at 비교 대신 equality
+    """
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name="sessions")
+    booth = models.ForeignKey(Booth, on_delete=models.CASCADE)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+
+    # 세션 단위 플래그 (체크아웃 / 취소 시 갱신)
+    has_ordered = models.BooleanField(default=False)        # 주문 여부 (첫 주문 판별)
+    seat_fee_ordered = models.BooleanField(default=False)   # 이용료(seat_fee) 메뉴 주문 여부
+
+    class Meta:
+        constraints = [
+            # 테이블당 진행 중인 세션은 하나
+            models.UniqueConstraint(
+                fields=["table"], condition=models.Q(ended_at__isnull=True), name="tablesession_one_open_per_table"
+            ),
+        ]
+        indexes = [
+            # 부스의 진행 중인 세션 (주문 현황 / 대기열 / 현황판)
+            models.Index(fields=["booth"], condition=models.Q(ended_at__isnull=True), name="tablesession_open_booth_idx"),
+        ]
+
+    def __str__(self):
+        return f"TableSession #{self.pk} - Table {self.table.table_num}"
 
 
 class TableUsage(models.Model):
@@ -1,7 +1,33 @@
-from django.test import TestCase
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
-from booth.models import Booth
+from booth.models import Booth, Table, TableSession, TableUsage
+from booth.utils.booth_context import get_booth_context
+from booth.utils.table_board import build_table_board
+from booth.utils.table_session import is_first_order, mark_ordered, refresh_seat_fee_flags, session_flags
+from booth.utils import table_timer
+from booth.utils.table_timer import TIMER_GROUP, TimerWheel, ensure_table_timers
+from menu.models import Menu
+from order.models import Order, OrderMenu, OrderSetMenu
+from project.async_db import run_db
+from order.tests import IN_MEMORY_CHANNEL_LAYERS, LOCMEM_CACHES, TEST_MEDIA_ROOT, OrderFixtureMixin
+
+logger = logging.getLogger(__name__)
+
 
 class BoothNameAPITest(TestCase):
 
@@ -45,3 +71,387 @@ class BoothNameAPITest(TestCase):
         resp2 = self.client.get(url2)
         self.assertEqual(resp2.status_code, 400)
         self.assertEqual(resp2.data["status"], 400)
+
+
+def legacy_table_board(booth):
+    """기존 TableListView 의 테이블별 반복 집계 (비교 기준)"""
+    result = []
+    for table in Table.objects.filter(booth=booth).order_by("table_num"):
+        if not table.current_session_id:
+            result.append({"table_num": table.table_num, "table_amount": 0, "table_status": table.status,
+                           "created_at": None, "latest_orders": []})
+            continue
+        orders = Order.objects.filter(session_id=table.current_session_id).order_by("created_at")
+        first_order = orders.first()
+        aggregated = {}
+        for om in OrderMenu.objects.filter(order__in=orders, ordersetmenu__isnull=True).select_related("menu", "order").order_by("id"):
+            item = aggregated.setdefault(f"menu_{om.menu_id}_{om.fixed_price}", {
+                "menu_name": om.menu.menu_name, "quantity": 0, "fixed_price": om.fixed_price,
+                "latest_created_at": om.order.created_at,
+            })
+            item["quantity"] += om.quantity
+            item["latest_created_at"] = max(item["latest_created_at"], om.order.created_at)
+        for osm in OrderSetMenu.objects.filter(order__in=orders).select_related("set_menu", "order").order_by("id"):
+            item = aggregated.setdefault(f"set_{osm.set_menu_id}_{osm.fixed_price}", {
+                "menu_name": osm.set_menu.set_name, "quantity": 0, "fixed_price": osm.fixed_price,
+                "latest_created_at": osm.order.created_at,
+            })
+            item["quantity"] += osm.quantity
+            item["latest_created_at"] = max(item["latest_created_at"], osm.order.created_at)
+        latest = sorted(aggregated.values(), key=lambda x: x["latest_created_at"], reverse=True)[:3]
+        for item in latest:
+            item.pop("latest_created_at")
+        result.append({
+            "table_num": table.table_num,
+            "table_amount": sum(o.order_amount for o in orders),
+            "table_status": table.status,
+            "created_at": first_order.created_at if first_order else None,
+            "latest_orders": latest,
+        })
+    return result
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class TableBoardTest(OrderFixtureMixin, TestCase):
+    """TableListView 집계: 기존 결과와 동일 + 쿼리 수 일정"""
+
+    def setUp(self):
+        self.create_booth(table_count=3)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_matches_legacy(self):
+        now = timezone.now()
+        tea = Menu.objects.create(booth=self.booth, menu_name="식혜", menu_category="음료", menu_price=1500, menu_amount=10)
+        for minutes, table in [(20, 0), (10, 0), (5, 1)]:
+            order = self.create_order(self.tables[table])
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=minutes), order_amount=1000 + minutes)
+        latest = self.create_order(self.tables[0], with_set=False)
+        OrderMenu.objects.create(order=latest, menu=tea, quantity=3, fixed_price=1500)
+        # 가격이 다르면 다른 항목, 이전 세션 주문은 제외
+        OrderMenu.objects.create(order=latest, menu=self.food, quantity=1, fixed_price=4000)
+        previous = TableSession.objects.create(
+            table=self.tables[1], booth=self.booth, started_at=now - timedelta(hours=3), ended_at=now - timedelta(hours=1)
+        )
+        old = self.create_order(self.tables[1])
+        Order.objects.filter(pk=old.pk).update(session=previous, created_at=now - timedelta(hours=2), order_amount=99999)
+        Table.objects.filter(pk=self.tables[2].pk).update(activated_at=None, status="out", current_session=None)
+
+        resp = self.client.get("/api/v2/booth/tables/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"], legacy_table_board(self.booth))
+
+        board = {row["table_num"]: row for row in resp.data["data"]}
+        self.assertEqual(board[1]["table_amount"], 1020 + 1010)
+        self.assertEqual(
+            [(i["menu_name"], i["quantity"], i["fixed_price"]) for i in board[1]["latest_orders"]],
+            [("떡볶이", 6, 5000), ("사이다", 3, 2000), ("식혜", 3, 1500)],
+        )
+        self.assertEqual(board[3]["latest_orders"], [])
+
+    def test_benchmark_50_tables_200_orders(self):
+        """50 테이블 × 200 주문: 쿼리 3회, 기존 구현과 같은 결과"""
+        Table.objects.filter(booth=self.booth).delete()
+        activated_at = timezone.now() - timedelta(hours=3)
+        tables = Table.objects.bulk_create([
+            Table(booth=self.booth, table_num=i, status="activate", activated_at=activated_at)
+            for i in range(1, 51)
+        ])
+        sessions = TableSession.objects.bulk_create([
+            TableSession(table=table, booth=self.booth, started_at=activated_at) for table in tables
+        ])
+        for table, session in zip(tables, sessions):
+            table.current_session = session
+        Table.objects.bulk_update(tables, ["current_session"])
+        orders = Order.objects.bulk_create([
+            Order(table=table, session=table.current_session, order_amount=7000) for table in tables for _ in range(200)
+        ])
+        Order.objects.filter(table__booth=self.booth).update(created_at=timezone.now())
+        sets = OrderSetMenu.objects.bulk_create([
+            OrderSetMenu(order=order, set_menu=self.set_menu, quantity=1, fixed_price=6000)
+            for order in orders[::4]
+        ])
+        OrderMenu.objects.bulk_create(
+            [OrderMenu(order=order, menu=self.food, quantity=1, fixed_price=5000, status="pending") for order in orders]
+            + [OrderMenu(order=order, menu=self.drink, quantity=1, fixed_price=2000, status="cooked") for order in orders[::2]]
+            + [OrderMenu(order=osm.order, menu=self.food, quantity=1, fixed_price=5000, ordersetmenu=osm, status="pending") for osm in sets]
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            board = build_table_board(self.booth.id)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        with CaptureQueriesContext(connection) as legacy_ctx:
+            started = time.perf_counter()
+            expected = legacy_table_board(self.booth)
+            legacy_elapsed = time.perf_counter() - started
+        self.assertEqual(board, expected)
+        self.assertEqual(board[0]["table_amount"], 200 * 7000)
+        logger.info(
+            f"[table board] 50x200: {len(ctx.captured_queries)} queries {elapsed * 1000:.1f}ms"
+            f" (legacy {len(legacy_ctx.captured_queries)} queries {legacy_elapsed * 1000:.1f}ms)"
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class TableSessionTest(OrderFixtureMixin, TestCase):
+    """입장 → 주문 → 초기화: 세션 행과 session_id 기준 조회"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=2, seat_type="PT")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_reset_and_reenter(self):
+        table = self.tables[0]
+        first = table.current_session
+        order = self.create_order(table, with_seat_fee=True)
+        mark_ordered(order.session_id, with_seat_fee=True)
+        self.assertEqual(order.session_id, first.id)
+        self.assertEqual(session_flags(table), (True, True))
+
+        resp = self.client.post(f"/api/v2/booth/tables/{table.table_num}/reset/")
+        self.assertEqual(resp.status_code, 200)
+        table.refresh_from_db()
+        first.refresh_from_db()
+        self.assertIsNone(table.current_session_id)
+        self.assertIsNotNone(first.ended_at)
+        self.assertEqual(session_flags(table), (False, False))
+
+        resp = self.client.post("/api/v2/tables/enter/", {"booth_id": self.booth.id, "table_num": 1}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        table.refresh_from_db()
+        self.assertNotEqual(table.current_session_id, first.id)
+        self.assertTrue(is_first_order(table))
+        self.assertEqual(TableSession.objects.filter(table=table, ended_at__isnull=True).count(), 1)
+        # 이전 세션 주문은 보드에서 제외
+        board = {row["table_num"]: row for row in build_table_board(self.booth.id)}
+        self.assertEqual(board[1]["table_amount"], 0)
+
+    def test_cancel_seat_fee_refreshes_flag(self):
+        order = self.create_order(self.tables[0], with_set=False, with_seat_fee=True)
+        mark_ordered(order.session_id, with_seat_fee=True)
+        OrderMenu.objects.filter(order=order, menu=self.seat_fee).delete()
+        refresh_seat_fee_flags([order.session_id])
+        self.assertEqual(session_flags(self.tables[0]), (True, False))
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class BoothContextTest(OrderFixtureMixin, TestCase):
+    """손님용 API 공통 조회 (부스/운영자/seat_fee 메뉴/테이블 번호) 캐시"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=3, seat_type="PT")
+        Table.objects.filter(booth=self.booth).update(status="out", activated_at=None, current_session=None)
+        TableSession.objects.filter(booth=self.booth).update(ended_at=timezone.now())
+        self.client = APIClient()
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            result = func()
+        return len(ctx.captured_queries), result
+
+    def test_context_values(self):
+        context = get_booth_context(self.booth.id)
+        self.assertEqual(context.booth_name, "테스트부스")
+        self.assertEqual((context.seat_type, context.seat_tax_table, context.table_limit_hours), ("PT", 5000, 120))
+        self.assertEqual(context.seat_fee_menu_id, self.seat_fee.id)
+        self.assertEqual(context.table_id("2"), self.tables[1].id)
+        self.assertIsNone(context.table_id(99))
+        self.assertIsNone(get_booth_context(999999))
+        self.assertIsNone(get_booth_context("abc"))
+
+        # 두 번째부터는 DB 조회 없음
+        queries, _ = self.count_queries(lambda: get_booth_context(self.booth.id))
+        self.assertEqual(queries, 0)
+
+    def test_invalidated_by_signals(self):
+        get_booth_context(self.booth.id)
+
+        # 입장/초기화처럼 status 만 바뀌는 저장은 무효화하지 않음
+        with self.captureOnCommitCallbacks(execute=True):
+            table = self.tables[0]
+            table.status = "activate"
+            table.save(update_fields=["status"])
+        self.assertEqual(self.count_queries(lambda: get_booth_context(self.booth.id))[0], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_table = Table.objects.create(booth=self.booth, table_num=4)
+            self.manager.seat_type = "PP"
+            self.manager.save()
+        context = get_booth_context(self.booth.id)
+        self.assertEqual(context.table_id(4), new_table.id)
+        self.assertEqual(context.seat_type, "PP")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seat_fee.delete()
+        self.assertIsNone(get_booth_context(self.booth.id).seat_fee_menu_id)
+
+    def test_enter_and_seat_fee_status_use_context(self):
+        enter = lambda: self.client.post(
+            "/api/v2/tables/enter/", {"booth_id": self.booth.id, "table_num": 1}, format="json"
+        )
+        status = lambda: self.client.get(
+            "/api/v2/tables/2/seat-fee-status/", HTTP_BOOTH_ID=str(self.booth.id)
+        )
+        get_booth_context(self.booth.id)
+
+        # 테이블 조회 + 세션 생성 + 상태 저장만 (부스/운영자/테이블 번호 조회 없음, + SAVEPOINT/RELEASE)
+        queries, resp = self.count_queries(enter)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["booth_name"], "테스트부스")
+        self.assertEqual(queries, 5)
+        table = Table.objects.get(pk=self.tables[0].pk)
+        self.assertEqual(table.current_session.started_at, table.activated_at)
+
+        # 테이블 조회 + 이용료 주문 여부 (비활성 테이블이면 주문 조회도 생략)
+        queries, resp = self.count_queries(status)
+        self.assertEqual(resp.data["data"]["can_add_pt_seat_fee"], True)
+        self.assertLessEqual(queries, 2)
+
+        resp = self.client.post("/api/v2/tables/enter/", {"booth_id": self.booth.id, "table_num": 9}, format="json")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_call_staff_and_menus(self):
+        get_booth_context(self.booth.id)
+        queries, resp = self.count_queries(lambda: self.client.post(
+            "/api/v2/tables/call_staff/", {"table_num": 3}, format="json", HTTP_BOOTH_ID=str(self.booth.id)
+        ))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["tableNumber"], 3)
+        self.assertEqual(queries, 1)   # StaffCall INSERT 만
+
+        resp = self.client.post(
+            "/api/v2/tables/call_staff/", {"table_num": 9}, format="json", HTTP_BOOTH_ID=str(self.booth.id)
+        )
+        self.assertEqual(resp.status_code, 404)
+
+        resp = self.client.get(f"/api/v2/booth/{self.booth.id}/all-menus/", {"table_num": 1})
+        self.assertEqual(resp.data["data"]["table"]["menu_id"], self.seat_fee.id)
+        self.assertEqual(resp.data["data"]["table"]["seat_tax_table"], 5000)
+
+
+class TimerWheelTest(SimpleTestCase):
+    """타이밍 휠: 슬롯 / 바퀴 수 / 취소"""
+
+    def run_ticks(self, wheel, count):
+        return [[key for key, _ in wheel.tick()] for _ in range(count)]
+
+    def test_schedule_and_rounds(self):
+        wheel = TimerWheel(size=4)
+        wheel.schedule("a", 1)
+        wheel.schedule("b", 4)    # 정확히 한 바퀴
+        wheel.schedule("c", 6)    # 한 바퀴 + 2
+        wheel.schedule("d", 0)    # 지난 시각 → 다음 틱
+        self.assertEqual(
+            self.run_ticks(wheel, 7),
+            [["a", "d"], [], [], ["b"], [], ["c"], []],
+        )
+        self.assertEqual(len(wheel), 0)
+
+    def test_cancel_and_replace(self):
+        wheel = TimerWheel(size=4)
+        wheel.schedule("a", 2, payload=1)
+        wheel.schedule("b", 2)
+        wheel.schedule("a", 3, payload=2)   # 같은 key 는 교체
+        wheel.cancel("b")
+        wheel.cancel("missing")
+        self.assertEqual([wheel.tick() for _ in range(3)], [[], [], [("a", 2)]])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    TABLE_TIMER_TICK_SECONDS=0.05, TABLE_EXPIRY_WARNING_MINUTES=10, TABLE_AUTO_EXPIRE=True, MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class TableTimerTest(OrderFixtureMixin, TransactionTestCase):
+    """DB 에서 휠 복구 → 만료 임박 / 만료 push + 만료 테이블 자동 초기화"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=3)   # 이용 제한 120분
+        now = timezone.now()
+        self.activated = {
+            1: now - timedelta(minutes=125),                          # 이미 만료
+            2: now - timedelta(minutes=110) + timedelta(seconds=0.3),  # 곧 만료 임박
+            3: now - timedelta(minutes=30),
+        }
+        for table in self.tables:
+            Table.objects.filter(pk=table.pk).update(activated_at=self.activated[table.table_num])
+            TableSession.objects.filter(pk=table.current_session_id).update(started_at=self.activated[table.table_num])
+
+    def test_push_expire_and_reload(self):
+        layer = get_channel_layer()
+
+        async def run():
+            channel = await layer.new_channel()
+            await layer.group_add(f"booth_{self.booth.id}_tables", channel)
+            timers = await ensure_table_timers()
+            try:
+                keys = {key[1:] for key in timers.wheel.keys()}
+                first = await asyncio.wait_for(layer.receive(channel), 2)
+                second = await asyncio.wait_for(layer.receive(channel), 2)
+
+                # 3번 테이블 초기화 → 재예약 요청 → 그 부스 타이머만 다시 읽음
+                await run_db(Table.objects.filter(pk=self.tables[2].pk).update, status="out", activated_at=None)
+                await layer.group_send(TIMER_GROUP, {"type": "table_timers.reload", "booth_id": self.booth.id})
+                for _ in range(40):
+                    if not any(key[1] == 3 for key in timers.wheel.keys()):
+                        break
+                    await asyncio.sleep(0.05)
+                remaining = {key[1:] for key in timers.wheel.keys()}
+            finally:
+                timers.stop()
+                table_timer._timers.clear()
+            return keys, first["data"], second["data"], remaining
+
+        keys, expired, warning, remaining = async_to_sync(run)()
+        self.assertEqual(keys, {(1, "expired"), (2, "warning"), (2, "expired"), (3, "warning"), (3, "expired")})
+
+        # 만료: 자동 초기화된 상태로 push
+        self.assertEqual((expired["tableNumber"], expired["status"], expired["activatedAt"]), (1, "out", None))
+        table = Table.objects.get(pk=self.tables[0].pk)
+        self.assertEqual((table.status, table.activated_at, table.current_session_id), ("out", None, None))
+        self.assertIsNotNone(TableSession.objects.get(pk=self.tables[0].current_session_id).ended_at)
+        self.assertEqual(list(TableUsage.objects.values_list("table_id", "usage_minutes")), [(table.id, 125)])
+
+        # 만료 임박: 10분 남음
+        self.assertEqual((warning["tableNumber"], warning["remainingMinutes"], warning["expired"]), (2, 10, False))
+        self.assertEqual(remaining, {(2, "expired")})
+
+    def test_duplicate_wheels_push_once(self):
+        """워커 두 개가 같은 타이머를 돌려도 push 는 한 번"""
+        layer = get_channel_layer()
+        activated_at = self.activated[3]
+
+        async def run():
+            channel = await layer.new_channel()
+            await layer.group_add(f"booth_{self.booth.id}_tables", channel)
+            due = [((self.booth.id, 3, table_timer.WARNING), activated_at)]
+            for timers in (table_timer.TableTimers(layer), table_timer.TableTimers(layer)):
+                await timers.fire(due)
+            first = await asyncio.wait_for(layer.receive(channel), 2)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(layer.receive(channel), 0.2)
+            return first["data"]
+
+        row = async_to_sync(run)()
+        self.assertEqual((row["tableNumber"], row["status"]), (3, "activate"))
+
+    @override_settings(TABLE_TIMER_ENABLED=False, CART_SWEEP_INTERVAL_SECONDS=0)
+    def test_worker_command_disabled(self):
+        """타이머 / 장바구니 주기 정리 모두 꺼져 있으면 바로 종료"""
+        out = StringIO()
+        call_command("run_timer_worker", stdout=out)
+        self.assertIn("TABLE_TIMER_ENABLED=False", out.getvalue())
+        self.assertIn("CART_SWEEP_INTERVAL_SECONDS=0", out.getvalue())
+
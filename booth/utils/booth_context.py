@@ -0,0 +1,180 @@
+"""
+부스 컨텍스트 캐시 (손님용 API 공통 조회)
+
+테이블 입장 / 장바구니 / 결제 화면 / 메뉴판 / 직원 호출마다 반복되던
+Booth · Manager · seat_fee 메뉴 · (부스, table_num) → Table 조회를 부스별 한 묶음으로 보관
+- 자주 바뀌지 않는 값만 담음: 부스 이름, 이용료 설정, 이용 제한 시간, seat_fee 메뉴 id, table_num → table_id
+  (테이블 status / activated_at 처럼 매번 바뀌는 값은 호출부에서 table_id 로 직접 조회)
+- 버전 키 (booth_context:{booth}:version) + 버전별 Redis 항목 + 프로세스 메모리
+  메모리 사본도 버전이 같을 때만 사용 → 다른 프로세스의 변경도 바로 반영
+- Booth / Manager / Table / Menu 저장·삭제 시그널이 커밋 이후 버전을 올림
+  입장·초기화처럼 status 만 바꾸는 저장은 무시 (update_fields 로 구분)
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+from booth.models import Booth, Table
+
+logger = logging.getLogger(__name__)
+
+SEAT_FEE_CATEGORY = "seat_fee"
+
+# Redis 보관 시간 (초) - 버전이 바뀌면 어차피 새 키를 씀
+BOOTH_CONTEXT_TTL = 60 * 60 * 12
+
+# 시그널 모델별로 컨텍스트에 영향을 주는 필드 (update_fields 가 이 필드를 안 건드리면 무시)
+CONTEXT_FIELDS = {
+    "Booth": {"booth_name"},
+    "Table": {"booth", "booth_id", "table_num"},
+    "Menu": {"booth", "booth_id", "menu_category"},
+}
+
+# booth_id → (version, BoothContext)
+_local = {}
+
+
+class BoothContext:
+    """부스 한 곳의 자주 쓰는 설정 묶음 (읽기 전용)"""
+
+    def __init__(self, data: dict):
+        self.booth_id = data["booth_id"]
+        self.booth_name = data["booth_name"]
+        self.has_manager = data["has_manager"]
+        self.seat_type = data["seat_type"]
+        self.seat_tax_person = data["seat_tax_person"]
+        self.seat_tax_table = data["seat_tax_table"]
+        self.table_limit_hours = data["table_limit_hours"]
+        self.seat_fee_menu_id = data["seat_fee_menu_id"]
+        self.tables = data["tables"]
+
+    def table_id(self, table_num):
+        """table_num → table_id (없거나 잘못된 값이면 None)"""
+        try:
+            return self.tables.get(int(table_num))
+        except (TypeError, ValueError):
+            return None
+
+
+def _version_key(booth_id):
+    return f"booth_context:{booth_id}:version"
+
+
+def _context_key(booth_id, version):
+    return f"booth_context:{booth_id}:{version}"
+
+
+def build_booth_context(booth_id):
+    """DB 에서 컨텍스트 dict 생성 (부스가 없으면 None)"""
+    from manager.models import Manager
+    from menu.models import Menu
+
+    booth = Booth.objects.filter(pk=booth_id).values("id", "booth_name").first()
+    if booth is None:
+        return None
+    manager = (
+        Manager.objects.filter(booth_id=booth_id)
+        .values("seat_type", "seat_tax_person", "seat_tax_table", "table_limit_hours")
+        .first()
+    )
+    seat_fee_menu_id = (
+        Menu.objects.filter(booth_id=booth_id, menu_category=SEAT_FEE_CATEGORY)
+        .order_by("pk")
+        .values_list("id", flat=True)
+        .first()
+    )
+    tables = dict(Table.objects.filter(booth_id=booth_id).values_list("table_num", "id"))
+    return {
+        "booth_id": booth["id"],
+        "booth_name": booth["booth_name"],
+        "has_manager": manager is not None,
+        "seat_type": manager["seat_type"] if manager else None,
+        "seat_tax_person": manager["seat_tax_person"] if manager else None,
+        "seat_tax_table": manager["seat_tax_table"] if manager else None,
+        "table_limit_hours": manager["table_limit_hours"] if manager else None,
+        "seat_fee_menu_id": seat_fee_menu_id,
+        "tables": tables,
+    }
+
+
+def _context_version(booth_id):
+    try:
+        return cache.get(_version_key(booth_id), 0)
+    except Exception:
+        logger.warning(f"booth context version unavailable for booth {booth_id}", exc_info=True)
+        return None
+
+
+def get_booth_context(booth_id):
+    """
+    부스 컨텍스트 (부스가 없거나 id 가 잘못되면 None)
+    캐시 장애 시 DB 에서 바로 생성
+    """
+    try:
+        booth_id = int(booth_id)
+    except (TypeError, ValueError):
+        return None
+
+    version = _context_version(booth_id)
+    if version is None:
+        data = build_booth_context(booth_id)
+        return BoothContext(data) if data else None
+
+    local = _local.get(booth_id)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = _context_key(booth_id, version)
+    try:
+        data = cache.get(key)
+    except Exception:
+        logger.warning(f"booth context unavailable for booth {booth_id}", exc_info=True)
+        data = None
+
+    if data is None:
+        data = build_booth_context(booth_id)
+        if data is None:
+            return None
+        try:
+            cache.set(key, data, timeout=BOOTH_CONTEXT_TTL)
+        except Exception:
+            logger.warning(f"booth context store failed for booth {booth_id}", exc_info=True)
+
+    context = BoothContext(data)
+    _local[booth_id] = (version, context)
+    return context
+
+
+def _bump(booth_id):
+    _local.pop(booth_id, None)
+    try:
+        key = _version_key(booth_id)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        logger.warning(f"booth context version bump failed for booth {booth_id}", exc_info=True)
+
+
+def invalidate_booth_context(booth_id):
+    """컨텍스트 무효화 (커밋 이후 버전 +1)"""
+    transaction.on_commit(lambda: _bump(booth_id))
+
+
+def _invalidate_for_instance(sender, instance, update_fields=None, **kwargs):
+    fields = CONTEXT_FIELDS.get(sender.__name__)
+    if update_fields and fields is not None and not fields.intersection(update_fields):
+        return
+    booth_id = instance.pk if sender is Booth else instance.booth_id
+    invalidate_booth_context(booth_id)
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+
+    from manager.models import Manager
+    from menu.models import Menu
+
+    for model in (Booth, Manager, Table, Menu):
+        post_save.connect(_invalidate_for_instance, sender=model, dispatch_uid=f"booth_context_{model.__name__}_save")
+        post_delete.connect(_invalidate_for_instance, sender=model, dispatch_uid=f"booth_context_{model.__name__}_delete")
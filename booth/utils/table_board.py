@@ -0,0 +1,122 @@
+"""
+운영자 테이블 현황판 (TableListView) 집계
+
+테이블 수와 주문 수에 상관없이 쿼리 3회
+  1) 테이블 목록 + 진행 중인 세션 주문 합계/첫 주문 시각 (상관 서브쿼리, session_id equality)
+  2) 단품 OrderMenu 를 (테이블, 메뉴, 가격)별로 묶고 ROW_NUMBER 로 테이블별 최근 3개
+  3) OrderSetMenu 를 (테이블, 세트, 가격)별로 같은 방식으로
+두 결과를 테이블별로 합쳐 최근 3개를 고름 (각각의 상위 3개 안에 전체 상위 3개가 있음)
+정렬 기준은 기존 구현과 동일: 최근 주문 시각 ↓ → 단품 먼저 → 먼저 담긴 행 먼저
+"""
+from collections import defaultdict
+
+from django.db.models import F, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import RowNumber
+from django.db.models.expressions import Window
+
+from booth.models import Table
+from booth.utils.table_session import open_session_q
+from order.models import Order, OrderMenu, OrderSetMenu
+
+LATEST_ITEMS = 3
+
+
+def _session_orders():
+    """OuterRef 테이블의 진행 중인 세션 주문"""
+    return Order.objects.filter(session_id=OuterRef("current_session_id")).order_by()
+
+
+def _latest_items(queryset, item_field, name_field):
+    """
+    queryset 을 (테이블, item, fixed_price) 로 묶어 테이블별 최근 LATEST_ITEMS 개
+    반환: {table_id: [(latest_created_at, first_id, row), ...]}
+    """
+    rows = (
+        queryset
+        .values("order__table_id", item_field, "fixed_price")
+        .annotate(
+            menu_name=Min(name_field),
+            quantity=Sum("quantity"),
+            latest_created_at=Max("order__created_at"),
+            first_id=Min("id"),
+        )
+        # 집계와 같은 annotate 에 넣으면 윈도 함수가 GROUP BY 에 들어가므로 분리
+        .annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F("order__table_id"),
+                order_by=[F("latest_created_at").desc(), F("first_id").asc()],
+            ),
+        )
+        .filter(rank__lte=LATEST_ITEMS)
+        .order_by()
+    )
+    ranked = defaultdict(list)
+    for row in rows:
+        ranked[row["order__table_id"]].append((
+            row["latest_created_at"],
+            row["first_id"],
+            {
+                "menu_name": row["menu_name"],
+                "quantity": row["quantity"],
+                "fixed_price": row["fixed_price"],
+            },
+        ))
+    return ranked
+
+
+def build_table_board(booth_id):
+    """TableListView 응답의 data 목록"""
+    session = _session_orders()
+    tables = (
+        Table.objects.filter(booth_id=booth_id)
+        .annotate(
+            table_amount=Subquery(
+                session.values("table_id").annotate(total=Sum("order_amount")).values("total")[:1]
+            ),
+            first_order_at=Subquery(
+                session.values("table_id").annotate(first=Min("created_at")).values("first")[:1]
+            ),
+        )
+        .order_by("table_num")
+    )
+
+    in_session = open_session_q("order__") & Q(order__session__booth_id=booth_id)
+    menus = _latest_items(
+        OrderMenu.objects.filter(in_session, ordersetmenu__isnull=True),
+        "menu_id", "menu__menu_name",
+    )
+    sets = _latest_items(
+        OrderSetMenu.objects.filter(in_session),
+        "set_menu_id", "set_menu__set_name",
+    )
+
+    result = []
+    for table in tables:
+        if not table.activated_at:
+            # 엔터(activate) 이전 테이블은 주문/목록 없이 상태만
+            result.append({
+                "table_num": table.table_num,
+                "table_amount": 0,
+                "table_status": table.status,
+                "created_at": None,
+                "latest_orders": []
+            })
+            continue
+
+        candidates = [
+            (latest, 0, first_id, row) for latest, first_id, row in menus.get(table.pk, [])
+        ] + [
+            (latest, 1, first_id, row) for latest, first_id, row in sets.get(table.pk, [])
+        ]
+        candidates.sort(key=lambda c: (c[1], c[2]))
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        result.append({
+            "table_num": table.table_num,
+            "table_amount": table.table_amount or 0,
+            "table_status": table.status,
+            "created_at": table.first_order_at,
+            "latest_orders": [row for *_, row in candidates[:LATEST_ITEMS]],
+        })
+    return result
@@ -0,0 +1,83 @@
+"""
+테이블 이용 세션 (TableSession)
+
+입장(TableEnterAPIView) 때 시작, 초기화(TableResetAPIView / Table.deactivate) 때 종료
+- Table.current_session 이 진행 중인 세션, Order / Cart 는 생성 시 session_id 를 기록
+  → 세션 범위 조회는 created_at >= activated_at 범위 비교 대신 session_id equality
+- 첫 주문 여부 / 이용료 주문 여부는 세션 행 플래그로 (매번 주문 행을 찾지 않음)
+  체크아웃: mark_ordered, 취소로 이용료 행이 지워지면: refresh_seat_fee_flags
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from booth.models import Table, TableSession
+
+SEAT_FEE_CATEGORY = "seat_fee"
+
+
+def open_session_q(prefix=""):
+    """
+    진행 중인 세션의 주문 조건 (Order 는 prefix 없이, OrderMenu / OrderSetMenu 는 "order__")
+    session 이 없는 주문은 LEFT JOIN 으로 ended_at IS NULL 에 걸리므로 session IS NOT NULL 도 함께
+    """
+    return Q(**{f"{prefix}session__isnull": False, f"{prefix}session__ended_at__isnull": True})
+
+
+def start_session(table: Table, started_at) -> TableSession:
+    """새 세션 시작 + table.current_session 설정 (저장은 호출부에서 update_fields 에 current_session 포함)"""
+    end_session(table, started_at)
+    session = TableSession.objects.create(table=table, booth_id=table.booth_id, started_at=started_at)
+    table.current_session = session
+    return session
+
+
+def end_session(table: Table, ended_at):
+    """진행 중인 세션 종료 + table.current_session 해제 (저장은 호출부에서)"""
+    if table.current_session_id:
+        TableSession.objects.filter(pk=table.current_session_id, ended_at__isnull=True).update(ended_at=ended_at)
+    table.current_session = None
+
+
+def session_flags(table: Table):
+    """(주문 여부, 이용료 주문 여부) - 진행 중인 세션이 없으면 (False, False)"""
+    if not table.current_session_id:
+        return False, False
+    flags = (
+        TableSession.objects.filter(pk=table.current_session_id)
+        .values_list("has_ordered", "seat_fee_ordered")
+        .first()
+    )
+    return flags or (False, False)
+
+
+def is_first_order(table: Table) -> bool:
+    """현재 세션에서 아직 주문이 없는지 (첫 주문 판별)"""
+    return not session_flags(table)[0]
+
+
+def seat_fee_ordered(table: Table) -> bool:
+    """현재 세션에서 이용료(seat_fee) 메뉴가 이미 주문됐는지"""
+    return session_flags(table)[1]
+
+
+def mark_ordered(session_id, with_seat_fee=False):
+    """체크아웃: 세션 플래그 갱신 (UPDATE 1회)"""
+    if not session_id:
+        return
+    fields = {"has_ordered": True}
+    if with_seat_fee:
+        fields["seat_fee_ordered"] = True
+    TableSession.objects.filter(pk=session_id).update(**fields)
+
+
+def refresh_seat_fee_flags(session_ids):
+    """취소로 이용료 행이 지워진 세션의 seat_fee_ordered 재계산 (UPDATE 1회)"""
+    from order.models import OrderMenu
+
+    session_ids = {pk for pk in session_ids if pk}
+    if not session_ids:
+        return
+    TableSession.objects.filter(pk__in=session_ids).update(
+        seat_fee_ordered=Exists(
+            OrderMenu.objects.filter(order__session_id=OuterRef("pk"), menu__menu_category=SEAT_FEE_CATEGORY)
+        )
+    )
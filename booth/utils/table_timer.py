@@ -0,0 +1,336 @@
+"""
+테이블 이용 시간 타이머 휠 (프로세스 내 asyncio)
+
+남은 시간 / 만료 여부는 대시보드 접속·REFRESH, 입장 때만 계산됨
+→ 대시보드가 REFRESH 로 폴링 (매번 운영자 + 테이블 전체 조회)
+- 활성 테이블마다 타이머 2개: 만료 임박 (TABLE_EXPIRY_WARNING_MINUTES 전) / 만료
+  그 시각에 booth_{id}_tables 그룹으로 TABLE_STATUS_UPDATE push
+- TABLE_AUTO_EXPIRE 이면 같은 틱에 만료된 테이블을 부스별로 한 번에 초기화 (expire_tables)
+- 휠은 전용 워커 프로세스 (관리 명령 run_timer_worker) 에서 시작 시 DB 의 활성 테이블로 채워 돌림 (ensure_table_timers)
+  웹 프로세스 (대시보드 소켓 접속) 와 무관하게 돌아감
+- 워커가 여러 개 떠도 (부스, 테이블, 종류, 입장 시각) 마다 cache.add 로 선점한 쪽만 push
+- 입장 / 초기화 / 이용 제한 시간 변경 → notify_table_timers(booth_id)
+  TIMER_GROUP 채널 그룹으로 전달 → 각 프로세스의 휠이 그 부스 테이블만 다시 읽어 재예약
+- 이용 제한 시간 단위는 기존 계산 (대시보드 / 입장 API) 과 같이 분
+"""
+import asyncio
+import logging
+import math
+import time
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from booth.models import Table, TableSession, TableUsage
+from booth.utils.booth_context import get_booth_context
+from project.async_db import run_db
+from project.snapshot_cache import invalidate_snapshot
+
+logger = logging.getLogger(__name__)
+
+TIMER_GROUP = "table_timers"
+WARNING, EXPIRED = "warning", "expired"
+GROUP_REFRESH_SECONDS = 60 * 60
+PUSH_CLAIM_SECONDS = 60 * 60 * 24
+
+# 이벤트 루프별 TableTimers (Task 는 루프에 묶이므로 루프마다 따로)
+_timers = weakref.WeakKeyDictionary()
+
+
+def table_status(table: Table, table_limit_hours, now=None) -> dict:
+    """대시보드 테이블 상태 한 행 (TABLE_STATUS / TABLE_STATUS_UPDATE 공통)"""
+    remaining_minutes, is_expired = None, False
+    if table.activated_at and table_limit_hours:
+        elapsed = (now or timezone.now()) - table.activated_at
+        limit = timedelta(minutes=table_limit_hours)
+
+        total_seconds = (limit - elapsed).total_seconds()
+        remaining_minutes = max(0, math.ceil(total_seconds / 60))
+
+        is_expired = elapsed >= limit
+
+    return {
+        "tableNumber": table.table_num,
+        "status": table.status,
+        "activatedAt": table.activated_at.isoformat() if table.activated_at else None,
+        "remainingMinutes": remaining_minutes,
+        "expired": is_expired,
+    }
+
+
+class TimerWheel:
+    """
+    해시 타이밍 휠: 슬롯 size 개, tick() 마다 커서 한 칸
+    한 바퀴보다 먼 타이머는 남은 바퀴 수 (rounds) 를 함께 보관 → 예약 / 취소 O(1)
+    """
+
+    def __init__(self, size=3600):
+        self.slots = [{} for _ in range(size)]
+        self.cursor = 0
+        self._where = {}  # key → 슬롯 번호
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def keys(self):
+        return list(self._where)
+
+    def schedule(self, key, ticks, payload=None):
+        """ticks 틱 뒤에 만료 (1 미만이면 다음 틱), 같은 key 는 교체"""
+        self.cancel(key)
+        ticks = max(1, int(ticks))
+        index = (self.cursor + ticks) % len(self.slots)
+        self.slots[index][key] = [(ticks - 1) // len(self.slots), payload]
+        self._where[key] = index
+
+    def cancel(self, key):
+        index = self._where.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def tick(self):
+        """커서를 한 칸 옮기고 만료된 [(key, payload), ...] 반환"""
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        slot = self.slots[self.cursor]
+        due = []
+        for key, entry in list(slot.items()):
+            if entry[0]:
+                entry[0] -= 1
+                continue
+            del slot[key]
+            del self._where[key]
+            due.append((key, entry[1]))
+        return due
+
+
+def active_tables(booth_id=None):
+    """[(booth_id, table_num, activated_at, 이용 제한 시간)] - 제한 시간이 없는 부스는 제외"""
+    tables = Table.objects.filter(status="activate", activated_at__isnull=False)
+    if booth_id is not None:
+        tables = tables.filter(booth_id=booth_id)
+    rows, limits = [], {}
+    for booth, table_num, activated_at in tables.values_list("booth_id", "table_num", "activated_at"):
+        if booth not in limits:
+            context = get_booth_context(booth)
+            limits[booth] = context.table_limit_hours if context else None
+        if limits[booth]:
+            rows.append((booth, table_num, activated_at, limits[booth]))
+    return rows
+
+
+def expire_tables(booth_id, table_nums, table_limit_hours, now=None):
+    """
+    만료된 테이블 일괄 초기화 (Table.deactivate + 초기화 API 와 같은 처리, 트랜잭션 1회)
+    이미 초기화 / 재입장된 테이블은 잠근 뒤 다시 거름 → 여러 프로세스가 동시에 불러도 한 번만 처리
+    """
+    from cart.utils.cart_store import get_cart_store
+    from statistic.counters import record_table_usages
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=table_limit_hours)
+    with transaction.atomic():
+        tables = list(
+            Table.objects.select_for_update().filter(
+                booth_id=booth_id, table_num__in=table_nums, status="activate", activated_at__lte=cutoff,
+            ).order_by("table_num")
+        )
+        if not tables:
+            return []
+
+        usages = TableUsage.objects.bulk_create([
+            TableUsage(
+                table=table, booth_id=booth_id, started_at=table.activated_at, ended_at=now,
+                usage_minutes=int((now - table.activated_at).total_seconds() // 60),
+            )
+            for table in tables
+        ])
+        record_table_usages(booth_id, usages)
+
+        TableSession.objects.filter(
+            pk__in=[table.current_session_id for table in tables if table.current_session_id], ended_at__isnull=True,
+        ).update(ended_at=now)
+        for table in tables:
+            table.status = "out"
+            table.activated_at = None
+            table.deactivated_at = now
+            table.current_session = None
+        Table.objects.bulk_update(tables, ["status", "activated_at", "deactivated_at", "current_session"])
+        get_cart_store().discard_tables([table.id for table in tables])
+
+        for kind in ("tables", "cook_queue", "statistics"):
+            transaction.on_commit(lambda kind=kind: invalidate_snapshot(booth_id, kind))
+    return tables
+
+
+def claim_push(booth_id, table_num, kind, activated_at):
+    """같은 (부스, 테이블, 종류, 입장 시각) push 는 먼저 cache.add 한 휠만 (여러 워커 중복 방지)"""
+    key = f"table_timer_push:{booth_id}:{table_num}:{kind}:{activated_at.isoformat()}"
+    return cache.add(key, 1, timeout=PUSH_CLAIM_SECONDS)
+
+
+def due_table_statuses(booth_id, due):
+    """
+    due: [(table_num, 종류, 예약 당시 activated_at), ...] → push 할 상태 행
+    예약 이후 초기화 / 재입장된 테이블, 다른 휠이 이미 push 한 타이머는 제외
+    """
+    context = get_booth_context(booth_id)
+    limit = context.table_limit_hours if context else None
+    if not limit:
+        return []
+
+    now = timezone.now()
+    rows, expired = [], set()
+    if getattr(settings, "TABLE_AUTO_EXPIRE", False):
+        for table in expire_tables(booth_id, [num for num, kind, _ in due if kind == EXPIRED], limit, now):
+            rows.append(table_status(table, limit, now))
+            expired.add(table.table_num)
+
+    expected = {num: activated_at for num, _, activated_at in due if num not in expired}
+    if expected:
+        for table in Table.objects.filter(booth_id=booth_id, table_num__in=expected, status="activate").order_by("table_num"):
+            if table.activated_at == expected[table.table_num]:
+                rows.append(table_status(table, limit, now))
+
+    # 같은 틱에 만료 임박 + 만료가 겹치면 만료 기준으로 선점
+    claims = {}
+    for num, kind, activated_at in due:
+        if num not in claims or kind == EXPIRED:
+            claims[num] = (kind, activated_at)
+    return [row for row in rows if claim_push(booth_id, row["tableNumber"], *claims[row["tableNumber"]])]
+
+
+class TableTimers:
+    """이벤트 루프 하나의 타이머 휠 + 틱 / 재예약 수신 Task"""
+
+    def __init__(self, channel_layer):
+        self.layer = channel_layer
+        self.tick_seconds = getattr(settings, "TABLE_TIMER_TICK_SECONDS", 1)
+        self.wheel = TimerWheel(getattr(settings, "TABLE_TIMER_SLOTS", 3600))
+        self.channel = None
+        self.tasks = []
+
+    def ticks_until(self, when, now):
+        return math.ceil((when - now).total_seconds() / self.tick_seconds)
+
+    def load(self, rows, booth_id=None):
+        """활성 테이블 목록으로 예약 (booth_id 가 있으면 그 부스 타이머만 교체)"""
+        if booth_id is not None:
+            for key in self.wheel.keys():
+                if key[0] == booth_id:
+                    self.wheel.cancel(key)
+
+        now = timezone.now()
+        warning = timedelta(minutes=getattr(settings, "TABLE_EXPIRY_WARNING_MINUTES", 10))
+        for booth, table_num, activated_at, limit in rows:
+            expires_at = activated_at + timedelta(minutes=limit)
+            if warning and expires_at - warning > now:
+                self.wheel.schedule((booth, table_num, WARNING), self.ticks_until(expires_at - warning, now), activated_at)
+            self.wheel.schedule((booth, table_num, EXPIRED), self.ticks_until(expires_at, now), activated_at)
+
+    async def start(self):
+        self.channel = await self.layer.new_channel()
+        await self.layer.group_add(TIMER_GROUP, self.channel)
+        self.load(await run_db(active_tables))
+        self.tasks = [asyncio.ensure_future(self.run()), asyncio.ensure_future(self.listen())]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+
+    async def run(self):
+        """tick_seconds 마다 휠을 돌림 (루프가 밀리면 밀린 틱까지 한꺼번에)"""
+        started = refreshed = time.monotonic()
+        ticks = 0
+        while True:
+            ticks += 1
+            await asyncio.sleep(max(0, started + ticks * self.tick_seconds - time.monotonic()))
+            due = self.wheel.tick()
+            while started + (ticks + 1) * self.tick_seconds <= time.monotonic():
+                ticks += 1
+                due.extend(self.wheel.tick())
+            if due:
+                await self.fire(due)
+            if time.monotonic() - refreshed >= GROUP_REFRESH_SECONDS:
+                # channel layer 그룹 만료 (group_expiry) 대비 재등록
+                await self.layer.group_add(TIMER_GROUP, self.channel)
+                refreshed = time.monotonic()
+
+    async def fire(self, due):
+        by_booth = defaultdict(list)
+        for (booth_id, table_num, kind), activated_at in due:
+            by_booth[booth_id].append((table_num, kind, activated_at))
+
+        for booth_id, items in by_booth.items():
+            try:
+                rows = await run_db(due_table_statuses, booth_id, items, booth_id=booth_id)
+                for row in rows:
+                    await self.layer.group_send(f"booth_{booth_id}_tables", {"type": "table_status_update", "data": row})
+            except Exception as e:
+                logger.error(f"table timer push failed for booth {booth_id}: {e}", exc_info=True)
+
+    async def listen(self):
+        """notify_table_timers → 그 부스 활성 테이블을 다시 읽어 재예약"""
+        while True:
+            message = await self.layer.receive(self.channel)
+            try:
+                booth_id = message["booth_id"]
+                self.load(await run_db(active_tables, booth_id, booth_id=booth_id), booth_id=booth_id)
+            except Exception as e:
+                logger.error(f"table timer reload failed: {e}", exc_info=True)
+
+
+async def ensure_table_timers():
+    """현재 이벤트 루프의 타이머 휠 (없으면 DB 에서 다시 채워 시작), TABLE_TIMER_ENABLED=False 면 None"""
+    if not getattr(settings, "TABLE_TIMER_ENABLED", True):
+        return None
+    from channels.layers import get_channel_layer
+
+    loop = asyncio.get_running_loop()
+    timers = _timers.get(loop)
+    if timers is None:
+        timers = _timers[loop] = TableTimers(get_channel_layer())
+        try:
+            await timers.start()
+        except Exception:
+            _timers.pop(loop, None)
+            timers.stop()
+            raise
+    return timers
+
+
+def _send_reload(booth_id):
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        async_to_sync(get_channel_layer().group_send)(TIMER_GROUP, {"type": "table_timers.reload", "booth_id": booth_id})
+    except Exception:
+        logger.warning(f"table timer reload notify failed for booth {booth_id}", exc_info=True)
+
+
+def notify_table_timers(booth_id):
+    """입장 / 초기화 / 이용 제한 시간 변경 → 커밋 이후 각 프로세스 휠에 재예약 요청"""
+    if getattr(settings, "TABLE_TIMER_ENABLED", True):
+        transaction.on_commit(lambda: _send_reload(booth_id))
+
+
+def _manager_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields and "table_limit_hours" not in update_fields):
+        return
+    notify_table_timers(instance.booth_id)
+
+
+def connect_signals():
+    from django.db.models.signals import post_save
+
+    from manager.models import Manager
+
+    post_save.connect(_manager_saved, sender=Manager, dispatch_uid="table_timer_manager_save")
@@ -1,10 +1,9 @@
-import math
+from collections import defaultdict
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from booth.models import Booth, Table
+from booth.models import Booth, Table, TableSession
 from coupon.models import TableCoupon, CouponCode, Coupon
 from django.utils import timezone
-from datetime import timedelta
 from order.models import *
 from cart.models import *
 from django.db.models import Sum, F
@@ -15,6 +14,14 @@ from manager.models import Manager
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from menu.utils.menu_stock import restock
+from booth.utils.booth_context import get_booth_context
+from booth.utils.table_board import build_table_board
+from booth.utils.table_session import end_session, session_flags, start_session
+from booth.utils.table_timer import notify_table_timers, table_status
+from cart.utils.cart_store import get_cart_store
+from project.auth import BoothClaimAuthentication, get_request_booth_id
+from project.snapshot_cache import invalidate_snapshot
 
 SEAT_MENU_CATEGORY = "seat"
 SEAT_FEE_CATEGORY = "seat_fee"
@@ -23,38 +30,16 @@ class IsManagerUser(permissions.BasePermission):
     """로그인한 사용자가 Manager와 연결되어 있는지 확인"""
 
     def has_permission(self, request, view):
+        # 운영자 claim 토큰 (project/auth.py) 이면 DB 조회 없이 통과
         return (
             request.user and
             request.user.is_authenticated and
-            hasattr(request.user, 'manager_profile')
+            (getattr(request.user, 'is_manager', False) or hasattr(request.user, 'manager_profile'))
         )
         
-def _is_first_session(table: Table, now_dt=None) -> bool:
-    """해당 테이블이 초기화된 이후 첫 주문인지 판별"""
-    activated_at = getattr(table, "activated_at", None)
-    qs = Order.objects.filter(table_id=table.id)
-    if activated_at:
-        qs = qs.filter(created_at__gte=activated_at)
-    return not qs.exists()
-        
-def _ordered_pt_seat_fee_in_session(table: Table) -> bool:
-    """
-    현재 테이블 활성화(activated_at) 이후 OrderMenu에서
-    PT seat_fee 메뉴가 이미 주문된 적 있는지 검사
-    """
-    activated_at = getattr(table, "activated_at", None)
-    if not activated_at:
-        return False
-
-    return OrderMenu.objects.filter(
-        order__table=table,
-        order__created_at__gte=activated_at,
-        menu__menu_category=SEAT_FEE_CATEGORY
-    ).exists()
-    
 class TableSeatFeeStatusView(APIView):
     """
-    특정 테이블이 현재 세션(activated_at 이후)에서
+    특정 테이블이 현재 세션에서
     PT seat_fee(테이블당 이용료)를 이미 주문했는지 여부 확인
     GET /api/v2/tables/<table_num>/seat-fee-status/
     헤더: Booth-ID
@@ -69,20 +54,20 @@ class TableSeatFeeStatusView(APIView):
                 status=400
             )
 
-        booth = Booth.objects.filter(pk=booth_id).first()
-        if not booth:
+        # 부스/운영자/테이블 번호는 부스 컨텍스트 캐시에서
+        context = get_booth_context(booth_id)
+        if not context:
             return Response({"status": "fail", "message": "해당 부스를 찾을 수 없습니다."}, status=404)
 
-        table = Table.objects.filter(booth=booth, table_num=table_num).first()
-        if not table:
+        table_id = context.table_id(table_num)
+        if not table_id:
             return Response({"status": "fail", "message": "해당 테이블을 찾을 수 없습니다."}, status=404)
 
-        manager = Manager.objects.filter(booth=booth).first()
-        if not manager:
+        if not context.has_manager:
             return Response({"status": "fail", "message": "해당 부스 운영자 정보가 없습니다."}, status=404)
 
         # seat_type이 PT가 아닌 경우도 안내
-        if manager.seat_type != "PT":
+        if context.seat_type != "PT":
             return Response({
                 "status": "success",
                 "code": 200,
@@ -94,10 +79,15 @@ class TableSeatFeeStatusView(APIView):
                 }
             }, status=200)
 
-        # ✅ 활성화 세션에서 이미 주문된 적 있는지 검사
-        ordered_pt_seat_fee = _ordered_pt_seat_fee_in_session(table)
+        # 진행 중인 세션은 매번 바뀌므로 테이블만 직접 조회
+        table = Table.objects.filter(pk=table_id).first()
+        if not table:
+            return Response({"status": "fail", "message": "해당 테이블을 찾을 수 없습니다."}, status=404)
+
+        # ✅ 세션 플래그: 주문 여부 / 이용료 주문 여부
+        has_ordered, ordered_pt_seat_fee = session_flags(table)
         # ✅ 현재 첫 주문인지 검사 (주문 자체가 없으면 True)
-        is_first = _is_first_session(table)
+        is_first = not has_ordered
         # ✅ 추가 가능 여부
         can_add_pt_seat_fee = (is_first and not ordered_pt_seat_fee)
 
@@ -206,26 +196,27 @@ class TableEnterAPIView(APIView):
                 "data": None
             }, status=400)
         
-        # 2. 테이블 존재 여부 확인
-        try:
-            booth = Booth.objects.get(pk=booth_id)
-            table = Table.objects.get(booth=booth, table_num=table_num)
-            manager = Manager.objects.get(booth=booth)  # ✅ table_limit_hours 계산용
-        except Booth.DoesNotExist:
+        # 2. 테이블 존재 여부 확인 (부스/운영자/테이블 번호는 부스 컨텍스트 캐시)
+        context = get_booth_context(booth_id)
+        if not context:
             return Response({
                 "status": "fail",
                 "message": "존재하지 않는 부스입니다.",
                 "code": 404,
                 "data": None
             }, status=404)
-        except Table.DoesNotExist:
+
+        table_id = context.table_id(table_num)
+        table = Table.objects.filter(pk=table_id).first() if table_id else None
+        if not table:
             return Response({
                 "status": "fail",
                 "message": "존재하지 않는 테이블입니다.",
                 "code": 404,
                 "data": None
             }, status=404)
-        except Manager.DoesNotExist:
+
+        if not context.has_manager:  # ✅ table_limit_hours 계산용
             return Response({
                 "status": "fail",
                 "message": "해당 부스에 연결된 운영자 정보가 없습니다.",
@@ -242,27 +233,22 @@ class TableEnterAPIView(APIView):
                 "data": {
                     "table_id": table.id,
                     "table_num": table.table_num,
-                    "booth_id": booth.id,
-                    "booth_name": booth.booth_name,
+                    "booth_id": context.booth_id,
+                    "booth_name": context.booth_name,
                     "table_status": "activate"
                 }
             }, status=200)
         
-        # 4. 상태 변경 및 활성화 시점 기록
-        table.status = "activate"
-        table.activated_at = timezone.now()
-        table.save(update_fields=["status", "activated_at"])
-
-        # 5. 남은 시간 / 만료 여부 계산 (get_table_statuses와 동일 로직)
-        remaining_minutes, is_expired = None, False
-        if table.activated_at and manager.table_limit_hours:
-            elapsed = timezone.now() - table.activated_at
-            limit = timedelta(minutes=manager.table_limit_hours)
+        # 4. 상태 변경 및 활성화 시점 기록 + 이용 세션 시작
+        with transaction.atomic():
+            table.status = "activate"
+            table.activated_at = timezone.now()
+            start_session(table, table.activated_at)
+            table.save(update_fields=["status", "activated_at", "current_session"])
+            notify_table_timers(context.booth_id)
 
-            total_seconds = (limit - elapsed).total_seconds()
-            remaining_minutes = max(0, math.ceil(total_seconds / 60))
-
-            is_expired = elapsed >= limit
+        # 5. 남은 시간 / 만료 여부 계산 (대시보드와 같은 계산, booth/utils/table_timer.py)
+        table_row = table_status(table, context.table_limit_hours)
 
         # 6. 웹소켓 그룹으로 상태 갱신 이벤트 push
         try:
@@ -270,17 +256,12 @@ class TableEnterAPIView(APIView):
             from channels.layers import get_channel_layer
             channel_layer = get_channel_layer()
 
+            invalidate_snapshot(context.booth_id, "tables")
             async_to_sync(channel_layer.group_send)(
-                f"booth_{booth.id}_tables",
+                f"booth_{context.booth_id}_tables",
                 {
                     "type": "table_status_update",
-                    "data": {
-                        "tableNumber": table.table_num,
-                        "status": table.status,
-                        "activatedAt": table.activated_at.isoformat(),
-                        "remainingMinutes": remaining_minutes,
-                        "expired": is_expired
-                    }
+                    "data": table_row
                 }
             )
         except Exception as e:
@@ -295,102 +276,24 @@ class TableEnterAPIView(APIView):
             "data": {
                 "table_id": table.id,
                 "table_num": table.table_num,
-                "booth_id": booth.id,
-                "booth_name": booth.booth_name,
+                "booth_id": context.booth_id,
+                "booth_name": context.booth_name,
                 "table_status": table.status,
-                "remainingMinutes": remaining_minutes,
-                "expired": is_expired,
+                "remainingMinutes": table_row["remainingMinutes"],
+                "expired": table_row["expired"],
                 "activated_at": table.activated_at
             }
         }, status=200)
         
 class TableListView(APIView):
+    authentication_classes = [BoothClaimAuthentication]
     permission_classes = [IsAuthenticated, IsManagerUser]
 
     def get(self, request):
-        user = request.user
-        manager = user.manager_profile
-        booth = manager.booth
+        booth_id = get_request_booth_id(request)
 
-        tables = Table.objects.filter(booth=booth).order_by("table_num")
-        result = []
-
-        for table in tables:
-            activated_at = table.activated_at
-            if not activated_at:
-                # 엔터(activate) 이전 테이블은 주문/목록 없이 상태만 내려주거나, 건너뛰기
-                result.append({
-                    "table_num": table.table_num,
-                    "table_amount": 0,
-                    "table_status": table.status,
-                    "created_at": None,
-                    "latest_orders": []
-                })
-                continue
-            # 활성 구간 주문들 (입장 이후~)
-            orders = Order.objects.filter(table=table, created_at__gte=activated_at).order_by('created_at')
-            first_order = orders.first()
-            first_order_time = first_order.created_at if first_order else None
-            total_amount = sum(o.order_amount for o in orders)
-            status = table.status
-
-            aggregated = {}
-
-            # ✅ 단품 메뉴 합산
-            order_menus = OrderMenu.objects.filter(
-                order__in=orders, ordersetmenu__isnull=True
-            ).select_related("menu", "order")
-
-            for om in order_menus:
-                key = f"menu_{om.menu_id}_{om.fixed_price}"
-                if key not in aggregated:
-                    aggregated[key] = {
-                        "menu_name":  om.menu.menu_name,
-                        "quantity": 0,
-                        "fixed_price": om.fixed_price,
-                        "latest_created_at": om.order.created_at,
-                    }
-                aggregated[key]["quantity"] += om.quantity
-                # 최신 주문시간 업데이트
-                if om.order.created_at > aggregated[key]["latest_created_at"]:
-                    aggregated[key]["latest_created_at"] = om.order.created_at
-
-            # ✅ 세트 메뉴 합산
-            order_sets = OrderSetMenu.objects.filter(
-                order__in=orders
-            ).select_related("set_menu", "order")
-
-            for osm in order_sets:
-                key = f"set_{osm.set_menu_id}_{osm.fixed_price}"
-                if key not in aggregated:
-                    aggregated[key] = {
-                        "menu_name": osm.set_menu.set_name,
-                        "quantity": 0,
-                        "fixed_price": osm.fixed_price,
-                        "latest_created_at": osm.order.created_at,
-                    }
-                aggregated[key]["quantity"] += osm.quantity
-                if osm.order.created_at > aggregated[key]["latest_created_at"]:
-                    aggregated[key]["latest_created_at"] = osm.order.created_at
-
-            # ✅ 최신순 정렬 후 상위 3개만 추출
-            latest_orders_json = sorted(
-                aggregated.values(),
-                key=lambda x: x["latest_created_at"],
-                reverse=True
-            )[:3]
-
-            # created_at 제거
-            for item in latest_orders_json:
-                item.pop("latest_created_at", None)
-
-            result.append({
-                "table_num": table.table_num,
-                "table_amount": total_amount,
-                "table_status": table.status,
-                "created_at": first_order_time,
-                "latest_orders": latest_orders_json
-            })
+        # 테이블 수와 무관하게 쿼리 3회 (합계/첫 주문 + 최근 항목 윈도 집계)
+        result = build_table_board(booth_id)
 
         return Response({
             "status": "success",
@@ -400,14 +303,13 @@ class TableListView(APIView):
         }, status=200)
         
 class TableDetailView(APIView):
+    authentication_classes = [BoothClaimAuthentication]
     permission_classes = [IsAuthenticated, IsManagerUser]
 
     def get(self, request, table_num):
-        user = request.user
-        manager = user.manager_profile
-        booth = manager.booth
+        booth_id = get_request_booth_id(request)
 
-        table = Table.objects.filter(booth=booth, table_num=table_num).first()
+        table = Table.objects.filter(booth_id=booth_id, table_num=table_num).first()
         if not table:
             return Response({
                 "status": "error",
@@ -432,8 +334,8 @@ class TableDetailView(APIView):
                 }
             }, status=200)
 
-        # 활성화 구간 전체 주문 집계
-        orders = Order.objects.filter(table=table, created_at__gte=activated_at).order_by("created_at")
+        # 현재 세션 전체 주문 집계
+        orders = Order.objects.filter(session_id=table.current_session_id).order_by("created_at")
         total_amount = sum(o.order_amount for o in orders)
     
         
@@ -571,17 +473,22 @@ class TableResetAPIView(APIView):
             }, status=404)
 
         try:
-            # 5. 상태 out, 활성화 필드 초기화 (주문, 매출에는 영향 X)
-            table.status = "out"
-            table.deactivated_at = timezone.now()   #  퇴장 시각 기록
-            table.activated_at = None               # 활성화 정보 초기화
-            table.save(update_fields=['status', 'activated_at', 'deactivated_at'])
-            # 2️⃣ 장바구니 삭제 (히스토리 남기지 않고 바로 제거)
-            Cart.objects.filter(table=table, is_ordered=False).delete()
+            # 5. 상태 out, 활성화 필드 초기화 + 세션 종료 (주문, 매출에는 영향 X)
+            with transaction.atomic():
+                table.status = "out"
+                table.deactivated_at = timezone.now()   #  퇴장 시각 기록
+                table.activated_at = None               # 활성화 정보 초기화
+                end_session(table, table.deactivated_at)
+                table.save(update_fields=['status', 'activated_at', 'deactivated_at', 'current_session'])
+                notify_table_timers(booth.id)
+                # 2️⃣ 장바구니 삭제 (히스토리 남기지 않고 바로 제거)
+                get_cart_store().discard_tables([table.id])
+            invalidate_snapshot(booth.id, "tables")
+            invalidate_snapshot(booth.id, "cook_queue")  # 세션이 끝난 테이블 주문은 대기열에서 빠짐
 
             # 통계 업데이트 push
-            from statistic.utils import push_statistics
-            push_statistics(booth.id)
+            from statistic.utils import schedule_push_statistics
+            schedule_push_statistics(booth.id)
 
             return Response({
                 "status": "success",
@@ -619,31 +526,36 @@ class BoothDeleteAPIView(APIView):
 
         try:
             with transaction.atomic():
-                # --- 재고 복원 ---
+                # --- 재고 복원 (메뉴별로 모아 UPDATE 한 번) ---
+                restore = defaultdict(int)
                 order_menus = OrderMenu.objects.filter(order__table__booth=booth)
-                for om in order_menus.select_related("menu"):
-                    menu = om.menu
-                    menu.menu_amount = F("menu_amount") + om.quantity
-                    menu.save(update_fields=["menu_amount"])
+                for menu_id, quantity in order_menus.values_list("menu_id", "quantity"):
+                    restore[menu_id] += quantity
 
                 order_setmenus = OrderSetMenu.objects.filter(order__table__booth=booth)
-                for osm in order_setmenus.select_related("set_menu"):
+                for osm in order_setmenus.prefetch_related("set_menu__menu_items"):
                     for item in osm.set_menu.menu_items.all():
-                        menu = item.menu
-                        menu.menu_amount = F("menu_amount") + (item.quantity * osm.quantity)
-                        menu.save(update_fields=["menu_amount"])
+                        restore[item.menu_id] += item.quantity * osm.quantity
+                restock(restore)
 
                 # 주문/장바구니/직원호출/테이블이력 삭제
                 Order.objects.filter(table__booth=booth).delete()
                 Cart.objects.filter(table__booth=booth).delete()
+                get_cart_store().discard_tables(list(Table.objects.filter(booth=booth).values_list("id", flat=True)))
                 StaffCall.objects.filter(booth=booth).delete()
                 from booth.models import TableUsage
                 TableUsage.objects.filter(booth=booth).delete()
+                from statistic.counters import reset_booth_statistic
+                reset_booth_statistic(booth.id)
 
-                # 테이블 상태 초기화
+                # 테이블 상태 / 이용 세션 초기화
                 Table.objects.filter(booth=booth).update(
-                    status="out", activated_at=None, deactivated_at=None
+                    status="out", activated_at=None, deactivated_at=None, current_session=None
                 )
+                TableSession.objects.filter(booth=booth).delete()
+                notify_table_timers(booth.id)
+                for kind in ("orders", "tables", "statistics", "cook_queue"):
+                    transaction.on_commit(lambda kind=kind: invalidate_snapshot(booth.id, kind))
 
                 # 쿠폰 사용 내역 초기화
                 TableCoupon.objects.filter(table__booth=booth).delete()
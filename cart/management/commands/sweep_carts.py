@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from cart.utils.cart_sweeper import sweep_carts
+
+
+class Command(BaseCommand):
+    help = "버려진 장바구니 / 끝난 세션의 쿠폰 예약 / 주문된 장바구니 항목 정리 (chunk 단위 트랜잭션)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, help="트랜잭션당 행 수 (기본 CART_SWEEP_CHUNK_SIZE)")
+        parser.add_argument("--max-age", type=int, help="이 초보다 오래된 주문 전 장바구니 삭제 (기본 CART_TTL_SECONDS)")
+
+    def handle(self, *args, **options):
+        report = sweep_carts(max_age_seconds=options["max_age"], chunk_size=options["chunk_size"])
+        for kind, count in sorted(report.counts.items()):
+            self.stdout.write(f"{kind}: {count}")
+
+        if report.rows:
+            self.stdout.write(self.style.WARNING(f"{report.rows}개 행 정리 ({report.summary()})"))
+        else:
+            self.stdout.write(self.style.SUCCESS("정리할 장바구니 없음"))
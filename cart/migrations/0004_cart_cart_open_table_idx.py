@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_cart_applied_coupon'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('is_ordered', False)), fields=['table'], name='cart_open_table_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Q, Subquery
+
+
+def _session_of(TableSession, created_field):
+    # 같은 테이블에서 생성 시각을 포함하는 세션 (가장 최근 시작)
+    return Subquery(
+        TableSession.objects.filter(
+            table_id=OuterRef("table_id"),
+            started_at__lte=OuterRef(created_field),
+        )
+        .filter(Q(ended_at__isnull=True) | Q(ended_at__gte=OuterRef(created_field)))
+        .order_by("-started_at")
+        .values("pk")[:1]
+    )
+
+
+def backfill_cart_sessions(apps, schema_editor):
+    # 기존 장바구니를 생성 시각이 속한 세션에 연결 (UPDATE 1회)
+    Cart = apps.get_model("cart", "Cart")
+    TableSession = apps.get_model("booth", "TableSession")
+
+    Cart.objects.filter(session__isnull=True).update(session=_session_of(TableSession, "created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booth', '0010_tablesession'),
+        ('cart', '0004_cart_cart_open_table_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='carts', to='booth.tablesession'),
+        ),
+        migrations.RunPython(backfill_cart_sessions, migrations.RunPython.noop),
+    ]
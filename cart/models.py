@@ -1,9 +1,13 @@
 from django.db import models
-from booth.models import Table
+from booth.models import Table, TableSession, current_session_id
 from menu.models import SetMenu, Menu
 
 class Cart(models.Model):
     table = models.ForeignKey(Table, on_delete=models.CASCADE)
+    # 장바구니를 만든 테이블 세션 (세션이 바뀌면 이전 장바구니는 무시)
+    session = models.ForeignKey(
+        TableSession, null=True, blank=True, on_delete=models.SET_NULL, related_name="carts"
+    )
     is_ordered = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -15,10 +19,21 @@ class Cart(models.Model):
         on_delete=models.SET_NULL,
         related_name="applied_carts"
     )
-    
+
+    class Meta:
+        indexes = [
+            # 테이블의 주문 전 장바구니
+            models.Index(fields=["table"], name="cart_open_table_idx", condition=models.Q(is_ordered=False)),
+        ]
+
     def __str__(self):
         return f"Cart #{self.id} (Table {self.table.table_num})"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.session_id is None and self.table_id:
+            self.session_id = current_session_id(self.table_id)
+        super().save(*args, **kwargs)
+
 class CartMenu(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_menus")
     menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from cart.models import Cart, CartMenu, CartSetMenu
 from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import get_set_components, get_stock, set_capacities
 
 
 class CartMenuSerializer(serializers.ModelSerializer):
@@ -50,21 +51,16 @@ class CartSetMenuSerializer(serializers.ModelSerializer):
         return None
     
     def get_min_menu_amount(self, obj):
-        set_items = SetMenuItem.objects.filter(set_menu=obj.set_menu)
-        return min(
-            [item.menu.menu_amount // item.quantity for item in set_items if item.quantity > 0],
-            default=0
-        )
+        return set_capacities([obj.set_menu_id]).get(obj.set_menu_id, 0)
 
     def get_is_soldout(self, obj):
         """
         세트 구성 중 하나라도 재고가 부족하면 품절 처리
         예: 세트에 '콜라 2개' 포함인데 콜라 재고가 1개면 soldout = True
         """
-        for item in SetMenuItem.objects.filter(set_menu=obj.set_menu).select_related("menu"):
-            if item.menu.menu_amount < item.quantity * obj.quantity:
-                return True
-        return False
+        components = get_set_components([obj.set_menu_id]).get(obj.set_menu_id, [])
+        stock = get_stock(menu_id for menu_id, _ in components)
+        return any(stock.get(menu_id, 0) < unit * obj.quantity for menu_id, unit in components)
 
     def get_original_price(self, obj):
         """
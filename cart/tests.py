@@ -0,0 +1,337 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+import redis
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from booth.utils.table_session import end_session
+from cart.models import Cart, CartMenu
+from cart.utils import cart_store
+from cart.utils.cart_quote import build_quote, get_quote
+from cart.utils.cart_store import MENU, SET_MENU, CartNotFound, get_cart_store
+from cart.utils.cart_sweeper import sweep_carts
+from coupon.models import Coupon, CouponCode, TableCoupon
+from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import refresh_stock
+from order.models import Order, OrderMenu
+from order.tests import IN_MEMORY_CHANNEL_LAYERS, LOCMEM_CACHES, TEST_MEDIA_ROOT, OrderFixtureMixin
+
+TEST_REDIS_URL = "redis://127.0.0.1:6379/15"
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(TEST_REDIS_URL, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+class CartStoreSuite(OrderFixtureMixin):
+    """두 백엔드 공통: 담기 → 수정 → 조회 → 체크아웃 / 초기화"""
+
+    def setUp(self):
+        cache.clear()
+        cart_store._stores.clear()
+        self.create_booth(table_count=2)
+        self.client = APIClient()
+        self.headers = {"HTTP_BOOTH_ID": str(self.booth.id)}
+
+    def add(self, type_, item_id, quantity, cart_id=None, table_num=1):
+        data = {"table_num": table_num, "type": type_, "id": item_id, "quantity": quantity}
+        if cart_id:
+            data["cart_id"] = cart_id
+        return self.client.post("/api/v2/cart/", data, format="json", **self.headers)
+
+    def test_add_update_and_detail(self):
+        resp = self.add("menu", self.food.id, 1)
+        self.assertEqual(resp.status_code, 201)
+        cart_id = resp.data["data"]["cart_id"]
+        resp = self.add("menu", self.food.id, 2, cart_id)
+        self.assertEqual(resp.data["data"]["cart_item"]["quantity"], 3)
+        self.add("set_menu", self.set_menu.id, 1, cart_id)
+        self.add("menu", self.drink.id, 1, cart_id)
+
+        resp = self.client.patch(
+            "/api/v2/cart/menu/", {"cart_id": cart_id, "type": "menu", "id": self.drink.id, "quantity": 0},
+            format="json", **self.headers,
+        )
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.patch(
+            "/api/v2/cart/menu/", {"cart_id": cart_id, "type": "menu", "id": self.drink.id, "quantity": 2},
+            format="json", **self.headers,
+        )
+        self.assertEqual(resp.status_code, 404)
+
+        resp = self.client.get("/api/v2/cart/detail/", {"cart_id": cart_id}, **self.headers)
+        data = resp.data["data"]
+        self.assertEqual([(m["id"], m["quantity"]) for m in data["cart"]["menus"]], [(self.food.id, 3)])
+        self.assertEqual([(m["id"], m["quantity"]) for m in data["cart"]["set_menus"]], [(self.set_menu.id, 1)])
+        self.assertEqual((data["subtotal"], data["total_price"]), (3 * 5000 + 6000, 21000))
+
+        resp = self.client.get("/api/v2/cart/exists/", {"cartId": cart_id}, **self.headers)
+        self.assertTrue(resp.data["data"]["has_cart_items"])
+
+        # 다른 테이블 / 다른 부스에서는 보이지 않음
+        self.assertEqual(self.add("menu", self.food.id, 1, cart_id, table_num=2).status_code, 404)
+        self.assertIsNone(get_cart_store().get(cart_id, booth_id=self.booth.id + 1))
+
+    def test_checkout_materializes_order(self):
+        cart_id = self.add("menu", self.food.id, 2).data["data"]["cart_id"]
+        self.add("set_menu", self.set_menu.id, 1, cart_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                "/api/v2/tables/orders/order_check/", {"password": "1234", "cart_id": cart_id},
+                format="json", **self.headers,
+            )
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual((resp.data["data"]["order_amount"], resp.data["data"]["cart_id"]), (16000, cart_id))
+        order = Order.objects.get(pk=resp.data["data"]["order_id"])
+        self.assertEqual(
+            sorted(OrderMenu.objects.filter(order=order, ordersetmenu__isnull=True).values_list("menu_id", "quantity")),
+            [(self.food.id, 2)],
+        )
+        self.assertIsNone(get_cart_store().get(cart_id))
+        self.assertEqual(
+            list(Cart.objects.filter(table=self.tables[0], is_ordered=True).values_list("id", flat=True)), [cart_id],
+        )
+        self.assertFalse(Cart.objects.filter(is_ordered=False).exists())
+
+    def test_reset_discards_open_carts(self):
+        self.client.force_authenticate(user=self.user)
+        cart_id = self.add("menu", self.food.id, 1).data["data"]["cart_id"]
+        other = self.add("menu", self.food.id, 1, table_num=2).data["data"]["cart_id"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post("/api/v2/booth/tables/1/reset/")
+        self.assertEqual(resp.status_code, 200)
+        store = get_cart_store()
+        self.assertIsNone(store.get(cart_id))
+        self.assertEqual(store.quantity(store.get(other), MENU, self.food.id), 1)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0, CART_BACKEND="orm",
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrmCartStoreTest(CartStoreSuite, TestCase):
+    pass
+
+
+@skipUnless(redis_available(), "Redis 서버 없음")
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    CART_BACKEND="redis", CART_REDIS_URL=TEST_REDIS_URL, MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class RedisCartStoreTest(CartStoreSuite, TestCase):
+
+    def setUp(self):
+        redis.Redis.from_url(TEST_REDIS_URL).flushdb()
+        super().setUp()
+
+    def test_lines_live_in_redis_until_checkout(self):
+        resp = self.add("menu", self.food.id, 1)
+        cart_id = resp.data["data"]["cart_id"]
+        self.assertFalse(Cart.objects.exists())
+        client = get_cart_store().client
+        self.assertEqual(client.hget(f"cart:{cart_id}", f"m:{self.food.id}"), b"1")
+        self.assertGreater(client.ttl(f"cart:{cart_id}"), 0)
+
+    def test_write_after_expiry_does_not_recreate_hash(self):
+        """get() 이후 TTL 로 해시가 사라지면 쓰기는 CartNotFound, 메타 없는 해시를 만들지 않음"""
+        store = get_cart_store()
+        cart = store.create(self.tables[0])
+        store.add(cart, MENU, self.food.id, 1)
+        store.client.delete(f"cart:{cart.id}")
+
+        for write in (
+            lambda: store.add(cart, MENU, self.food.id, 1),
+            lambda: store.set_quantity(cart, MENU, self.food.id, 2),
+            lambda: store.set_quantity(cart, MENU, self.food.id, 0),
+            lambda: store.set_coupon(cart, None),
+        ):
+            with self.assertRaises(CartNotFound):
+                write()
+        self.assertFalse(store.client.exists(f"cart:{cart.id}"))
+        self.assertIsNone(store.get(cart.id))
+
+    def test_cart_ids_share_cart_sequence(self):
+        """redis 장바구니 id 와 Cart 행 id 는 같은 시퀀스 → 주문 이력 Cart 행과 겹치지 않음"""
+        store = get_cart_store()
+        first = store.create(self.tables[0])
+        row = Cart.objects.create(table=self.tables[1], session_id=self.tables[1].current_session_id)
+        second = store.create(self.tables[0])
+        self.assertEqual(len({first.id, row.id, second.id}), 3)
+
+        with transaction.atomic():
+            store.checkout(second)
+        self.assertTrue(Cart.objects.filter(pk=second.id, table=self.tables[0], is_ordered=True).exists())
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, CART_BACKEND="orm", CART_QUOTE_CACHE_TTL=5,
+    MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0,
+)
+class CartQuoteTest(OrderFixtureMixin, TestCase):
+    """견적: 금액 / 재고 부족 / 쿼리 수 / 버전별 캐시"""
+
+    def setUp(self):
+        cache.clear()
+        cart_store._stores.clear()
+        self.create_booth()
+        self.client = APIClient()
+        self.headers = {"HTTP_BOOTH_ID": str(self.booth.id)}
+        self.store = get_cart_store()
+        self.cart = self.store.create(self.tables[0])
+
+    def test_totals_and_coupon(self):
+        self.store.add(self.cart, MENU, self.food.id, 2)
+        self.store.add(self.cart, MENU, self.seat_fee.id, 1)
+        self.store.add(self.cart, SET_MENU, self.set_menu.id, 1)
+        coupon = Coupon.objects.create(
+            booth=self.booth, coupon_name="15%", discount_type="PERCENT", discount_value=15, quantity=1,
+        )
+        CouponCode.objects.create(coupon=coupon, code="ABCD")
+
+        quote = build_quote(self.cart, "abcd")
+        self.assertEqual((quote.subtotal, quote.table_fee, quote.total), (16000, 5000, 21000))
+        self.assertEqual((quote.discount, quote.total_after_discount), (3150, 17850))
+        self.assertTrue(quote.has_seat_fee)
+        self.assertEqual(quote.coupon_info()["code"], "ABCD")
+        self.assertEqual(quote.shortfalls, ())
+
+        # 쿠폰 적용 응답도 같은 할인 계산
+        resp = self.client.post(
+            "/api/v2/cart/apply-coupon/", {"cart_id": self.cart.id, "coupon_code": "abcd"}, format="json", **self.headers,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data["data"]["total_price_before"], resp.data["data"]["total_price_after"]), (21000, 17850))
+
+    def test_shortfalls_in_cart_order(self):
+        Menu.objects.filter(pk=self.drink.pk).update(menu_amount=1)
+        self.store.add(self.cart, MENU, self.food.id, 1)
+        self.store.add(self.cart, SET_MENU, self.set_menu.id, 2)
+
+        quote = build_quote(self.cart)
+        self.assertEqual([(s.menu_id, s.required, s.available) for s in quote.shortfalls], [(self.drink.id, 2, 1)])
+
+        resp = self.client.get("/api/v2/cart/payment-info/", {"cart_id": self.cart.id}, **self.headers)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["message"], "사이다은(는) 최대 1개까지만 주문할 수 있어요!")
+
+    def test_payment_info_ignores_cached_quote(self):
+        """결제 정보의 품절 검사는 견적 캐시 (장바구니 버전 기준) 와 무관하게 현재 재고로"""
+        self.store.add(self.cart, MENU, self.drink.id, 2)
+        self.assertFalse(get_quote(self.cart).shortfalls)
+        resp = self.client.get("/api/v2/cart/payment-info/", {"cart_id": self.cart.id}, **self.headers)
+        self.assertEqual(resp.status_code, 200)
+
+        # 다른 주문으로 재고 소진 (장바구니 버전은 그대로)
+        Menu.objects.filter(pk=self.drink.pk).update(menu_amount=1)
+        refresh_stock([self.drink.id])
+        resp = self.client.get("/api/v2/cart/payment-info/", {"cart_id": self.cart.id}, **self.headers)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["message"], "사이다은(는) 최대 1개까지만 주문할 수 있어요!")
+
+    def test_query_count_independent_of_cart_size(self):
+        self.store.add(self.cart, MENU, self.food.id, 1)
+        self.store.add(self.cart, SET_MENU, self.set_menu.id, 1)
+        build_quote(self.cart)  # 재고 캐시 채움
+        with self.assertNumQueries(5) as small:
+            build_quote(self.cart)
+
+        big = self.store.create(self.tables[1])
+        for i in range(8):
+            menu = Menu.objects.create(
+                booth=self.booth, menu_name=f"메뉴{i}", menu_category="메뉴", menu_price=1000, menu_amount=100,
+            )
+            set_menu = SetMenu.objects.create(booth=self.booth, set_name=f"세트{i}", set_price=3000)
+            SetMenuItem.objects.create(set_menu=set_menu, menu=menu, quantity=2)
+            SetMenuItem.objects.create(set_menu=set_menu, menu=self.food, quantity=1)
+            self.store.add(big, MENU, menu.id, 1)
+            self.store.add(big, SET_MENU, set_menu.id, 1)
+        build_quote(big)
+        with self.assertNumQueries(len(small.captured_queries)):
+            quote = build_quote(big)
+        self.assertEqual(quote.subtotal, 8 * 1000 + 8 * 3000)
+
+    def test_cache_follows_cart_version(self):
+        self.store.add(self.cart, MENU, self.food.id, 1)
+        self.assertEqual(get_quote(self.cart).subtotal, 5000)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quote(self.cart).subtotal, 5000)
+
+        self.store.add(self.cart, MENU, self.food.id, 1)
+        self.assertEqual(get_quote(self.cart).subtotal, 10000)
+        self.store.set_quantity(self.cart, MENU, self.food.id, 0)
+        self.assertTrue(get_quote(self.cart).is_empty)
+
+
+@override_settings(CART_TTL_SECONDS=60 * 60, MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class CartSweepTest(OrderFixtureMixin, TestCase):
+    """버려진 장바구니 / 끝난 세션 쿠폰 예약 / 주문된 장바구니 항목 정리"""
+
+    def setUp(self):
+        self.create_booth(table_count=3)
+        self.coupon = Coupon.objects.create(
+            booth=self.booth, coupon_name="천원", discount_type="amount", discount_value=1000, quantity=2,
+        )
+        now = timezone.now()
+
+        # 테이블 1: 진행 중인 장바구니 (유지) + 오래된 쿠폰 장바구니 (삭제, 예약 해제)
+        self.fresh = Cart.objects.create(table=self.tables[0])
+        CartMenu.objects.create(cart=self.fresh, menu=self.food, quantity=1)
+        self.old = Cart.objects.create(table=self.tables[0], applied_coupon=self.coupon)
+        CartMenu.objects.create(cart=self.old, menu=self.food, quantity=1)
+        Cart.objects.filter(pk=self.old.pk).update(created_at=now - timedelta(hours=2))
+        self.reserved = CouponCode.objects.create(coupon=self.coupon, code="OLD1", issued_to_table=self.tables[0])
+        TableCoupon.objects.create(table=self.tables[0], coupon=self.coupon)
+
+        # 테이블 2: 세션이 끝난 장바구니 (삭제)
+        self.ended = Cart.objects.create(table=self.tables[1])
+        CartMenu.objects.create(cart=self.ended, menu=self.drink, quantity=1)
+        end_session(self.tables[1], now)
+        self.tables[1].save(update_fields=["current_session"])
+
+        # 테이블 3: 세션 없이 남은 쿠폰 예약 (해제)
+        self.stale = CouponCode.objects.create(coupon=self.coupon, code="OLD2", issued_to_table=self.tables[2])
+        TableCoupon.objects.create(table=self.tables[2], coupon=self.coupon)
+        end_session(self.tables[2], now)
+        self.tables[2].save(update_fields=["current_session"])
+
+        # 주문된 장바구니: 항목만 삭제
+        self.ordered = Cart.objects.create(table=self.tables[0], is_ordered=True)
+        CartMenu.objects.create(cart=self.ordered, menu=self.food, quantity=2)
+
+    def test_sweep_in_chunks(self):
+        report = sweep_carts(chunk_size=1)
+        self.assertEqual(dict(report.counts), {
+            "carts": 2, "cart_lines": 2, "coupon_codes": 2, "table_coupons": 2, "ordered_cart_lines": 1,
+        })
+        self.assertEqual(report.chunks, 5)
+
+        self.assertEqual(set(Cart.objects.values_list("pk", flat=True)), {self.fresh.pk, self.ordered.pk})
+        self.assertEqual(list(CartMenu.objects.values_list("cart_id", flat=True)), [self.fresh.pk])
+        self.assertFalse(CouponCode.objects.filter(issued_to_table__isnull=False).exists())
+        self.assertFalse(TableCoupon.objects.exists())
+
+        self.assertEqual(sweep_carts().rows, 0)
+
+    def test_keeps_reservation_of_live_cart(self):
+        Cart.objects.filter(pk=self.fresh.pk).update(applied_coupon=self.coupon)
+        sweep_carts()
+        self.reserved.refresh_from_db()
+        self.assertEqual(self.reserved.issued_to_table_id, self.tables[0].id)
+        self.assertTrue(TableCoupon.objects.filter(table=self.tables[0]).exists())
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command("sweep_carts", "--chunk-size", "2", stdout=out)
+        self.assertIn("carts: 2", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
@@ -0,0 +1,199 @@
+"""
+장바구니 견적 (CartQuote)
+
+장바구니 상세 / 결제 정보 / 쿠폰 적용 / 주문 확인 (GET) / 체크아웃이 소계·이용료·할인·재고를 각자 다시 계산하던 것을 한 곳으로
+- 조회 쿼리 수 고정: 장바구니 항목 (저장소) + 메뉴 1회 + 세트·구성 2회 (prefetch) + 쿠폰 코드 1회
+  재고는 menu_stock.stock_for (캐시, 부족해 보이면 DB 재확인)
+- 결과는 읽기 전용 CartQuote (항목 / 소계 / 이용료 / 할인 / 재고 부족 / 다른 부스 메뉴)
+- 장바구니 버전 (저장소가 쓸 때마다 +1) 별로 CART_QUOTE_CACHE_TTL 초 동안 캐시
+  메뉴 가격 / 재고 변경은 버전과 무관 → 캐시 (get_quote) 는 화면 표시용 (장바구니 상세 / 주문 확인)
+  결제 정보 (품절 검사) / 쿠폰 적용 / 체크아웃은 build_quote 로 매번 계산, 체크아웃 금액은 잠근 행 기준 (place_order)
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from cart.models import CartMenu, CartSetMenu
+from cart.utils.cart_store import MENU, SET_MENU, get_cart_store
+from coupon.models import CouponCode
+from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import stock_for
+
+logger = logging.getLogger(__name__)
+
+SEAT_FEE_CATEGORY = "seat_fee"
+
+
+def coupon_discount(coupon, total):
+    """쿠폰 할인액 (정률은 내림, 결제 금액을 넘지 않음)"""
+    if coupon is None:
+        return 0
+    if coupon.discount_type.lower() == "percent":
+        return min(int(total * coupon.discount_value / 100), total)
+    return min(int(coupon.discount_value), total)
+
+
+class QuoteLine:
+    """견적 항목 한 줄 (단품 / 세트 / 이용료)"""
+
+    def __init__(self, kind, item_id, name, unit_price, quantity, is_seat_fee=False):
+        self.kind = kind
+        self.item_id = item_id
+        self.name = name
+        self.unit_price = unit_price
+        self.quantity = quantity
+        self.is_seat_fee = is_seat_fee
+
+    @property
+    def amount(self):
+        return (self.unit_price or 0) * self.quantity
+
+
+class Shortfall:
+    """재고 부족 (장바구니 항목 순서, 기존 응답 문구)"""
+
+    def __init__(self, menu_id, menu_name, required, available):
+        self.menu_id = menu_id
+        self.menu_name = menu_name
+        self.required = required
+        self.available = available
+
+    @property
+    def message(self):
+        if self.available <= 0:
+            return f"{self.menu_name}은(는) 품절된 메뉴예요!"
+        return f"{self.menu_name}은(는) 최대 {self.available}개까지만 주문할 수 있어요!"
+
+
+class CartQuote:
+    """장바구니 견적 (읽기 전용)"""
+
+    def __init__(self, cart, cart_menus, cart_sets, lines, missing, shortfalls, coupon_code=None):
+        self.cart_id = cart.id
+        self.booth_id = cart.table.booth_id
+        self.cart_menus = tuple(cart_menus)   # CartMenu (menu 포함) - 시리얼라이저 / place_order 용
+        self.cart_sets = tuple(cart_sets)     # CartSetMenu (set_menu + menu_items 포함)
+        self.lines = tuple(lines)
+        self.missing = tuple(missing)         # [(kind, item_id)] 다른 부스 / 삭제된 메뉴
+        self.shortfalls = tuple(shortfalls)
+        self.subtotal = sum(line.amount for line in self.lines if not line.is_seat_fee)
+        self.table_fee = sum(line.amount for line in self.lines if line.is_seat_fee)
+        self.coupon_code = coupon_code
+        self.coupon = coupon_code.coupon if coupon_code else None
+        self.discount = coupon_discount(self.coupon, self.total)
+
+    @property
+    def total(self):
+        return self.subtotal + self.table_fee
+
+    @property
+    def total_after_discount(self):
+        return max(self.total - self.discount, 0)
+
+    @property
+    def is_empty(self):
+        return not self.cart_menus and not self.cart_sets
+
+    @property
+    def has_seat_fee(self):
+        return any(line.is_seat_fee for line in self.lines)
+
+    def menu_quantity(self, menu_id):
+        return sum(cm.quantity for cm in self.cart_menus if cm.menu_id == menu_id)
+
+    def coupon_info(self):
+        if self.coupon is None:
+            return None
+        return {
+            "coupon_name": self.coupon.coupon_name,
+            "discount_type": self.coupon.discount_type.lower(),
+            "discount_value": self.coupon.discount_value,
+            "code": self.coupon_code.code,
+        }
+
+
+def _shortfalls(cart_menus, cart_sets, stock):
+    """단품은 항목별 수량, 세트는 구성별 (구성 수량 × 세트 수량) 로 재고와 비교 (항목 순서)"""
+    result = []
+    for cm in cart_menus:
+        available = stock.get(cm.menu_id, 0)
+        if available <= 0 or available < cm.quantity:
+            result.append(Shortfall(cm.menu_id, cm.menu.menu_name, cm.quantity, available))
+    for cs in cart_sets:
+        for smi in cs.set_menu.menu_items.all():
+            required = smi.quantity * cs.quantity
+            available = stock.get(smi.menu_id, 0)
+            if available <= 0 or available < required:
+                result.append(Shortfall(smi.menu_id, smi.menu.menu_name, required, available))
+    return result
+
+
+def build_quote(cart, coupon_code=None):
+    """장바구니 견적 계산 (캐시 없이), coupon_code: 부스의 미사용 쿠폰 코드 문자열"""
+    booth_id = cart.table.booth_id
+    menu_qty, set_qty = get_cart_store().quantities(cart)
+
+    menus = Menu.objects.in_bulk(menu_qty) if menu_qty else {}
+    sets = {}
+    if set_qty:
+        sets = SetMenu.objects.prefetch_related(
+            Prefetch("menu_items", queryset=SetMenuItem.objects.select_related("menu").order_by("id"))
+        ).in_bulk(set_qty)
+
+    cart_menus, cart_sets, lines, missing = [], [], [], []
+    for menu_id, quantity in menu_qty.items():
+        menu = menus.get(menu_id)
+        if menu is None or menu.booth_id != booth_id:
+            missing.append((MENU, menu_id))
+            continue
+        cart_menus.append(CartMenu(cart_id=cart.id, menu=menu, quantity=quantity))
+        lines.append(QuoteLine(
+            MENU, menu_id, menu.menu_name, menu.menu_price, quantity,
+            is_seat_fee=menu.menu_category == SEAT_FEE_CATEGORY,
+        ))
+    for set_id, quantity in set_qty.items():
+        set_menu = sets.get(set_id)
+        if set_menu is None or set_menu.booth_id != booth_id:
+            missing.append((SET_MENU, set_id))
+            continue
+        cart_sets.append(CartSetMenu(cart_id=cart.id, set_menu=set_menu, quantity=quantity))
+        lines.append(QuoteLine(SET_MENU, set_id, set_menu.set_name, set_menu.set_price, quantity))
+
+    needs = {}
+    for cm in cart_menus:
+        needs[cm.menu_id] = needs.get(cm.menu_id, 0) + cm.quantity
+    for cs in cart_sets:
+        for smi in cs.set_menu.menu_items.all():
+            needs[smi.menu_id] = needs.get(smi.menu_id, 0) + smi.quantity * cs.quantity
+    stock = stock_for(needs) if needs else {}
+
+    code = None
+    if coupon_code:
+        code = CouponCode.objects.filter(
+            code=str(coupon_code).upper(), coupon__booth_id=booth_id, used_at__isnull=True,
+        ).select_related("coupon").first()
+
+    return CartQuote(cart, cart_menus, cart_sets, lines, missing, _shortfalls(cart_menus, cart_sets, stock), code)
+
+
+def get_quote(cart, coupon_code=None):
+    """화면 표시용 견적 - 장바구니 버전별 캐시 (CART_QUOTE_CACHE_TTL 초, 0 이면 사용 안 함)"""
+    ttl = getattr(settings, "CART_QUOTE_CACHE_TTL", 5)
+    if not ttl:
+        return build_quote(cart, coupon_code)
+
+    try:
+        key = f"cart_quote:{cart.id}:{get_cart_store().version(cart)}:{(coupon_code or '').upper()}"
+        quote = cache.get(key)
+    except Exception:
+        logger.warning(f"cart quote cache unavailable for cart {cart.id}", exc_info=True)
+        return build_quote(cart, coupon_code)
+    if quote is None:
+        quote = build_quote(cart, coupon_code)
+        try:
+            cache.set(key, quote, timeout=ttl)
+        except Exception:
+            logger.warning(f"cart quote cache store failed for cart {cart.id}", exc_info=True)
+    return quote
@@ -0,0 +1,336 @@
+"""
+장바구니 저장소 (CART_BACKEND: "orm" | "redis")
+
+장바구니는 대부분 몇 분 안에 주문되거나 버려지는데 담기/수량 변경마다 Cart / CartMenu / CartSetMenu 행을 씀
+→ 초기화 때 지우고, 버려진 장바구니는 계속 쌓임
+- 뷰는 get_cart_store() 의 공통 메서드만 사용 (장바구니 조회 / 담기 / 수량 변경 / 쿠폰 / 체크아웃 / 정리)
+- orm  : 기존과 같이 Cart / CartMenu / CartSetMenu 행
+- redis: 장바구니 하나 = 해시 cart:{id} (메타 + 항목 m:{menu_id} / s:{set_id} → 수량), 쓸 때마다 TTL 갱신
+         담기는 HINCRBY 로 원자적, 테이블별 장바구니 id 는 cart:table:{table_id} 집합
+         체크아웃 때만 Cart 행 (is_ordered=True, 같은 id) 으로 남기고 해시 삭제
+- 저장소는 항목 수량 ({menu_id: 수량}, {set_menu_id: 수량}) 만 돌려줌
+  → 메뉴 / 가격 / 재고는 견적 (cart/utils/cart_quote.py) 에서 CartMenu / CartSetMenu 인스턴스로 (redis 는 저장하지 않은 인스턴스)
+- 담기 / 수정 / 쿠폰 변경마다 장바구니 버전 (캐시 키 cart_version:{id}) +1 → 견적 캐시 키 (cart/utils/cart_quote.py)
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404
+
+from booth.models import Table
+from cart.models import Cart, CartMenu, CartSetMenu
+
+logger = logging.getLogger(__name__)
+
+MENU, SET_MENU = "menu", "set_menu"
+
+_stores = {}
+
+
+class CartNotFound(Http404):
+    """쓰는 도중 장바구니가 사라짐 (redis TTL 만료 등) → 뷰에서 404"""
+
+
+class StoredCart:
+    """백엔드 공통 장바구니 (CartDetailSerializer 가 읽는 속성 포함)"""
+
+    is_ordered = False
+
+    def __init__(self, id, table, session_id=None, applied_coupon_id=None):
+        self.id = id
+        self.table = table
+        self.table_id = table.id
+        self.session_id = session_id
+        self.applied_coupon_id = applied_coupon_id
+        self.cart_menus = []
+        self.cart_set_menus = []
+
+
+class CartStore:
+    """장바구니 저장소 공통 인터페이스"""
+
+    def get(self, cart_id, booth_id=None, table=None):
+        """주문 전 장바구니 (booth_id / table 이 있으면 소속까지 확인), 없으면 None"""
+        raise NotImplementedError
+
+    def create(self, table) -> StoredCart:
+        raise NotImplementedError
+
+    def quantities(self, cart):
+        """({menu_id: 수량}, {set_menu_id: 수량})"""
+        raise NotImplementedError
+
+    def _add(self, cart, kind, item_id, quantity) -> int:
+        raise NotImplementedError
+
+    def _set_quantity(self, cart, kind, item_id, quantity):
+        raise NotImplementedError
+
+    def _set_coupon(self, cart, coupon_id):
+        raise NotImplementedError
+
+    def checkout(self, cart):
+        """주문 완료 처리 (transaction.atomic 안에서 호출)"""
+        raise NotImplementedError
+
+    def discard_tables(self, table_ids):
+        """테이블 초기화: 주문 전 장바구니 삭제"""
+        raise NotImplementedError
+
+    # -------------------------------------------------------------- 공통
+
+    def add(self, cart, kind, item_id, quantity) -> int:
+        """수량 더하기 (없으면 추가), 더한 뒤 수량 반환"""
+        quantity = self._add(cart, kind, item_id, quantity)
+        self._bump(cart)
+        return quantity
+
+    def set_quantity(self, cart, kind, item_id, quantity):
+        """이미 담긴 항목의 수량 변경 (0 이면 삭제)"""
+        self._set_quantity(cart, kind, item_id, quantity)
+        self._bump(cart)
+
+    def set_coupon(self, cart, coupon_id):
+        self._set_coupon(cart, coupon_id)
+        cart.applied_coupon_id = coupon_id
+        self._bump(cart)
+
+    def version(self, cart):
+        """장바구니 버전 (견적 캐시 키)"""
+        return cache.get(f"cart_version:{cart.id}", 0)
+
+    def _bump(self, cart):
+        try:
+            key = f"cart_version:{cart.id}"
+            cache.add(key, 0, timeout=getattr(settings, "CART_TTL_SECONDS", 60 * 60 * 6))
+            cache.incr(key)
+        except Exception:
+            logger.warning(f"cart version bump failed for cart {cart.id}", exc_info=True)
+
+    def quantity(self, cart, kind, item_id):
+        """담긴 수량 (없으면 None)"""
+        menus, sets = self.quantities(cart)
+        return (menus if kind == MENU else sets).get(int(item_id))
+
+    def has_items(self, cart) -> bool:
+        menus, sets = self.quantities(cart)
+        return bool(menus or sets)
+
+
+class OrmCartStore(CartStore):
+    """Cart / CartMenu / CartSetMenu 행"""
+
+    @staticmethod
+    def _wrap(row):
+        return StoredCart(row.id, row.table, row.session_id, row.applied_coupon_id)
+
+    def get(self, cart_id, booth_id=None, table=None):
+        carts = Cart.objects.select_related("table").filter(id=cart_id, is_ordered=False)
+        if booth_id is not None:
+            carts = carts.filter(table__booth_id=booth_id)
+        if table is not None:
+            carts = carts.filter(table=table)
+        row = carts.first()
+        return self._wrap(row) if row else None
+
+    def create(self, table):
+        row = Cart.objects.create(table=table, session_id=table.current_session_id, is_ordered=False)
+        return self._wrap(row)
+
+    def quantities(self, cart):
+        menus = dict(CartMenu.objects.filter(cart_id=cart.id).order_by("id").values_list("menu_id", "quantity"))
+        sets = dict(CartSetMenu.objects.filter(cart_id=cart.id).order_by("id").values_list("set_menu_id", "quantity"))
+        return menus, sets
+
+    def has_items(self, cart):
+        return (
+            CartMenu.objects.filter(cart_id=cart.id).exists()
+            or CartSetMenu.objects.filter(cart_id=cart.id).exists()
+        )
+
+    @staticmethod
+    def _rows(kind):
+        return (CartMenu, "menu_id") if kind == MENU else (CartSetMenu, "set_menu_id")
+
+    def _add(self, cart, kind, item_id, quantity):
+        model, field = self._rows(kind)
+        item, created = model.objects.get_or_create(cart_id=cart.id, **{field: item_id}, defaults={"quantity": quantity})
+        if not created:
+            item.quantity += quantity
+            item.save()
+        return item.quantity
+
+    def _set_quantity(self, cart, kind, item_id, quantity):
+        model, field = self._rows(kind)
+        items = model.objects.filter(cart_id=cart.id, **{field: item_id})
+        if quantity == 0:
+            items.delete()
+        else:
+            items.update(quantity=quantity)
+
+    def _set_coupon(self, cart, coupon_id):
+        Cart.objects.filter(pk=cart.id).update(applied_coupon_id=coupon_id)
+
+    def checkout(self, cart):
+        CartMenu.objects.filter(cart_id=cart.id).delete()
+        CartSetMenu.objects.filter(cart_id=cart.id).delete()
+        Cart.objects.filter(pk=cart.id).update(is_ordered=True)
+
+    def discard_tables(self, table_ids):
+        Cart.objects.filter(table_id__in=table_ids, is_ordered=False).delete()
+
+
+class RedisCartStore(CartStore):
+    """
+    Redis 해시 장바구니
+    cart:{id}          → table / booth / session / coupon + m:{menu_id}, s:{set_id} → 수량 (TTL CART_TTL_SECONDS)
+    cart:table:{table} → 그 테이블 장바구니 id 집합 (초기화 때 정리)
+    장바구니 id 는 Cart 테이블 id 시퀀스에서 발급 → 체크아웃 Cart 행도 같은 id, orm 장바구니 / 백엔드 전환과 겹치지 않음
+    항목 / 쿠폰 쓰기는 해시에 table 필드가 있을 때만 (Lua) → get() 이후 TTL 로 사라졌으면 메타 없는 해시를 만들지 않고 CartNotFound
+    """
+
+    WRITE_SCRIPT = """
+    if redis.call('HEXISTS', KEYS[1], 'table') == 0 then return false end
+    local result = 1
+    if ARGV[1] == 'incr' then
+        result = redis.call('HINCRBY', KEYS[1], ARGV[2], ARGV[3])
+    elseif ARGV[1] == 'del' then
+        redis.call('HDEL', KEYS[1], ARGV[2])
+    else
+        redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    return result
+    """
+
+    def __init__(self, client=None, ttl=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(getattr(settings, "CART_REDIS_URL", "redis://127.0.0.1:6379/1"))
+        self.client = client
+        self.ttl = ttl or getattr(settings, "CART_TTL_SECONDS", 60 * 60 * 6)
+        self._write_script = client.register_script(self.WRITE_SCRIPT)
+
+    @staticmethod
+    def _key(cart_id):
+        return f"cart:{cart_id}"
+
+    @staticmethod
+    def _table_key(table_id):
+        return f"cart:table:{table_id}"
+
+    @staticmethod
+    def _field(kind, item_id):
+        return f"{'m' if kind == MENU else 's'}:{int(item_id)}"
+
+    def _next_id(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [Cart._meta.db_table])
+            return cursor.fetchone()[0]
+
+    def _touch(self, pipe, cart):
+        pipe.expire(self._key(cart.id), self.ttl)
+        pipe.expire(self._table_key(cart.table_id), self.ttl)
+
+    def get(self, cart_id, booth_id=None, table=None):
+        try:
+            cart_id = int(cart_id)
+        except (TypeError, ValueError):
+            return None
+        meta = self.client.hmget(self._key(cart_id), "table", "booth", "session", "coupon")
+        if meta[0] is None:
+            return None
+        table_id, cart_booth_id = int(meta[0]), int(meta[1])
+        if booth_id is not None and str(cart_booth_id) != str(booth_id):
+            return None
+        if table is not None:
+            if table.id != table_id:
+                return None
+        else:
+            table = Table.objects.filter(pk=table_id).first()
+            if table is None:
+                return None
+        session_id = int(meta[2]) if meta[2] else None
+        coupon_id = int(meta[3]) if meta[3] else None
+        return StoredCart(cart_id, table, session_id, coupon_id)
+
+    def create(self, table):
+        cart = StoredCart(self._next_id(), table, table.current_session_id)
+        meta = {"table": table.id, "booth": table.booth_id, "session": cart.session_id or ""}
+        with self.client.pipeline() as pipe:
+            pipe.hset(self._key(cart.id), mapping=meta)
+            pipe.sadd(self._table_key(table.id), cart.id)
+            self._touch(pipe, cart)
+            pipe.execute()
+        return cart
+
+    def quantities(self, cart):
+        menus, sets = {}, {}
+        for field, value in self.client.hgetall(self._key(cart.id)).items():
+            field = field.decode()
+            if field[:2] in ("m:", "s:") and int(value) > 0:
+                (menus if field[0] == "m" else sets)[int(field[2:])] = int(value)
+        return menus, sets
+
+    def _write(self, cart, op, field, value=""):
+        """해시가 남아 있을 때만 쓰고 TTL 갱신 (없으면 CartNotFound)"""
+        result = self._write_script(
+            keys=[self._key(cart.id), self._table_key(cart.table_id)], args=[op, field, value, self.ttl],
+        )
+        if result is None:
+            raise CartNotFound(f"cart {cart.id} expired")
+        return result
+
+    def _add(self, cart, kind, item_id, quantity):
+        return self._write(cart, "incr", self._field(kind, item_id), quantity)
+
+    def _set_quantity(self, cart, kind, item_id, quantity):
+        if quantity == 0:
+            self._write(cart, "del", self._field(kind, item_id))
+        else:
+            self._write(cart, "set", self._field(kind, item_id), quantity)
+
+    def _set_coupon(self, cart, coupon_id):
+        self._write(cart, "set", "coupon", coupon_id or "")
+
+    def checkout(self, cart):
+        # 주문 이력용 Cart 행은 이때 한 번만, 해시는 커밋 이후 삭제 (롤백되면 장바구니 유지)
+        Cart.objects.create(
+            id=cart.id, table=cart.table, session_id=cart.session_id, applied_coupon_id=cart.applied_coupon_id, is_ordered=True,
+        )
+        transaction.on_commit(lambda: self._delete([cart.id], cart.table_id))
+
+    def _delete(self, cart_ids, table_id):
+        with self.client.pipeline() as pipe:
+            pipe.delete(*[self._key(cart_id) for cart_id in cart_ids])
+            pipe.srem(self._table_key(table_id), *cart_ids)
+            pipe.execute()
+
+    def discard_tables(self, table_ids):
+        table_ids = list(table_ids)
+        if table_ids:
+            transaction.on_commit(lambda: self._discard(table_ids))
+
+    def _discard(self, table_ids):
+        with self.client.pipeline() as pipe:
+            for table_id in table_ids:
+                pipe.smembers(self._table_key(table_id))
+            members = pipe.execute()
+        keys = [self._key(int(cart_id)) for ids in members for cart_id in ids]
+        keys += [self._table_key(table_id) for table_id in table_ids]
+        self.client.delete(*keys)
+
+
+BACKENDS = {"orm": OrmCartStore, "redis": RedisCartStore}
+
+
+def get_cart_store() -> CartStore:
+    """CART_BACKEND 설정의 저장소 (프로세스당 하나)"""
+    name = getattr(settings, "CART_BACKEND", "orm")
+    if name not in _stores:
+        _stores[name] = BACKENDS[name]()
+    return _stores[name]
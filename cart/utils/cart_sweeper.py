@@ -0,0 +1,183 @@
+"""
+버려진 장바구니 / 끝난 세션 정리 (sweep_carts)
+
+주문 전 Cart 는 운영자가 테이블을 초기화할 때만 지워짐
+→ 초기화하지 않는 테이블의 장바구니, 주문된 장바구니의 CartMenu / CartSetMenu,
+  끝난 세션의 쿠폰 예약 (CouponCode.issued_to_table / TableCoupon) 이 계속 쌓여 장바구니 조회가 느려짐
+- 대상
+  1. 주문 전 장바구니 중 세션이 없거나 끝났거나 CART_TTL_SECONDS 보다 오래된 것 (redis 해시 TTL 과 같은 기준)
+     + 그 장바구니가 잡고 있던 쿠폰 예약 (같은 테이블의 다른 주문 전 장바구니가 같은 쿠폰을 쓰면 유지)
+  2. 진행 중인 세션이 없는 테이블의 쿠폰 예약 (redis 백엔드 장바구니는 TTL 로 사라지므로 이쪽으로 정리)
+  3. 주문된 장바구니의 항목 행 (Cart 행은 주문 이력으로 유지)
+- pk 순서로 CART_SWEEP_CHUNK_SIZE 개씩 잠가서 (skip_locked) 트랜잭션 하나에 처리 → 긴 잠금 / 큰 트랜잭션 없음
+  여러 프로세스가 동시에 돌아도 같은 행을 기다리지 않음
+- 관리 명령 sweep_carts (cron 등으로 주기 실행), 또는 CART_SWEEP_INTERVAL_SECONDS > 0 이면
+  전용 워커 (관리 명령 run_timer_worker) 의 주기 Task (ensure_cart_sweeper)
+- 결과는 SweepReport (종류별 행 수 / chunk 수 / 소요 시간 / 초당 처리 행 수)
+"""
+import asyncio
+import logging
+import time
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cart.models import Cart, CartMenu, CartSetMenu
+from coupon.models import CouponCode, TableCoupon
+from project.async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+# 이벤트 루프별 주기 정리 Task
+_sweepers = weakref.WeakKeyDictionary()
+
+
+class SweepReport:
+    """정리 결과 (종류별 행 수, 처리량)"""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.chunks = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add(self, kind, count):
+        if count:
+            self.counts[kind] += count
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+        return self
+
+    @property
+    def rows(self):
+        return sum(self.counts.values())
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        counts = " ".join(f"{kind}={count}" for kind, count in sorted(self.counts.items())) or "rows=0"
+        return f"{counts} chunks={self.chunks} elapsed={self.elapsed:.2f}s rate={self.rows_per_second:.0f} rows/s"
+
+
+def _chunks(queryset, fields, chunk_size, report, apply):
+    """pk 순서로 chunk_size 개씩 잠가서 (skip_locked) apply(rows), chunk 마다 트랜잭션 1회"""
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .select_for_update(skip_locked=True, of=("self",))
+                .values_list("pk", *fields)[:chunk_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            apply(rows)
+            report.chunks += 1
+
+
+def _release_coupons(pairs, report):
+    """(table_id, coupon_id) 쿠폰 예약 해제 - 같은 테이블의 남은 주문 전 장바구니가 같은 쿠폰을 쓰면 유지"""
+    if not pairs:
+        return
+    held = set(
+        Cart.objects.filter(
+            is_ordered=False,
+            table_id__in={table_id for table_id, _ in pairs},
+            applied_coupon_id__in={coupon_id for _, coupon_id in pairs},
+        ).values_list("table_id", "applied_coupon_id")
+    )
+    pairs = pairs - held
+    if not pairs:
+        return
+    report.add("coupon_codes", CouponCode.objects.filter(
+        reduce(or_, (Q(issued_to_table_id=table_id, coupon_id=coupon_id) for table_id, coupon_id in pairs)),
+        used_at__isnull=True,
+    ).update(issued_to_table=None))
+    report.add("table_coupons", TableCoupon.objects.filter(
+        reduce(or_, (Q(table_id=table_id, coupon_id=coupon_id) for table_id, coupon_id in pairs)),
+        used_at__isnull=True,
+    ).delete()[0])
+
+
+def _sweep_open_carts(cutoff, chunk_size, report):
+    expired = Cart.objects.filter(is_ordered=False).filter(
+        Q(session__isnull=True) | Q(session__ended_at__isnull=False) | Q(created_at__lt=cutoff)
+    )
+
+    def apply(rows):
+        _, deleted = Cart.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        report.add("carts", deleted.get("cart.Cart", 0))
+        report.add("cart_lines", deleted.get("cart.CartMenu", 0) + deleted.get("cart.CartSetMenu", 0))
+        _release_coupons({(table_id, coupon_id) for _, table_id, coupon_id in rows if coupon_id}, report)
+
+    _chunks(expired, ("table_id", "applied_coupon_id"), chunk_size, report, apply)
+
+
+def _sweep_stale_reservations(chunk_size, report):
+    codes = CouponCode.objects.filter(
+        used_at__isnull=True, issued_to_table__isnull=False, issued_to_table__current_session__isnull=True,
+    )
+    _chunks(codes, (), chunk_size, report, lambda rows: report.add(
+        "coupon_codes", CouponCode.objects.filter(pk__in=[pk for pk, in rows]).update(issued_to_table=None)
+    ))
+    table_coupons = TableCoupon.objects.filter(used_at__isnull=True, table__current_session__isnull=True)
+    _chunks(table_coupons, (), chunk_size, report, lambda rows: report.add(
+        "table_coupons", TableCoupon.objects.filter(pk__in=[pk for pk, in rows]).delete()[0]
+    ))
+
+
+def _sweep_ordered_lines(chunk_size, report):
+    for model in (CartMenu, CartSetMenu):
+        lines = model.objects.filter(cart__is_ordered=True)
+        _chunks(lines, (), chunk_size, report, lambda rows, model=model: report.add(
+            "ordered_cart_lines", model.objects.filter(pk__in=[pk for pk, in rows]).delete()[0]
+        ))
+
+
+def sweep_carts(now=None, max_age_seconds=None, chunk_size=None) -> SweepReport:
+    """버려진 장바구니 / 끝난 세션의 쿠폰 예약 / 주문된 장바구니 항목 정리"""
+    now = now or timezone.now()
+    if max_age_seconds is None:
+        max_age_seconds = getattr(settings, "CART_TTL_SECONDS", 60 * 60 * 6)
+    chunk_size = chunk_size or getattr(settings, "CART_SWEEP_CHUNK_SIZE", 5000)
+
+    report = SweepReport()
+    _sweep_open_carts(now - timedelta(seconds=max_age_seconds), chunk_size, report)
+    _sweep_stale_reservations(chunk_size, report)
+    _sweep_ordered_lines(chunk_size, report)
+    return report.finish()
+
+
+async def _sweep_forever(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await run_db(sweep_carts)
+            if report.rows:
+                logger.info(f"cart sweep: {report.summary()}")
+        except Exception as e:
+            logger.error(f"cart sweep failed: {e}", exc_info=True)
+
+
+def ensure_cart_sweeper():
+    """현재 이벤트 루프의 주기 정리 Task (CART_SWEEP_INTERVAL_SECONDS 가 0 이면 None)"""
+    interval = getattr(settings, "CART_SWEEP_INTERVAL_SECONDS", 0)
+    if not interval:
+        return None
+    loop = asyncio.get_running_loop()
+    task = _sweepers.get(loop)
+    if task is None or task.done():
+        task = _sweepers[loop] = asyncio.ensure_future(_sweep_forever(interval))
+    return task
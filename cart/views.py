@@ -13,39 +13,20 @@ from manager.models import *
 from order.models import *
 from coupon.models import *
 from django.db import models
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from menu.utils.menu_stock import get_set_components, set_capacities, stock_for
+from booth.utils.booth_context import get_booth_context
+from booth.utils.table_session import is_first_order, session_flags
+from cart.utils.cart_store import MENU, SET_MENU, get_cart_store
+from cart.utils.cart_quote import build_quote, coupon_discount, get_quote
 
 
 SEAT_MENU_CATEGORY = "seat"
 SEAT_FEE_CATEGORY = "seat_fee"
 
 
-def _is_first_session(table: Table, now_dt=None) -> bool:
-    """해당 테이블이 초기화된 이후 첫 주문인지 판별"""
-    activated_at = getattr(table, "activated_at", None)
-    qs = Order.objects.filter(table_id=table.id)
-    if activated_at:
-        qs = qs.filter(created_at__gte=activated_at)
-    return not qs.exists()
-
-def _ordered_pt_seat_fee_in_session(table: Table) -> bool:
-    """
-    현재 테이블 활성화(activated_at) 이후 OrderMenu에서
-    PT seat_fee 메뉴가 이미 주문된 적 있는지 검사
-    """
-    activated_at = getattr(table, "activated_at", None)
-    if not activated_at:
-        return False
-
-    return OrderMenu.objects.filter(
-        order__table=table,
-        order__created_at__gte=activated_at,
-        menu__menu_name__icontains="테이블이용료"   # ✅ 부분 문자열 검색
-    ).exists()
-
-
-
 class CartDetailView(APIView):
     def get(self, request):
         booth_id = request.headers.get('Booth-ID')
@@ -58,7 +39,10 @@ class CartDetailView(APIView):
                 "message": "Booth-ID 헤더와 cart_id 쿼리 파라미터가 필요합니다."
             }, status=HTTP_400_BAD_REQUEST)
 
-        cart = get_object_or_404(Cart, id=cart_id, table__booth_id=booth_id, is_ordered=False)
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth_id)
+        if cart is None:
+            raise Http404
         table = cart.table
         if table.status != "activate":
             return Response({
@@ -67,27 +51,19 @@ class CartDetailView(APIView):
             }, status=HTTP_400_BAD_REQUEST)
 
         # 첫 주문 여부
-        is_first = _is_first_session(table)
+        is_first = is_first_order(table)
+        # 항목 / 합계는 견적에서 (장바구니 버전별 캐시)
+        quote = get_quote(cart)
+        cart.cart_menus, cart.cart_set_menus = list(quote.cart_menus), list(quote.cart_sets)
         serializer = CartDetailSerializer(cart, context={"request": request})
-
-        # 합계 계산
-        subtotal, table_fee = 0, 0
-        for cm in CartMenu.objects.filter(cart=cart).select_related("menu"):
-            if cm.menu.menu_category == SEAT_FEE_CATEGORY:
-                table_fee += cm.menu.menu_price * cm.quantity
-            else:
-                subtotal += cm.menu.menu_price * cm.quantity
+        subtotal, table_fee = quote.subtotal, quote.table_fee
 
         # set_menu_data까지 살림
         set_menu_data = []
-        for cs in CartSetMenu.objects.filter(cart=cart).select_related("set_menu"):
-            subtotal += cs.set_menu.set_price * cs.quantity
-
-            set_items = SetMenuItem.objects.filter(set_menu=cs.set_menu)
-            min_menu_amount = min(
-                [item.menu.menu_amount // item.quantity for item in set_items if item.quantity > 0],
-                default=0
-            )
+        cart_sets = quote.cart_sets
+        capacities = set_capacities(cs.set_menu_id for cs in cart_sets)
+        for cs in cart_sets:
+            min_menu_amount = capacities.get(cs.set_menu_id, 0)
 
             set_menu_data.append({
                 "id": cs.set_menu.id,
@@ -160,30 +136,26 @@ class CartAddView(APIView):
             )
 
         # ------------------- Cart 생성/선택 -------------------
+        store = get_cart_store()
         if cart_id:  # 기존 Cart 사용
-            cart = get_object_or_404(
-                Cart, id=cart_id, table=table, is_ordered=False
-            )
+            cart = store.get(cart_id, table=table)
+            if cart is None:
+                raise Http404
             is_new_cart = False
         else:  # 새 Cart 생성
-            cart = Cart.objects.create(table=table, is_ordered=False)
+            cart = store.create(table)
             is_new_cart = True
 
         # ------------------- 일반 메뉴 -------------------
         if type_ == "menu":
             menu = get_object_or_404(Menu, pk=item_id, booth_id=booth_id)
-            if menu.menu_amount < quantity:
+            if stock_for({menu.pk: quantity}).get(menu.pk, 0) < quantity:
                 return Response(
                     {"status": "fail", "message": "메뉴 재고가 부족합니다."},
                     status=HTTP_409_CONFLICT,
                 )
 
-            cart_item, created = CartMenu.objects.get_or_create(
-                cart=cart, menu=menu, defaults={"quantity": quantity}
-            )
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            cart_quantity = store.add(cart, MENU, menu.pk, quantity)
 
             menu_name = menu.menu_name
             menu_price = menu.menu_price
@@ -196,25 +168,22 @@ class CartAddView(APIView):
         # ------------------- 세트 메뉴 -------------------
         elif type_ == "set_menu":
             set_menu = get_object_or_404(SetMenu, pk=item_id, booth_id=booth_id)
-            set_items = SetMenuItem.objects.filter(set_menu=set_menu)
-            for item in set_items:
-                total_required = item.quantity * quantity
-                if item.menu.menu_amount < total_required:
+            components = get_set_components([set_menu.pk])[set_menu.pk]
+            stock = stock_for({menu_id: unit * quantity for menu_id, unit in components})
+            for menu_id, unit in components:
+                total_required = unit * quantity
+                if stock.get(menu_id, 0) < total_required:
+                    menu_name = Menu.objects.filter(pk=menu_id).values_list("menu_name", flat=True).first()
                     return Response(
                         {
                             "status": "fail",
-                            "message": f"{item.menu.menu_name}의 재고가 부족합니다. "
-                            f"(필요 수량: {total_required}, 보유 수량: {item.menu.menu_amount})",
+                            "message": f"{menu_name}의 재고가 부족합니다. "
+                            f"(필요 수량: {total_required}, 보유 수량: {stock.get(menu_id, 0)})",
                         },
                         status=HTTP_409_CONFLICT,
                     )
 
-            cart_item, created = CartSetMenu.objects.get_or_create(
-                cart=cart, set_menu=set_menu, defaults={"quantity": quantity}
-            )
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            cart_quantity = store.add(cart, SET_MENU, set_menu.pk, quantity)
 
             menu_name = set_menu.set_name
             menu_price = set_menu.set_price
@@ -226,7 +195,10 @@ class CartAddView(APIView):
 
         # ------------------- 테이블 이용료 -------------------
         elif type_ == "seat_fee":
-            manager = get_object_or_404(Manager, booth_id=booth_id)
+            # 이용료 설정은 부스 컨텍스트 캐시에서
+            manager = get_booth_context(booth_id)
+            if not manager or not manager.has_manager:
+                raise Http404
 
             if manager.seat_type == "NO":
                 return Response(
@@ -235,11 +207,12 @@ class CartAddView(APIView):
                 )
             
             if manager.seat_type == "PT":
-            # 첫 주문이 아니면 추가 불가
-                if not _is_first_session(table):
+            # 첫 주문이 아니면 추가 불가 (세션 플래그)
+                has_ordered, ordered_seat_fee = session_flags(table)
+                if has_ordered:
                     return Response({"status": "fail", "message": "테이블당 이용료는 첫 주문에서만 담을 수 있습니다."}, status=400)
                 # OrderMenu에 이미 주문된 적 있으면 재추가 불가
-                if _ordered_pt_seat_fee_in_session(table):
+                if ordered_seat_fee:
                     return Response({"status": "fail", "message": "현재 세션에서 테이블당 이용료는 이미 주문되었습니다."}, status=409)
                 quantity = 1  # 강제 1
                 fee_price = manager.seat_tax_table
@@ -258,18 +231,13 @@ class CartAddView(APIView):
            
             # seat_fee 전용 Menu (없으면 생성)
             fee_menu, _ = Menu.objects.get_or_create(
-                booth=manager.booth,
+                booth_id=manager.booth_id,
                 menu_name=menu_name,
                 menu_category=SEAT_FEE_CATEGORY,
                 defaults={"menu_price": fee_price, "menu_amount": 999999},
             )
 
-            cart_item, created = CartMenu.objects.get_or_create(
-                cart=cart, menu=fee_menu, defaults={"quantity": quantity}
-            )
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            cart_quantity = store.add(cart, MENU, fee_menu.pk, quantity)
 
             menu_name = fee_menu.menu_name
             menu_price = fee_price
@@ -293,7 +261,7 @@ class CartAddView(APIView):
                         "type": type_,
                         "id": item_id,
                         "menu_name": menu_name,
-                        "quantity": cart_item.quantity,
+                        "quantity": cart_quantity,
                         "menu_price": menu_price,
                         "menu_image": menu_image,
                     },
@@ -321,36 +289,34 @@ class CartMenuUpdateView(APIView):
             return Response({"status": "fail", "message": "수량은 0 이상이어야 합니다."}, status=400)
 
         # ✅ cart_id 기준으로 장바구니 조회
-        cart = get_object_or_404(
-            Cart, id=cart_id, table__booth_id=booth_id, is_ordered=False
-        )
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth_id)
+        if cart is None:
+            raise Http404
 
         # ------------------- 메뉴 -------------------
         if type_ == "menu":
-            try:
-                cart_item = CartMenu.objects.get(cart=cart, menu_id=menu_id)
-                menu = Menu.objects.get(id=menu_id, booth_id=booth_id)
-            except (CartMenu.DoesNotExist, Menu.DoesNotExist):
+            menu = Menu.objects.filter(id=menu_id, booth_id=booth_id).first()
+            if menu is None or store.quantity(cart, MENU, menu_id) is None:
                 return Response(
                     {"status": "fail", "message": "해당 메뉴를 찾을 수 없습니다."},
                     status=404
                 )
 
             if quantity == 0:
-                cart_item.delete()
+                store.set_quantity(cart, MENU, menu_id, 0)
                 return Response(
                     {"status": "success", "message": "장바구니에서 해당 메뉴가 삭제되었습니다."},
                     status=200
                 )
 
-            if menu.menu_amount < quantity:
+            if stock_for({menu.pk: quantity}).get(menu.pk, 0) < quantity:
                 return Response(
                     {"status": "fail", "message": "메뉴 재고가 부족합니다."},
                     status=409
                 )
 
-            cart_item.quantity = quantity
-            cart_item.save()
+            store.set_quantity(cart, MENU, menu_id, quantity)
 
             return Response({
                 "status": "success",
@@ -370,32 +336,32 @@ class CartMenuUpdateView(APIView):
 
         # ------------------- 세트 메뉴 -------------------
         elif type_ == "set_menu":
-            try:
-                cart_item = CartSetMenu.objects.get(cart=cart, set_menu_id=menu_id)
-                set_menu = SetMenu.objects.get(id=menu_id, booth_id=booth_id)
-            except (CartSetMenu.DoesNotExist, SetMenu.DoesNotExist):
+            set_menu = SetMenu.objects.filter(id=menu_id, booth_id=booth_id).first()
+            if set_menu is None or store.quantity(cart, SET_MENU, menu_id) is None:
                 return Response(
                     {"status": "fail", "message": "해당 세트메뉴를 찾을 수 없습니다."},
                     status=404
                 )
 
             if quantity == 0:
-                cart_item.delete()
+                store.set_quantity(cart, SET_MENU, menu_id, 0)
                 return Response(
                     {"status": "success", "message": "장바구니에서 해당 세트메뉴가 삭제되었습니다."},
                     status=200
                 )
 
-            for item in SetMenuItem.objects.filter(set_menu=set_menu):
-                required = item.quantity * quantity
-                if item.menu.menu_amount < required:
+            components = get_set_components([set_menu.pk])[set_menu.pk]
+            stock = stock_for({menu_id: unit * quantity for menu_id, unit in components})
+            for menu_id, unit in components:
+                required = unit * quantity
+                if stock.get(menu_id, 0) < required:
+                    menu_name = Menu.objects.filter(pk=menu_id).values_list("menu_name", flat=True).first()
                     return Response(
-                        {"status": "fail", "message": f"{item.menu.menu_name}의 재고가 부족합니다."},
+                        {"status": "fail", "message": f"{menu_name}의 재고가 부족합니다."},
                         status=409
                     )
 
-            cart_item.quantity = quantity
-            cart_item.save()
+            store.set_quantity(cart, SET_MENU, set_menu.pk, quantity)
 
             return Response({
                 "status": "success",
@@ -415,12 +381,8 @@ class CartMenuUpdateView(APIView):
 
         # ------------------- 테이블 이용료 -------------------
         elif type_ == "seat_fee":
-            try:
-                cart_item = CartMenu.objects.get(
-                    cart=cart, menu_id=menu_id, menu__menu_category=SEAT_FEE_CATEGORY
-                )
-                menu = cart_item.menu
-            except CartMenu.DoesNotExist:
+            menu = Menu.objects.filter(id=menu_id, menu_category=SEAT_FEE_CATEGORY).first()
+            if menu is None or store.quantity(cart, MENU, menu_id) is None:
                 return Response(
                     {"status": "fail", "message": "해당 테이블 이용료를 찾을 수 없습니다."},
                     status=404
@@ -432,16 +394,13 @@ class CartMenuUpdateView(APIView):
             if manager.seat_type == "PT" and quantity > 1:
                 return Response({"status": "fail", "message": "테이블당 이용료는 수량을 1 이상으로 늘릴 수 없습니다."}, status=400)
 
+            store.set_quantity(cart, MENU, menu_id, quantity)
             if quantity == 0:
-                cart_item.delete()
                 return Response(
                     {"status": "success", "message": "장바구니에서 테이블 이용료가 삭제되었습니다."},
                     status=200
                 )
 
-            cart_item.quantity = quantity
-            cart_item.save()
-
             return Response({
                 "status": "success",
                 "message": "테이블 이용료 수량이 수정되었습니다.",
@@ -476,60 +435,41 @@ class PaymentInfoView(APIView):
                 "message": "Booth-ID와 cart_id가 필요합니다."
             }, status=HTTP_400_BAD_REQUEST)
 
-        cart = get_object_or_404(Cart, id=cart_id, table__booth_id=booth_id, is_ordered=False)
+        cart = get_cart_store().get(cart_id, booth_id=booth_id)
+        if cart is None:
+            raise Http404
         table = cart.table
-
-        if _is_first_session(table):
-            manager = get_object_or_404(Manager, booth_id=booth_id)
-            if manager.seat_type != "NO":
-                has_fee = CartMenu.objects.filter(cart=cart, menu__menu_category=SEAT_FEE_CATEGORY).exists()
-                if not has_fee:
-                    return Response({
-                        "status": "fail",
-                        "message": "첫 주문에는 테이블 이용료가 필요합니다."
-                    }, status=HTTP_400_BAD_REQUEST)
-
-        subtotal, table_fee = 0, 0
-        for cm in CartMenu.objects.filter(cart=cart).select_related("menu"):
-            if not Menu.objects.filter(id=cm.menu_id, booth_id=booth_id).exists():
-                return Response({"status": "fail", "message": "현재 존재하지 않는 메뉴입니다."}, status=HTTP_404_NOT_FOUND)
-            if cm.menu.menu_amount <= 0:
-                return Response({"status": "fail", "message": f"{cm.menu.menu_name}은(는) 품절된 메뉴예요!"}, status=HTTP_400_BAD_REQUEST)
-            if cm.menu.menu_amount < cm.quantity:
-                return Response({"status": "fail", "message": f"{cm.menu.menu_name}은(는) 최대 {cm.menu.menu_amount}개까지만 주문할 수 있어요!"}, status=HTTP_400_BAD_REQUEST)
-
-            if cm.menu.menu_category == SEAT_FEE_CATEGORY:
-                table_fee += cm.menu.menu_price * cm.quantity
-            else:
-                subtotal += cm.menu.menu_price * cm.quantity
-
-        for cs in CartSetMenu.objects.filter(cart=cart).select_related("set_menu"):
-            if not SetMenu.objects.filter(id=cs.set_menu_id, booth_id=booth_id).exists():
-                return Response({"status": "fail", "message": "현재 존재하지 않는 세트메뉴입니다."}, status=HTTP_404_NOT_FOUND)
-
-            for item in SetMenuItem.objects.filter(set_menu=cs.set_menu):
-                total_required = item.quantity * cs.quantity
-                if item.menu.menu_amount <= 0:
-                    return Response({"status": "fail", "message": f"{item.menu.menu_name}은(는) 품절된 메뉴예요!"}, status=HTTP_400_BAD_REQUEST)
-                if item.menu.menu_amount < total_required:
-                    return Response({"status": "fail", "message": f"{item.menu.menu_name}은(는) 최대 {item.menu.menu_amount}개까지만 주문할 수 있어요!"}, status=HTTP_400_BAD_REQUEST)
-
-            subtotal += cs.set_menu.set_price * cs.quantity
-
-        total_price = subtotal + table_fee
+        # 품절 / 최대 수량 검사 → 캐시 없이 현재 재고로 (get_quote 는 장바구니 상세 표시용)
+        quote = build_quote(cart)
         manager = get_object_or_404(Manager, booth_id=booth_id)
+        is_first = is_first_order(table)
+
+        if is_first and manager.seat_type != "NO" and not quote.has_seat_fee:
+            return Response({
+                "status": "fail",
+                "message": "첫 주문에는 테이블 이용료가 필요합니다."
+            }, status=HTTP_400_BAD_REQUEST)
+
+        if quote.missing:
+            kind, _ = quote.missing[0]
+            message = "현재 존재하지 않는 메뉴입니다." if kind == MENU else "현재 존재하지 않는 세트메뉴입니다."
+            return Response({"status": "fail", "message": message}, status=HTTP_404_NOT_FOUND)
+
+        # 재고 부족은 장바구니 항목 순서대로 첫 번째만 안내
+        if quote.shortfalls:
+            return Response({"status": "fail", "message": quote.shortfalls[0].message}, status=HTTP_400_BAD_REQUEST)
 
         return Response({
             "status": "success",
             "code": 200,
             "data": {
-                "subtotal": subtotal,
-                "table_fee": table_fee,
-                "total_price": total_price,
+                "subtotal": quote.subtotal,
+                "table_fee": quote.table_fee,
+                "total_price": quote.total,
                 "bank_name": manager.bank,
                 "account_number": manager.account,
                 "account_holder": manager.depositor,
-                "is_first_order": _is_first_session(table)
+                "is_first_order": is_first
             }
         }, status=HTTP_200_OK)
 
@@ -547,14 +487,16 @@ class ApplyCouponView(APIView):
                 "message": "Booth-ID와 cart_id가 필요합니다."
             }, status=HTTP_400_BAD_REQUEST)
 
-        cart = get_object_or_404(Cart, id=cart_id, table__booth_id=booth_id, is_ordered=False)
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth_id)
+        if cart is None:
+            raise Http404
         table = cart.table
 
         # 기존 쿠폰 해제
         CouponCode.objects.filter(issued_to_table=table, used_at__isnull=True).update(issued_to_table=None)
         TableCoupon.objects.filter(table=table, used_at__isnull=True).delete()
-        cart.applied_coupon = None
-        cart.save(update_fields=['applied_coupon'])
+        store.set_coupon(cart, None)
 
         serializer = ApplyCouponSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -573,31 +515,21 @@ class ApplyCouponView(APIView):
         if coupon_code.coupon.booth_id != int(booth_id):
             return Response({"status": "fail", "code": 400, "message": "이 부스에서 사용할 수 없는 쿠폰입니다."}, status=HTTP_400_BAD_REQUEST)
 
-        subtotal, table_fee = 0, 0
-        for cm in CartMenu.objects.filter(cart=cart).select_related('menu'):
-            if cm.menu.menu_category == SEAT_FEE_CATEGORY:
-                table_fee += (cm.menu.menu_price or 0) * cm.quantity
-            else:
-                subtotal += (cm.menu.menu_price or 0) * cm.quantity
-
-        for cs in CartSetMenu.objects.filter(cart=cart).select_related('set_menu'):
-            subtotal += (cs.set_menu.set_price or 0) * cs.quantity
-
-        total_price_before = subtotal + table_fee
+        # 할인 계산은 체크아웃과 같은 coupon_discount 로 (현재 가격 기준, 캐시 없이)
+        quote = build_quote(cart)
+        subtotal, table_fee = quote.subtotal, quote.table_fee
+        total_price_before = quote.total
 
         discount_type = coupon_code.coupon.discount_type.lower()
         discount_value = coupon_code.coupon.discount_value
-        if discount_type == 'percent':
-            total_price_after = int(total_price_before * (1 - discount_value / 100))
-        else:
-            total_price_after = max(int(total_price_before - discount_value), 0)
+        total_price_after = total_price_before - coupon_discount(coupon_code.coupon, total_price_before)
+
+        # 장바구니가 그새 만료됐으면 (CartNotFound → 404) 쿠폰을 예약하지 않도록 장바구니부터
+        store.set_coupon(cart, coupon_code.coupon_id)
 
         coupon_code.issued_to_table = table
         coupon_code.save(update_fields=['issued_to_table'])
 
-        cart.applied_coupon = coupon_code.coupon
-        cart.save(update_fields=['applied_coupon'])
-
         TableCoupon.objects.get_or_create(table=table, coupon=coupon_code.coupon)
 
         return Response({
@@ -624,7 +556,10 @@ class ApplyCouponView(APIView):
                 "message": "Booth-ID와 cart_id가 필요합니다."
             }, status=HTTP_400_BAD_REQUEST)
 
-        cart = get_object_or_404(Cart, id=cart_id, table__booth_id=booth_id, is_ordered=False)
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth_id)
+        if cart is None:
+            raise Http404
         table = cart.table
 
         coupon_codes = CouponCode.objects.filter(issued_to_table=table, used_at__isnull=True)
@@ -637,8 +572,7 @@ class ApplyCouponView(APIView):
 
         TableCoupon.objects.filter(table=table, used_at__isnull=True).delete()
 
-        cart.applied_coupon = None
-        cart.save(update_fields=['applied_coupon'])
+        store.set_coupon(cart, None)
 
         return Response({
             "status": "success",
@@ -728,15 +662,8 @@ class CartExistsView(APIView):
             }, status=HTTP_404_NOT_FOUND)
 
         # --- cart 조회
-        cart = (
-            Cart.objects.filter(
-                pk=cart_id,
-                table__booth=booth,
-                is_ordered=False
-            )
-            .order_by("-created_at")
-            .first()
-        )
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth.pk)
 
         if not cart:
             return Response({
@@ -745,9 +672,9 @@ class CartExistsView(APIView):
                 "data": {"has_cart_items": False}
             }, status=HTTP_200_OK)
 
-        # --- 활성화 이후 보정
-        activated_at = getattr(cart.table, "activated_at", None)
-        if activated_at and cart.created_at < activated_at:
+        # --- 이전 세션 장바구니 보정
+        current_session_id = cart.table.current_session_id
+        if current_session_id and cart.session_id != current_session_id:
             return Response({
                 "status": "success",
                 "code": 200,
@@ -755,10 +682,7 @@ class CartExistsView(APIView):
             }, status=HTTP_200_OK)
 
         # --- 장바구니에 아이템 존재 여부
-        has_items = (
-            CartMenu.objects.filter(cart=cart).exists()
-            or CartSetMenu.objects.filter(cart=cart).exists()
-        )
+        has_items = store.has_items(cart)
 
         return Response({
             "status": "success",
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupon', '0004_coupon_initial_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='couponcode',
+            index=models.Index(fields=['issued_to_table', 'used_at'], name='couponcode_table_used_idx'),
+        ),
+    ]
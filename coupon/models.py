@@ -25,6 +25,12 @@ class CouponCode(models.Model):
     code = models.CharField(max_length=16, unique=True, db_index=True)
     issued_to_table = models.ForeignKey(Table, null=True, blank=True, on_delete=models.SET_NULL)
     used_at = models.DateTimeField(null=True, blank=True)
-    
+
+    class Meta:
+        indexes = [
+            # 테이블에 발급된 미사용 코드
+            models.Index(fields=["issued_to_table", "used_at"], name="couponcode_table_used_idx"),
+        ]
+
     def __str__(self):
         return self.code
\ No newline at end of file
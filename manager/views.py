@@ -15,6 +15,7 @@ from django.http import FileResponse
 from booth.models import Booth
 from django.core.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
+from project.auth import issue_manager_tokens
 
 
 
@@ -37,7 +38,8 @@ class SignupView(APIView):
                 )
 
             # JWT 토큰 생성
-            token = TokenObtainPairSerializer.get_token(user)
+            # booth_id claim 포함 (주방/서빙 API·웹소켓 인증 시 DB 조회 생략)
+            token = issue_manager_tokens(user, booth.pk)
             access_token = str(token.access_token)
             refresh_token = str(token)
 
@@ -120,7 +122,7 @@ class ManagerAuthAPIView(APIView):
         booth = manager.booth
 
         # 4. 토큰 발급
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_manager_tokens(user, booth.pk)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
 
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MenuConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'menu'
+
+    def ready(self):
+        # 메뉴/세트 변경 시 손님용 카탈로그 버전 갱신 + 재고/세트 구성 캐시 무효화
+        from menu.utils.menu_catalog import connect_signals
+        from menu.utils.menu_stock import connect_signals as connect_stock_signals
+        connect_signals()
+        connect_stock_signals()
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from booth.models import Booth
 from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import set_capacity
 import json
 
 class MenuSerializer(serializers.ModelSerializer):
@@ -127,11 +128,9 @@ class SetMenuSerializer(serializers.ModelSerializer):
      # 👇 추가: 세트메뉴 안의 메뉴 중 가장 적은 재고 구하기
     def get_min_menu_amount(self, obj):
         set_items = obj.menu_items.all()  # SetMenuItem queryset
-        if not set_items:
-            return 0
-        return min(
-            (item.menu.menu_amount // item.quantity) if item.quantity > 0 else 0
-            for item in set_items
+        return set_capacity(
+            [(item.menu_id, item.quantity) for item in set_items],
+            {item.menu_id: item.menu.menu_amount for item in set_items},
         )
     
     def validate(self, data):
@@ -196,6 +195,9 @@ class SetMenuSerializer(serializers.ModelSerializer):
             menu = Menu.objects.get(id=item_data['menu_id'], booth=booth)
             items.append(SetMenuItem(set_menu=set_menu, menu=menu, quantity=item_data['quantity']))
         SetMenuItem.objects.bulk_create(items)
+        # bulk_create 는 시그널이 없으므로 구성 저장 뒤 카탈로그 버전 갱신
+        from menu.utils.menu_catalog import bump_catalog_version
+        bump_catalog_version(booth.id)
 
         return set_menu
     
@@ -221,6 +223,8 @@ class SetMenuSerializer(serializers.ModelSerializer):
                 for item in menu_items_data
             ]
             SetMenuItem.objects.bulk_create(new_items)
+            from menu.utils.menu_catalog import bump_catalog_version
+            bump_catalog_version(instance.booth_id)
         return instance
     
 
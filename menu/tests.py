@@ -1,14 +1,23 @@
 import io
 import json
+import tempfile
 from PIL import Image
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db.models import F
+from django.test import override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from django.contrib.auth import get_user_model
 from manager.models import Manager
 from booth.models import Booth
 from menu.models import Menu, SetMenu, SetMenuItem
+from menu.serializers import MenuSerializer, SetMenuSerializer
+from menu.utils import menu_stock
+from menu.utils.menu_catalog import build_catalog
 
 User = get_user_model()
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix="dorder-test-media-")
 
 def get_temporary_image():
     img = Image.new('RGB', (60, 60), color='blue')
@@ -18,6 +27,7 @@ def get_temporary_image():
     byte_io.seek(0)
     return byte_io
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class MenuAndSetMenuAPITest(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='mgr', password='pw')
@@ -173,3 +183,161 @@ class MenuAndSetMenuAPITest(APITestCase):
             # seat_type="NO"라면 table == [] 또는 없거나.
             self.assertIn("table", resp.data['data'])
             self.assertEqual(resp.data['data']["table"], [])
+
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MenuCatalogCacheTest(APITestCase):
+    """손님용 all-menus: 카탈로그 캐시 + 재고 덮어쓰기 + ETag/304"""
+
+    def setUp(self):
+        cache.clear()
+        self.booth = Booth.objects.create(booth_name='카탈로그부스')
+        self.menu = Menu.objects.create(
+            booth=self.booth, menu_name='떡볶이', menu_category='메뉴', menu_price=5000, menu_amount=10
+        )
+        self.drink = Menu.objects.create(
+            booth=self.booth, menu_name='콜라', menu_category='음료', menu_price=2000, menu_amount=4
+        )
+        self.setmenu = SetMenu.objects.create(booth=self.booth, set_name='세트', set_price=6000)
+        SetMenuItem.objects.create(set_menu=self.setmenu, menu=self.menu, quantity=1)
+        SetMenuItem.objects.create(set_menu=self.setmenu, menu=self.drink, quantity=2)
+        self.url = reverse('user-booths-all-menus', args=[self.booth.id])
+
+    def expected(self, category=None):
+        request = APIRequestFactory().get(self.url)
+        menus = Menu.objects.filter(booth=self.booth).order_by("pk")
+        setmenus = SetMenu.objects.filter(booth=self.booth).order_by("pk")
+        if category:
+            menus = menus.filter(menu_category=category)
+            setmenus = setmenus.filter(set_category=category)
+        return (
+            json.loads(json.dumps(MenuSerializer(menus, many=True, context={"request": request}).data)),
+            json.loads(json.dumps(SetMenuSerializer(setmenus, many=True, context={"request": request}).data)),
+        )
+
+    def test_matches_serializer_output(self):
+        for category in (None, '음료', '세트'):
+            params = {"category": category} if category else {}
+            resp = self.client.get(self.url, params)
+            self.assertEqual(resp.status_code, 200)
+            menus, setmenus = self.expected(category)
+            self.assertEqual(json.loads(json.dumps(resp.data["data"]["menus"])), menus)
+            self.assertEqual(json.loads(json.dumps(resp.data["data"]["setmenus"])), setmenus)
+
+    def test_catalog_built_once(self):
+        with patch("menu.utils.menu_catalog.build_catalog", wraps=build_catalog) as build:
+            self.client.get(self.url)
+            self.client.get(self.url)
+            self.client.get(self.url, {"category": "음료"})
+        self.assertEqual(build.call_count, 1)
+
+    def test_etag_not_modified(self):
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+    def test_stock_change_without_signal(self):
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+        # 주문 체크아웃과 같은 queryset UPDATE (시그널 없음)
+        Menu.objects.filter(pk=self.drink.pk).update(menu_amount=F("menu_amount") - 3)
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        drink = next(m for m in resp.data["data"]["menus"] if m["menu_id"] == self.drink.pk)
+        self.assertEqual(drink["menu_amount"], 1)
+        self.assertEqual(resp.data["data"]["setmenus"][0]["min_menu_amount"], 0)
+        self.assertFalse(resp.data["data"]["setmenus"][0]["is_soldout"])
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_menu_edit_bumps_version(self):
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu.menu_price = 5500
+            self.menu.save()
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["menus"][0]["menu_price"], 5500)
+        self.assertEqual(resp.data["data"]["setmenus"][0]["origin_price"], 5500 + 2000 * 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SetMenuItem.objects.filter(set_menu=self.setmenu, menu=self.drink).delete()
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.data["data"]["setmenus"][0]["menu_items"], [{"menu_id": self.menu.pk, "quantity": 1}])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MenuStockServiceTest(APITestCase):
+    """재고 캐시 미러: reserve/release/commit/restock + 세트 구성 인덱스"""
+
+    def setUp(self):
+        cache.clear()
+        self.booth = Booth.objects.create(booth_name='재고부스')
+        self.food = Menu.objects.create(
+            booth=self.booth, menu_name='순대', menu_category='메뉴', menu_price=4000, menu_amount=5
+        )
+        self.drink = Menu.objects.create(
+            booth=self.booth, menu_name='사이다', menu_category='음료', menu_price=2000, menu_amount=3
+        )
+        self.setmenu = SetMenu.objects.create(booth=self.booth, set_name='세트', set_price=5000)
+        SetMenuItem.objects.create(set_menu=self.setmenu, menu=self.food, quantity=1)
+        SetMenuItem.objects.create(set_menu=self.setmenu, menu=self.drink, quantity=2)
+
+    def test_reserve_is_all_or_nothing(self):
+        taken = menu_stock.reserve({self.food.pk: 2, self.drink.pk: 1})
+        self.assertEqual(taken, {self.food.pk: 2, self.drink.pk: 1})
+        self.assertEqual(menu_stock.get_stock([self.food.pk, self.drink.pk]), {self.food.pk: 3, self.drink.pk: 2})
+
+        # 사이다 부족 → 순대 차감분도 되돌림
+        self.assertIsNone(menu_stock.reserve({self.food.pk: 1, self.drink.pk: 5}))
+        self.assertEqual(menu_stock.get_stock([self.food.pk, self.drink.pk]), {self.food.pk: 3, self.drink.pk: 2})
+
+        menu_stock.release(taken)
+        self.assertEqual(menu_stock.get_stock([self.food.pk, self.drink.pk]), {self.food.pk: 5, self.drink.pk: 3})
+
+    def test_commit_and_restock_write_through(self):
+        menu_stock.get_stock([self.food.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_stock.commit({self.food.pk: 2})
+            # 캐시 차감은 커밋 이후
+            self.assertEqual(menu_stock.get_stock([self.food.pk]), {self.food.pk: 5})
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.menu_amount, 3)
+        self.assertEqual(menu_stock.get_stock([self.food.pk]), {self.food.pk: 3})
+        with self.assertRaises(menu_stock.StockShortage):
+            menu_stock.commit({self.food.pk: 1, self.drink.pk: 4})
+
+        menu_stock.get_stock([self.drink.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_stock.restock({self.drink.pk: 2})
+        self.drink.refresh_from_db()
+        self.assertEqual(self.drink.menu_amount, 5)
+        self.assertEqual(menu_stock.get_stock([self.drink.pk]), {self.drink.pk: 5})
+
+    def test_stock_for_rechecks_db_when_short(self):
+        cache.set(f"menu_stock:{self.food.pk}", 0)
+        self.assertEqual(menu_stock.get_stock([self.food.pk]), {self.food.pk: 0})
+        self.assertEqual(menu_stock.stock_for({self.food.pk: 1}), {self.food.pk: 5})
+        self.assertEqual(menu_stock.get_stock([self.food.pk]), {self.food.pk: 5})
+
+    def test_set_capacity_index(self):
+        self.assertEqual(menu_stock.set_capacities([self.setmenu.pk]), {self.setmenu.pk: 1})
+        # 캐시만으로 계산 (쿼리 없음)
+        with self.assertNumQueries(0):
+            self.assertEqual(menu_stock.set_capacities([self.setmenu.pk]), {self.setmenu.pk: 1})
+
+        # 구성 변경 / 운영자 재고 수정 → 커밋 후 캐시 무효화
+        with self.captureOnCommitCallbacks(execute=True):
+            SetMenuItem.objects.filter(set_menu=self.setmenu, menu=self.drink).update(quantity=1)
+            SetMenuItem.objects.get(set_menu=self.setmenu, menu=self.drink).save()
+            self.food.menu_amount = 2
+            self.food.save()
+        self.assertEqual(menu_stock.set_capacities([self.setmenu.pk]), {self.setmenu.pk: 2})
+        self.assertEqual(menu_stock.set_capacity([], {}), 0)
@@ -0,0 +1,182 @@
+"""
+손님용 메뉴 카탈로그 캐시 (UserBoothMenusViewSet.all_menus)
+
+- 부스별 직렬화된 메뉴/세트 목록을 버전 키로 캐시
+  Menu / SetMenu / SetMenuItem 저장·삭제 시그널이 버전을 올림 (커밋 이후)
+- 재고에 따라 바뀌는 값(menu_amount, is_soldout, min_menu_amount)은 캐시에 두지 않고
+  (id, menu_amount) 한 번 조회한 재고 맵으로 매 요청 덮어씀
+  → 주문/취소의 F() 재고 UPDATE 처럼 시그널을 거치지 않는 변경도 바로 반영
+- ETag = 버전 + 재고 맵 + 요청별 값(테이블 이용료 상태, 카테고리, 호스트) 해시
+"""
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+from menu.models import Menu, SetMenu, SetMenuItem
+from menu.serializers import MenuSerializer, SetMenuSerializer
+from menu.utils.menu_stock import set_capacity
+
+logger = logging.getLogger(__name__)
+
+# 카탈로그 보관 시간 (초) - 버전이 바뀌면 어차피 새 키를 씀
+MENU_CATALOG_TTL = 60 * 60 * 12
+
+
+def _version_key(booth_id):
+    return f"menu_catalog:{booth_id}:version"
+
+
+def _catalog_key(booth_id, version):
+    return f"menu_catalog:{booth_id}:{version}"
+
+
+def catalog_version(booth_id) -> int:
+    try:
+        return cache.get(_version_key(booth_id), 0)
+    except Exception:
+        logger.warning(f"menu catalog version unavailable for booth {booth_id}", exc_info=True)
+        return None
+
+
+def _bump(booth_id):
+    try:
+        key = _version_key(booth_id)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        logger.warning(f"menu catalog version bump failed for booth {booth_id}", exc_info=True)
+
+
+def bump_catalog_version(booth_id):
+    """
+    카탈로그 무효화 (커밋 이후 버전 +1)
+    커밋 전에 올리면 다른 요청이 옛 데이터로 새 버전을 채울 수 있음
+    """
+    transaction.on_commit(lambda: _bump(booth_id))
+
+
+def build_catalog(booth_id) -> dict:
+    """
+    재고와 무관한 메뉴/세트 직렬화 결과 (이미지는 상대 경로)
+    세트 구성은 menu_items 로 함께 담아 재고 덮어쓰기에 사용
+    """
+    menus_qs = Menu.objects.filter(booth_id=booth_id).select_related("booth").order_by("pk")
+    setmenus_qs = (
+        SetMenu.objects.filter(booth_id=booth_id)
+        .select_related("booth")
+        .order_by("pk")
+        .prefetch_related("menu_items__menu")
+    )
+    menus = MenuSerializer(menus_qs, many=True).data
+    setmenus = SetMenuSerializer(setmenus_qs, many=True).data
+    # SetMenuSerializer 는 request 없으면 set_image 를 None 으로 내보냄 → 경로 직접 채움
+    for row, setmenu in zip(setmenus, setmenus_qs):
+        row["set_image"] = setmenu.set_image.url if setmenu.set_image else None
+    return {
+        "menus": [dict(m) for m in menus],
+        "setmenus": [dict(s) for s in setmenus],
+    }
+
+
+def get_catalog(booth_id):
+    """(version, catalog) - 캐시 장애 시 version=None 으로 직접 생성"""
+    version = catalog_version(booth_id)
+    if version is None:
+        return None, build_catalog(booth_id)
+
+    key = _catalog_key(booth_id, version)
+    try:
+        catalog = cache.get(key)
+    except Exception:
+        logger.warning(f"menu catalog unavailable for booth {booth_id}", exc_info=True)
+        return None, build_catalog(booth_id)
+
+    if catalog is None:
+        catalog = build_catalog(booth_id)
+        try:
+            cache.set(key, catalog, timeout=MENU_CATALOG_TTL)
+        except Exception:
+            logger.warning(f"menu catalog store failed for booth {booth_id}", exc_info=True)
+    return version, catalog
+
+
+def get_stock_map(booth_id) -> dict:
+    """{menu_id: menu_amount} - 쿼리 1회"""
+    return dict(Menu.objects.filter(booth_id=booth_id).values_list("id", "menu_amount"))
+
+
+def _absolute(request, url):
+    if not url or request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def overlay_stock(catalog: dict, stock: dict, request=None, category=None):
+    """
+    캐시된 카탈로그에 재고 값을 덮어 응답용 (menus, setmenus) 생성
+    계산식은 MenuSerializer / SetMenuSerializer 와 동일
+    """
+    menus = []
+    for row in catalog["menus"]:
+        if category and row["menu_category"] != category:
+            continue
+        amount = stock.get(row["menu_id"], row["menu_amount"])
+        menus.append({
+            **row,
+            "menu_amount": amount,
+            "is_soldout": amount == 0,
+            "menu_image": _absolute(request, row["menu_image"]),
+        })
+
+    setmenus = []
+    for row in catalog["setmenus"]:
+        if category and row["set_category"] != category:
+            continue
+        components = [(item["menu_id"], item["quantity"]) for item in row["menu_items"]]
+        setmenus.append({
+            **row,
+            "is_soldout": any(stock.get(menu_id, 0) == 0 for menu_id, _ in components),
+            "min_menu_amount": set_capacity(components, stock),
+            "set_image": _absolute(request, row["set_image"]),
+        })
+    return menus, setmenus
+
+
+def catalog_etag(booth_id, version, stock: dict, extra) -> str:
+    """버전 + 재고 + 요청별 값으로 만든 strong ETag"""
+    payload = json.dumps(
+        [booth_id, version, sorted(stock.items()), extra],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return '"' + hashlib.sha1(payload.encode()).hexdigest() + '"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # W/ 접두 (프록시가 약한 ETag 로 바꾼 경우) 도 같은 값으로 취급
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def _bump_for_instance(sender, instance, **kwargs):
+    if sender is SetMenuItem:
+        booth_id = SetMenu.objects.filter(pk=instance.set_menu_id).values_list("booth_id", flat=True).first()
+    else:
+        booth_id = instance.booth_id
+    if booth_id is not None:
+        bump_catalog_version(booth_id)
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+
+    for model in (Menu, SetMenu, SetMenuItem):
+        post_save.connect(_bump_for_instance, sender=model, dispatch_uid=f"menu_catalog_{model.__name__}_save")
+        post_delete.connect(_bump_for_instance, sender=model, dispatch_uid=f"menu_catalog_{model.__name__}_delete")
@@ -0,0 +1,275 @@
+"""
+메뉴 재고 서비스 (캐시 미러 + PostgreSQL write-through)
+
+- 원본은 Menu.menu_amount, 캐시(menu_stock:{menu_id})는 읽기용 미러
+  장바구니/결제 화면의 재고 확인은 캐시에서 (없는 키만 DB 한 번 조회 후 채움)
+- reserve : 체크아웃 동안 캐시 재고를 원자적으로 잡아둠 (하나라도 부족하면 전부 되돌림)
+            → 동시 체크아웃이 몰려도 품절이 확실한 요청은 행 잠금 전에 실패
+  release : 체크아웃이 끝나면 (성공 / 실패 모두) 잡아둔 캐시 재고 반환
+  commit  : 같은 수량을 DB 에 조건부 UPDATE 한 번으로 반영 (행 잠금 이후, 최종 판정)
+            캐시 차감은 바깥 트랜잭션이 커밋된 뒤에만 → 롤백되면 캐시도 그대로
+  restock : 취소/초기화로 돌아온 재고를 DB 에 더하고 커밋 후 캐시에도 반영
+- 캐시가 부족하다고 할 때만 DB 로 재확인 → 캐시 값이 낮게 어긋나도 잘못 거절하지 않음
+- 세트 구성 인덱스(menu_stock:set:{set_id} → [(menu_id, 수량), ...])로 세트 가능 수량 계산
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+
+from menu.models import Menu, SetMenu, SetMenuItem
+
+logger = logging.getLogger(__name__)
+
+# 세트 구성은 시그널로 지우므로 길게 보관
+SET_COMPONENTS_TTL = 60 * 60 * 12
+
+
+class StockShortage(ValueError):
+    """재고 부족 (메시지는 기존 응답 문구 그대로)"""
+
+
+def _stock_ttl():
+    return getattr(settings, "MENU_STOCK_CACHE_TTL", 60)
+
+
+def _stock_key(menu_id):
+    return f"menu_stock:{menu_id}"
+
+
+def _set_key(set_id):
+    return f"menu_stock:set:{set_id}"
+
+
+def _load_stock(menu_ids) -> dict:
+    return dict(Menu.objects.filter(pk__in=menu_ids).values_list("id", "menu_amount"))
+
+
+# ---------------------------------------------------------------- 조회
+
+def get_stock(menu_ids) -> dict:
+    """{menu_id: 재고} - 캐시 우선, 없는 키만 DB 에서 채움"""
+    menu_ids = set(menu_ids)
+    if not menu_ids:
+        return {}
+    try:
+        cached = cache.get_many([_stock_key(menu_id) for menu_id in menu_ids])
+    except Exception:
+        logger.warning("menu stock cache unavailable", exc_info=True)
+        return _load_stock(menu_ids)
+
+    stock = {
+        menu_id: cached[_stock_key(menu_id)]
+        for menu_id in menu_ids
+        if _stock_key(menu_id) in cached
+    }
+    missing = menu_ids - stock.keys()
+    if missing:
+        loaded = _load_stock(missing)
+        for menu_id, amount in loaded.items():
+            # add: 그 사이 다른 요청이 reserve 한 값을 덮어쓰지 않음
+            try:
+                cache.add(_stock_key(menu_id), amount, timeout=_stock_ttl())
+            except Exception:
+                logger.warning("menu stock cache unavailable", exc_info=True)
+                break
+        stock.update(loaded)
+    return stock
+
+
+def refresh_stock(menu_ids) -> dict:
+    """DB 값으로 캐시를 다시 채우고 반환"""
+    stock = _load_stock(set(menu_ids))
+    try:
+        cache.set_many({_stock_key(k): v for k, v in stock.items()}, timeout=_stock_ttl())
+    except Exception:
+        logger.warning("menu stock cache unavailable", exc_info=True)
+    return stock
+
+
+def stock_for(needs: dict) -> dict:
+    """
+    needs {menu_id: 필요 수량} 판정용 재고 맵
+    캐시로 충분하면 캐시 값, 부족해 보이면 DB 로 재확인한 값
+    """
+    stock = get_stock(needs)
+    if all(stock.get(menu_id, 0) >= need for menu_id, need in needs.items()):
+        return stock
+    return refresh_stock(needs)
+
+
+# ---------------------------------------------------------------- 세트
+
+def get_set_components(set_ids) -> dict:
+    """{set_id: [(menu_id, 수량), ...]} - 구성 인덱스 (SetMenuItem id 순)"""
+    set_ids = set(set_ids)
+    if not set_ids:
+        return {}
+    try:
+        cached = cache.get_many([_set_key(set_id) for set_id in set_ids])
+    except Exception:
+        logger.warning("set component cache unavailable", exc_info=True)
+        cached = {}
+
+    components = {
+        set_id: cached[_set_key(set_id)]
+        for set_id in set_ids
+        if _set_key(set_id) in cached
+    }
+    missing = set_ids - components.keys()
+    if missing:
+        loaded = {set_id: [] for set_id in missing}
+        rows = (
+            SetMenuItem.objects.filter(set_menu_id__in=missing)
+            .order_by("id")
+            .values_list("set_menu_id", "menu_id", "quantity")
+        )
+        for set_id, menu_id, quantity in rows:
+            loaded[set_id].append((menu_id, quantity))
+        try:
+            cache.set_many({_set_key(k): v for k, v in loaded.items()}, timeout=SET_COMPONENTS_TTL)
+        except Exception:
+            logger.warning("set component cache unavailable", exc_info=True)
+        components.update(loaded)
+    return components
+
+
+def set_capacity(components, stock: dict) -> int:
+    """
+    세트를 몇 개 만들 수 있는지 = min(구성 재고 // 필요 수량)
+    구성이 없거나 수량이 0 인 구성이 있으면 0
+    """
+    if not components:
+        return 0
+    return min(
+        (stock.get(menu_id, 0) // quantity) if quantity > 0 else 0
+        for menu_id, quantity in components
+    )
+
+
+def set_capacities(set_ids) -> dict:
+    """{set_id: 가능 수량} - 캐시만으로 계산"""
+    components = get_set_components(set_ids)
+    stock = get_stock(menu_id for items in components.values() for menu_id, _ in items)
+    return {set_id: set_capacity(items, stock) for set_id, items in components.items()}
+
+
+def cart_needs(cart_menus, cart_sets, components: dict) -> dict:
+    """장바구니 전체가 필요로 하는 메뉴별 수량 {menu_id: 수량}"""
+    needs = defaultdict(int)
+    for cm in cart_menus:
+        needs[cm.menu_id] += cm.quantity
+    for cs in cart_sets:
+        for menu_id, quantity in components.get(cs.set_menu_id, []):
+            needs[menu_id] += quantity * cs.quantity
+    return dict(needs)
+
+
+# ---------------------------------------------------------------- 변경
+
+def _mirror_add(amounts: dict):
+    for menu_id, amount in amounts.items():
+        try:
+            cache.incr(_stock_key(menu_id), amount)
+        except ValueError:
+            # 키가 없으면 다음 조회 때 DB 에서 채움
+            pass
+        except Exception:
+            logger.warning("menu stock cache unavailable", exc_info=True)
+            return
+
+
+def reserve(needs: dict):
+    """
+    캐시 재고를 원자적으로 차감
+    반환: 실제로 뺀 수량 dict (실패 시 release 에 그대로 넘김), 부족하면 None
+    캐시에 없거나 장애인 항목은 건너뜀 → 최종 판정은 commit (DB)
+    """
+    needs = {menu_id: need for menu_id, need in needs.items() if need > 0}
+    get_stock(needs)
+    taken = {}
+    for menu_id, need in needs.items():
+        try:
+            left = cache.decr(_stock_key(menu_id), need)
+        except ValueError:
+            continue
+        except Exception:
+            logger.warning("menu stock cache unavailable", exc_info=True)
+            break
+        taken[menu_id] = need
+        if left < 0:
+            _mirror_add(taken)
+            return None
+    return taken
+
+
+def release(taken: dict):
+    """reserve 로 잡아둔 캐시 재고 되돌리기"""
+    _mirror_add(taken)
+
+
+def commit(needs: dict):
+    """
+    {menu_id: 차감 수량} 을 DB 에 UPDATE 한 번으로 반영, 캐시 차감은 커밋 이후
+    조건(menu_amount >= 필요 수량)을 만족하지 못한 행이 있으면 StockShortage (호출부 트랜잭션 롤백)
+    """
+    if not needs:
+        return
+    condition = Q()
+    for menu_id, need in needs.items():
+        condition |= Q(pk=menu_id, menu_amount__gte=need)
+    updated = Menu.objects.filter(condition).update(
+        menu_amount=Case(
+            *[When(pk=menu_id, then=F("menu_amount") - need) for menu_id, need in needs.items()],
+            output_field=IntegerField(),
+        )
+    )
+    if updated != len(needs):
+        raise StockShortage("재고 부족")
+    transaction.on_commit(lambda: _mirror_add({menu_id: -need for menu_id, need in needs.items()}))
+
+
+def restock(amounts: dict):
+    """돌아온 재고를 DB 에 더하고 (UPDATE 1회) 커밋 이후 캐시에도 반영"""
+    amounts = {menu_id: amount for menu_id, amount in amounts.items() if amount > 0}
+    if not amounts:
+        return
+    Menu.objects.filter(pk__in=amounts).update(
+        menu_amount=Case(
+            *[When(pk=menu_id, then=F("menu_amount") + amount) for menu_id, amount in amounts.items()],
+            output_field=IntegerField(),
+        )
+    )
+    transaction.on_commit(lambda: _mirror_add(amounts))
+
+
+# ---------------------------------------------------------------- 무효화
+
+def _forget(keys):
+    try:
+        cache.delete_many(keys)
+    except Exception:
+        logger.warning("menu stock cache unavailable", exc_info=True)
+
+
+def _forget_menu(sender, instance, **kwargs):
+    # 운영자 수정 (menu_amount 직접 변경) → 다음 조회 때 DB 값으로
+    transaction.on_commit(lambda: _forget([_stock_key(instance.pk)]))
+
+
+def _forget_set(sender, instance, **kwargs):
+    set_id = instance.set_menu_id if sender is SetMenuItem else instance.pk
+    transaction.on_commit(lambda: _forget([_set_key(set_id)]))
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+
+    post_save.connect(_forget_menu, sender=Menu, dispatch_uid="menu_stock_Menu_save")
+    post_delete.connect(_forget_menu, sender=Menu, dispatch_uid="menu_stock_Menu_delete")
+    for model in (SetMenu, SetMenuItem):
+        post_save.connect(_forget_set, sender=model, dispatch_uid=f"menu_stock_{model.__name__}_save")
+        post_delete.connect(_forget_set, sender=model, dispatch_uid=f"menu_stock_{model.__name__}_delete")
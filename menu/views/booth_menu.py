@@ -169,7 +169,7 @@ class SetMenuViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         booth = self.get_booth()
-        return SetMenu.objects.filter(booth=booth)
+        return SetMenu.objects.filter(booth=booth).select_related("booth").prefetch_related("menu_items__menu")
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -263,8 +263,11 @@ class BoothAllMenusViewSet(viewsets.ViewSet):
         if category:
             menus_qs = menus_qs.filter(menu_category=category)
             setmenus_qs = setmenus_qs.filter(set_category=category)
-        menus = MenuSerializer(Menu.objects.filter(booth=booth), many=True, context={"request": request}).data
-        setmenus = SetMenuSerializer(SetMenu.objects.filter(booth=booth), many=True, context={"request": request}).data
+        menus = MenuSerializer(Menu.objects.filter(booth=booth).select_related("booth"), many=True, context={"request": request}).data
+        setmenus = SetMenuSerializer(
+            SetMenu.objects.filter(booth=booth).select_related("booth").prefetch_related("menu_items__menu"),
+            many=True, context={"request": request},
+        ).data
 
         data = {
             "booth_id": booth.pk,
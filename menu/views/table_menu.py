@@ -1,11 +1,18 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from booth.models import Booth, Table
-from order.models import OrderMenu, Order
+from booth.models import Booth, Table, TableSession
 from menu.models import Menu, SetMenu
 from manager.models import Manager
 from menu.serializers import MenuSerializer, SetMenuItemSerializer, SetMenuSerializer
+from booth.utils.booth_context import get_booth_context
+from menu.utils.menu_catalog import (
+    catalog_etag,
+    etag_matches,
+    get_catalog,
+    get_stock_map,
+    overlay_stock,
+)
 SEAT_MENU_CATEGORY = "seat"
 SEAT_FEE_CATEGORY = "seat_fee"
 
@@ -14,84 +21,82 @@ class UserBoothMenusViewSet(viewsets.ViewSet):
 
     @action(detail=True, methods=['get'], url_path='all-menus')
     def all_menus(self, request, pk=None):
-        try:
-            booth = Booth.objects.get(pk=pk)
-        except Booth.DoesNotExist:
+        # 부스/운영자 설정/seat_fee 메뉴/테이블 번호는 부스 컨텍스트 캐시에서
+        context = get_booth_context(pk)
+        if not context:
             return Response({
                 "status": 404,
                 "message": "해당 부스가 존재하지 않습니다.",
                 "data": None
             }, status=404)
+        booth_id = context.booth_id
             
         table_info = []
         table_num = request.GET.get("table_num")
 
+        # 메뉴/세트 직렬화 결과는 부스별 캐시 (재고 값은 아래에서 덮어씀)
+        version, catalog = get_catalog(booth_id)
+        seat_fee_menu_id = context.seat_fee_menu_id
+
         # 테이블 이용료 정보
-        try:
-            manager = Manager.objects.get(booth=booth)
-            seat_fee_menu = Menu.objects.filter(booth=booth, menu_category="seat_fee").first()
-            if manager.seat_type == "PP":
-                seat_fee_menu = Menu.objects.filter(booth=booth, menu_category="seat_fee").first()
-                table_info = {
-        
-                    "seat_type": "person",
-                    "seat_tax_person": manager.seat_tax_person,
-                    "menu_id": seat_fee_menu.id if seat_fee_menu else None,
-                    "is_seatfee_soldout":  False
-                }
-                
-            elif manager.seat_type == "PT":
-                is_seatfee_soldout = False
-                if table_num and seat_fee_menu:
-                    table = Table.objects.filter(booth=booth, table_num=table_num).first()
-                    if table:
-                        activated_at = getattr(table, "activated_at", None)
-                        if activated_at:
-                            qs = OrderMenu.objects.filter(
-                                order__table=table,
-                                menu=seat_fee_menu,
-                                order__created_at__gte=activated_at
-                            )
-                            is_seatfee_soldout = qs.exists()
-                        else:
-                            # ✅ 활성화 세션이 없으면 주문된 것으로 보지 않음
-                            is_seatfee_soldout = False
-                            
-                table_info = {
-                    "seat_type": "table",
-                    "seat_tax_table": manager.seat_tax_table,
-                    "menu_id": seat_fee_menu.id if seat_fee_menu else None,
-                    "is_seatfee_soldout": is_seatfee_soldout,
-                }
-            else:
-                table_info = []
-        except Manager.DoesNotExist:
+        if context.seat_type == "PP":
+            table_info = {
+    
+                "seat_type": "person",
+                "seat_tax_person": context.seat_tax_person,
+                "menu_id": seat_fee_menu_id,
+                "is_seatfee_soldout":  False
+            }
+            
+        elif context.seat_type == "PT":
+            is_seatfee_soldout = False
+            table_id = context.table_id(table_num) if table_num else None
+            if table_id and seat_fee_menu_id:
+                # 진행 중인 세션의 이용료 주문 여부 (세션이 없으면 주문된 것으로 보지 않음)
+                is_seatfee_soldout = TableSession.objects.filter(
+                    table_id=table_id, ended_at__isnull=True, seat_fee_ordered=True
+                ).exists()
+                        
+            table_info = {
+                "seat_type": "table",
+                "seat_tax_table": context.seat_tax_table,
+                "menu_id": seat_fee_menu_id,
+                "is_seatfee_soldout": is_seatfee_soldout,
+            }
+        else:
+            # seat_type NO / 운영자 없음
             table_info = []
 
         category = request.GET.get('category')
-        menus_qs = Menu.objects.filter(booth=booth)
-        setmenus_qs = SetMenu.objects.filter(booth=booth)
-        if category:
-            menus_qs = menus_qs.filter(menu_category=category)
-            setmenus_qs = setmenus_qs.filter(set_category=category)
+        stock = get_stock_map(booth_id)
 
-        menus = MenuSerializer(menus_qs, many=True, context={'request': request}).data
-        
-        setmenus = SetMenuSerializer(setmenus_qs, many=True, context={'request': request}).data
+        # 카탈로그 버전 + 재고 + 테이블 상태가 같으면 본문 없이 304
+        etag = catalog_etag(booth_id, version, stock, [table_info, category, request.build_absolute_uri("/")])
+        if version is not None and etag_matches(request, etag):
+            response = Response(status=304)
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        menus, setmenus = overlay_stock(catalog, stock, request=request, category=category)
         if table_info and isinstance(table_info, dict) and "is_seatfee_soldout" in table_info:
             for m in menus:
                 if m.get("menu_category") == SEAT_FEE_CATEGORY:
                     m["is_seatfee_soldout"] = table_info["is_seatfee_soldout"]
         
         data = {
-            "booth_id": booth.pk,
+            "booth_id": booth_id,
             "table": table_info if table_info else [],
             "menus": menus,
             "setmenus": setmenus,
         }
 
-        return Response({
+        response = Response({
             "status": 200,
             "message": "부스 메뉴 목록(메뉴, 세트메뉴, 테이블이용료)이 성공적으로 조회되었습니다.",
             "data": data
         }, status=200)
+        if version is not None:
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+        return response
@@ -1,26 +1,34 @@
+import asyncio
 import json
 import logging
-import math
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
+from project.async_db import db_task, run_db
+from project.snapshot_cache import get_snapshot, invalidate_snapshot
+from project.ws_frames import event_frame, with_frame
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
-from statistic.utils import push_statistics
+from statistic.utils import schedule_push_statistics
 
+from booth.utils.booth_context import get_booth_context
+from booth.utils.table_timer import table_status
 from manager.models import Manager
-from order.models import Order
-from order.utils.order_broadcast import expand_order
+from order.utils.order_broadcast import (
+    build_order_snapshot, order_frame, order_updates_frame, revenue_frame,
+)
+from order.utils.cook_queue import build_cook_queue
+from order.utils.order_events import current_seq, replay_order_events
 
 try:
-    from booth.models import Table
+    from booth.models import Booth, Table
 except ImportError as e:
     logging.critical(f"Critical: Failed to import Table model in consumers.py: {e}")
 
 logger = logging.getLogger(__name__)
 
 
-# ORM → async safe (thread_sensitive=True 로 고정) 
-@sync_to_async(thread_sensitive=True)
+# ORM → 컨슈머 전용 스레드 풀 (project/async_db.py, 부스별 동시 실행 상한)
+@db_task
 def get_manager_and_booth(user):   # [추가] manager + booth를 함께 가져오는 함수
     try:
         manager = Manager.objects.select_related("booth").get(user=user)  # booth 미리 로드
@@ -34,55 +42,72 @@ def get_manager_and_booth(user):   # [추가] manager + booth를 함께 가져
         raise
 
 
-@sync_to_async(thread_sensitive=True)
-def get_table_statuses(user):
-    try:
-        manager = Manager.objects.select_related("booth").get(user=user)
-    except Manager.DoesNotExist:
+async def get_socket_booth_id(user):
+    """
+    웹소켓 사용자의 부스 id (운영자가 아니면 None)
+    토큰에 booth_id claim 이 있으면 DB 조회 없음 (project/auth.py), 예전 토큰은 Manager 조회
+    """
+    booth_id = getattr(user, "booth_id", None)
+    if booth_id is not None:
+        return booth_id
+    manager, booth = await get_manager_and_booth(user)
+    return booth.id if manager and booth else None
+
+
+async def get_table_statuses(user):
+    """REFRESH 요청용 (보관분 없이 다시 계산)"""
+    booth_id = await get_socket_booth_id(user)
+    if booth_id is None:
         logger.warning(f"No Manager found for user {user} in get_table_statuses. Returning empty list.")
         return []
-    except Exception as e:
-        logger.error(f"Error fetching manager in get_table_statuses for user {user}: {e}", exc_info=True)
-        raise
+    return await run_db(_table_statuses, booth_id, booth_id=booth_id)
+
+
+async def get_booth_table_statuses(booth_id):
+    # 동시에 접속한 대시보드끼리 계산 1회 공유 (project/snapshot_cache.py)
+    return await get_snapshot("tables", booth_id, _table_statuses)
 
+
+def _table_statuses(booth_id):
     try:
-        if not manager.booth:
-            logger.error(f"Manager {manager} has no associated booth when trying to get table statuses.")
-            return []
-
-        tables = list(Table.objects.filter(booth=manager.booth))
-        result = []
-        for table in tables:
-            remaining_minutes, is_expired = None, False
-
-            if table.activated_at and manager.table_limit_hours:
-                elapsed = timezone.now() - table.activated_at
-                limit = timedelta(minutes=manager.table_limit_hours)
-
-                total_seconds = (limit - elapsed).total_seconds()
-                remaining_minutes = max(0, math.ceil(total_seconds / 60))
-
-                is_expired = elapsed >= limit
-
-            result.append({
-                "tableNumber": table.table_num,
-                "status": table.status,
-                "activatedAt": table.activated_at.isoformat() if table.activated_at else None,
-                "remainingMinutes": remaining_minutes,
-                "expired": is_expired
-            })
-        return result
+        # 이용 제한 시간은 부스 컨텍스트 캐시에서 (booth/utils/booth_context.py)
+        context = get_booth_context(booth_id)
+        table_limit_hours = context.table_limit_hours if context else None
+
+        now = timezone.now()
+        return [table_status(table, table_limit_hours, now) for table in Table.objects.filter(booth_id=booth_id)]
     except Exception as e:
-        logger.error(f"Error fetching or processing table statuses for manager {manager}: {e}", exc_info=True)
+        logger.error(f"Error fetching or processing table statuses for booth {booth_id}: {e}", exc_info=True)
         raise
 
-@sync_to_async(thread_sensitive=True)
-def get_all_orders(booth):
-    orders = []
-    qs = Order.objects.filter(table__booth=booth)
-    for order in qs:
-        orders.extend(expand_order(order))
-    return orders
+def order_snapshot(booth_id):
+    # 주문 수와 무관하게 한 번의 JOIN 쿼리로 snapshot 생성
+    # seq 를 먼저 읽어야 snapshot 이후 이벤트를 놓치지 않음 (중복 적용은 클라이언트에서 덮어쓰기)
+    seq = current_seq(booth_id)
+    total_revenue = Booth.objects.filter(pk=booth_id).values_list("total_revenues", flat=True).first()
+    return seq, total_revenue, build_order_snapshot(booth_id)
+
+
+@db_task(booth_arg="booth_id")
+def get_total_revenue(booth_id):
+    return Booth.objects.filter(pk=booth_id).values_list("total_revenues", flat=True).first()
+
+
+async def get_all_orders(booth_id):
+    # 재접속 폭주 시 같은 부스 snapshot 은 한 번만 계산 (project/snapshot_cache.py)
+    return await get_snapshot("orders", booth_id, order_snapshot)
+
+
+@db_task(booth_arg="booth_id")
+def get_missed_order_events(booth_id, last_seq):
+    return replay_order_events(booth_id, last_seq)
+
+
+def parse_last_seq(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
 
 
 # 주문 웹소켓
@@ -95,29 +120,49 @@ class OrderConsumer(AsyncWebsocketConsumer):
             return await self.close(code=4001)
 
         try:
-            self.manager, self.booth = await get_manager_and_booth(user)
-            if not self.manager or not self.booth:
+            self.booth_id = await get_socket_booth_id(user)
+            if not self.booth_id:
                 return await self.close(code=4003)
 
-            self.room_group_name = f"booth_{self.booth.id}_orders"
+            self.room_group_name = f"booth_{self.booth_id}_orders"
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             await self.accept()
 
-            # 최초 접속 시 snapshot 내려줌
-            orders = await get_all_orders(self.booth)
-            await self.send(text_data=json.dumps({
-                "type": "ORDER_SNAPSHOT",
-                "data": {
-                    "total_revenue": self.booth.total_revenues,
-                    "orders": orders
-                }
-            }))
+            # 재연결(?last_seq=N) 이면 놓친 이벤트만, 아니면 snapshot 내려줌
+            query = parse_qs(self.scope.get("query_string", b"").decode())
+            last_seq = parse_last_seq(query.get("last_seq", [None])[0])
+            await self.send_resume(last_seq)
 
-            logger.info(f"OrderConsumer: Connected for booth {self.booth.id}")
+            logger.info(f"OrderConsumer: Connected for booth {self.booth_id}")
         except Exception as e:
             logger.error(f"OrderConsumer connect error: {e}", exc_info=True)
             return await self.close(code=5000)
 
+    async def send_snapshot(self):
+        seq, total_revenue, orders = await get_all_orders(self.booth_id)
+        await self.send(text_data=json.dumps({
+            "type": "ORDER_SNAPSHOT",
+            "seq": seq,
+            "data": {
+                "total_revenue": total_revenue,
+                "orders": orders
+            }
+        }))
+
+    async def send_resume(self, last_seq):
+        """last_seq 이후 이벤트 재전송 (로그에서 찾을 수 없으면 snapshot)"""
+        events = None
+        if last_seq is not None:
+            events = await get_missed_order_events(self.booth_id, last_seq)
+        if events is None:
+            return await self.send_snapshot()
+
+        await self.send(text_data=json.dumps({
+            "type": "ORDER_REPLAY",
+            "seq": events[-1]["seq"] if events else last_seq,
+            "data": {"events": [order_frame(e) for e in events]},
+        }))
+
     async def disconnect(self, close_code):
         if hasattr(self, "room_group_name"):
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
@@ -125,46 +170,113 @@ class OrderConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
-            if data.get("type") == "NEW_ORDER":
+            if data.get("type") == "RESUME":
+                await self.send_resume(parse_last_seq(data.get("last_seq")))
+
+            elif data.get("type") == "NEW_ORDER":
+                # 새 주문 → 조리 대기열 보관분 무효화 (그룹 전송 전)
+                await run_db(invalidate_snapshot, self.booth_id, "cook_queue")
                 await self.channel_layer.group_send(
                     self.room_group_name,
-                    {"type": "new_order", "data": data["data"]}
+                    with_frame({"type": "new_order"}, {"type": "NEW_ORDER", "data": data["data"]}),
                 )
 
-                # lazy import (순환 방지)
-                from statistic.utils import push_statistics
-                push_statistics(self.booth.id)
+                # 통계 계산은 스케줄러 타이머 스레드에서 (이벤트 루프 블로킹 방지)
+                await run_db(schedule_push_statistics, self.booth_id)
         except Exception as e:
             logger.error(f"OrderConsumer receive error: {e}", exc_info=True)
 
     async def new_order(self, event):
         """NEW_ORDER 이벤트 브로드캐스트"""
-        await self.send(text_data=json.dumps({
-            "type": "NEW_ORDER",
-            "data": event["data"]
-        }))
+        await self.send(text_data=event_frame(event, lambda e: {"type": "NEW_ORDER", "data": e["data"]}))
+
+    # 아래 핸들러들은 broadcast 헬퍼가 한 번 직렬화한 frame 을 그대로 전달
+    async def order_item_added(self, event):
+        """broadcast_order_created: 새 주문 항목"""
+        await self.send(text_data=event_frame(event, order_frame))
 
     async def order_update(self, event):
-        """broadcast_order_update 에서 호출됨"""
-        await self.send(text_data=json.dumps({
-            "type": "ORDER_UPDATE",
-            "data": event["data"]
-        }))
+        """broadcast_order_item_update / broadcast_order_set_update: 상태 변경"""
+        await self.send(text_data=event_frame(event, order_frame))
         
     # 새로 추가: 빌지 단위 완료 이벤트
     async def order_completed(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "ORDER_COMPLETED",
-            "data": event["data"]   # { order_id, table_num }
-        }))
+        await self.send(text_data=event_frame(event, order_frame))   # data: { order_id, table_num }
         
     async def order_cancelled(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "ORDER_CANCELLED",
-            "data": event["data"]
-        }))
+        await self.send(text_data=event_frame(event, order_frame))
+
+    async def order_updates(self, event):
+        """buffered_broadcasts 로 모인 이벤트 묶음"""
+        await self.send(text_data=event_frame(event, order_updates_frame))
+
+
+
+
+# 주방 조리 대기열 웹소켓 (메뉴별 묶음)
+class CookQueueConsumer(AsyncWebsocketConsumer):
+    """
+    부스 주문 그룹 (booth_{id}_orders) 이벤트를 받으면
+    COOK_QUEUE_PUSH_DEBOUNCE_MS 동안 모았다가 대기열 전체를 다시 전송
+    계산은 같은 부스 연결끼리 공유 (project/snapshot_cache.py)
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if not user or not user.is_authenticated:
+            return await self.close(code=4001)
+
+        try:
+            self.booth_id = await get_socket_booth_id(user)
+            if not self.booth_id:
+                return await self.close(code=4003)
+
+            self.refresh_task = None
+            self.room_group_name = f"booth_{self.booth_id}_orders"
+            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+            await self.accept()
+            await self.send_queue()
+        except Exception as e:
+            logger.error(f"CookQueueConsumer connect error: {e}", exc_info=True)
+            return await self.close(code=5000)
+
+    async def disconnect(self, close_code):
+        if getattr(self, "refresh_task", None):
+            self.refresh_task.cancel()
+        if hasattr(self, "room_group_name"):
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
+    async def send_queue(self):
+        queue = await get_snapshot("cook_queue", self.booth_id, build_cook_queue)
+        await self.send(text_data=json.dumps({"type": "COOK_QUEUE", "data": queue}))
 
+    async def receive(self, text_data):
+        try:
+            if json.loads(text_data).get("type") == "REFRESH":
+                await self.send_queue()
+        except Exception as e:
+            logger.error(f"CookQueueConsumer receive error: {e}", exc_info=True)
+
+    def schedule_refresh(self):
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.ensure_future(self.refresh_later())
+
+    async def refresh_later(self):
+        await asyncio.sleep(getattr(settings, "COOK_QUEUE_PUSH_DEBOUNCE_MS", 300) / 1000)
+        try:
+            await self.send_queue()
+        except Exception as e:
+            logger.error(f"CookQueueConsumer refresh error: {e}", exc_info=True)
+
+    # 주문 그룹 이벤트 → 대기열 갱신 예약 (프레임 자체는 전달하지 않음)
+    async def order_update(self, event):
+        self.schedule_refresh()
+
+    order_updates = order_update
+    order_item_added = order_update
+    order_completed = order_update
+    order_cancelled = order_update
+    new_order = order_update
 
 
 # 직원 호출 웹소켓
@@ -179,19 +291,15 @@ class CallStaffConsumer(AsyncWebsocketConsumer):
             return await self.close(code=4001)
 
         try:
-            manager, booth = await get_manager_and_booth(user)   # [변경] booth까지 안전하게 가져오기
-            if not manager:
+            booth_id = await get_socket_booth_id(user)   # 토큰 claim 이 있으면 DB 조회 없음
+            if not booth_id:
                 logger.error(f"CallStaffConsumer: Connection rejected. Manager not found for user {user.id}.")
                 return await self.close(code=4003)
 
-            if not booth:
-                logger.error(f"CallStaffConsumer: Connection rejected. Manager {manager.id} has no associated booth.")
-                return await self.close(code=4004)
-
             await self.accept()
-            logger.info(f"CallStaffConsumer: Connection accepted for booth {booth.id}.")
+            logger.info(f"CallStaffConsumer: Connection accepted for booth {booth_id}.")
             
-            self.room_group_name = f"booth_{booth.id}_staff_calls"
+            self.room_group_name = f"booth_{booth_id}_staff_calls"
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             logger.info(f"CallStaffConsumer: User {user.id} added to channel group '{self.room_group_name}'.")
 
@@ -228,24 +336,20 @@ class TableStatusConsumer(AsyncWebsocketConsumer):
             return await self.close(code=4001)
 
         try:
-            manager, booth = await get_manager_and_booth(user)
-            if not manager:
+            booth_id = await get_socket_booth_id(user)
+            if not booth_id:
                 logger.error(f"TableStatusConsumer: Connection rejected. Manager not found for user {user.id}.")
                 return await self.close(code=4003)
 
-            if not booth:
-                logger.error(f"TableStatusConsumer: Connection rejected. Manager {manager.id} has no associated booth.")
-                return await self.close(code=4004)
-
             await self.accept()
-            logger.info(f"TableStatusConsumer: Connection accepted for booth {booth.id}.")
+            logger.info(f"TableStatusConsumer: Connection accepted for booth {booth_id}.")
 
-            self.room_group_name = f"booth_{booth.id}_tables"
+            self.room_group_name = f"booth_{booth_id}_tables"
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             logger.info(f"TableStatusConsumer: User {user.id} added to channel group '{self.room_group_name}'.")
 
             # 최초 접속 시 테이블 상태 내려주기
-            table_statuses = await get_table_statuses(user)
+            table_statuses = await get_booth_table_statuses(booth_id)
             await self.send(text_data=json.dumps({
                 "type": "TABLE_STATUS",
                 "data": table_statuses
@@ -305,24 +409,25 @@ class RevenueConsumer(AsyncWebsocketConsumer):
             return await self.close(code=4001)
 
         try:
-            manager, booth = await get_manager_and_booth(user)
-            if not manager or not booth:
+            booth_id = await get_socket_booth_id(user)
+            if not booth_id:
                 logger.warning(f"RevenueConsumer: No manager/booth for user {getattr(user, 'id', None)}")
                 return await self.close(code=4003)
 
-            self.booth = booth
-            self.room_group_name = f"booth_{booth.id}_revenue"
+            self.booth_id = booth_id
+            self.room_group_name = f"booth_{booth_id}_revenue"
             await self.channel_layer.group_add(self.room_group_name, self.channel_name)
             await self.accept()
 
             # 최초 접속 시 snapshot 전송
+            total_revenue = await get_total_revenue(booth_id)
             await self.send(text_data=json.dumps({
                 "type": "REVENUE_SNAPSHOT",
-                "boothId": int(booth.id),
-                "totalRevenue": int(booth.total_revenues or 0),  # Decimal → int 변환
+                "boothId": int(booth_id),
+                "totalRevenue": int(total_revenue or 0),  # Decimal → int 변환
             }))
 
-            logger.info(f"RevenueConsumer: Connected for booth {booth.id}")
+            logger.info(f"RevenueConsumer: Connected for booth {booth_id}")
         except Exception as e:
             logger.error(f"RevenueConsumer connect error: {e}", exc_info=True)
             return await self.close(code=5000)
@@ -332,8 +437,4 @@ class RevenueConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     async def revenue_update(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "REVENUE_UPDATE",
-            "boothId": int(event["boothId"]),
-            "totalRevenue": int(event["totalRevenue"] or 0),  # Decimal → int 변환
-        }))
\ No newline at end of file
+        await self.send(text_data=event_frame(event, revenue_frame))
\ No newline at end of file
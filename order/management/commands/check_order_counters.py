@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from order.utils.order_progress import verify_order_counters
+
+
+class Command(BaseCommand):
+    help = "주문/세트 진행 카운터(pending/cooked/served_items)를 항목 행 집계와 비교 (--fix 시 불일치 행 수정)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--booth", type=int, help="특정 부스만 점검")
+        parser.add_argument("--fix", action="store_true", help="불일치 시 카운터 수정")
+
+    def handle(self, *args, **options):
+        mismatches = verify_order_counters(booth_id=options["booth"], fix=options["fix"])
+        for model_name, pk, counted, scanned in mismatches:
+            self.stdout.write(f"{model_name} {pk}: counter={counted} full_scan={scanned}")
+
+        if mismatches and options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)}개 행 카운터 수정"))
+        elif mismatches:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)}개 행 불일치"))
+        else:
+            self.stdout.write(self.style.SUCCESS("모든 주문 카운터 일치"))
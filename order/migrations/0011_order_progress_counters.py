@@ -0,0 +1,73 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:34
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+VISIBLE_MENU_CATEGORIES = ["메뉴", "음료"]
+ITEM_STATUSES = ("pending", "cooked", "served")
+
+
+def _item_count(items, parent_field, status):
+    rows = (
+        items.filter(**{parent_field: OuterRef("pk")}, status=status)
+        .order_by().values(parent_field).annotate(n=Count("id")).values("n")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    # 기존 주문의 진행 카운터를 항목 행 집계로 채움 (모델별 UPDATE 1회)
+    Order = apps.get_model("order", "Order")
+    OrderMenu = apps.get_model("order", "OrderMenu")
+    OrderSetMenu = apps.get_model("order", "OrderSetMenu")
+
+    visible = OrderMenu.objects.filter(menu__menu_category__in=VISIBLE_MENU_CATEGORIES)
+    Order.objects.update(**{
+        f"{status}_items": _item_count(visible, "order", status) for status in ITEM_STATUSES
+    })
+    OrderSetMenu.objects.update(**{
+        f"{status}_items": _item_count(OrderMenu.objects.all(), "ordersetmenu", status)
+        for status in ITEM_STATUSES
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_ordermenu_cooked_at_ordermenu_served_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cooked_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pending_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='served_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ordersetmenu',
+            name='cooked_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ordersetmenu',
+            name='pending_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ordersetmenu',
+            name='served_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0011_order_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordermenu',
+            index=models.Index(fields=['status', 'menu'], name='ordermenu_status_menu_idx'),
+        ),
+    ]
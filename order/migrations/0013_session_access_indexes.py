@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0012_ordermenu_status_menu_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['table', 'created_at'], name='order_table_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordermenu',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'cooked'])), fields=['order', 'status'], name='ordermenu_open_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffcall',
+            index=models.Index(fields=['booth', '-created_at'], name='staffcall_booth_created_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+
+def _session_of(TableSession, created_field):
+    # 같은 테이블에서 생성 시각을 포함하는 세션 (가장 최근 시작)
+    return Subquery(
+        TableSession.objects.filter(
+            table_id=OuterRef("table_id"),
+            started_at__lte=OuterRef(created_field),
+        )
+        .filter(Q(ended_at__isnull=True) | Q(ended_at__gte=OuterRef(created_field)))
+        .order_by("-started_at")
+        .values("pk")[:1]
+    )
+
+
+def backfill_order_sessions(apps, schema_editor):
+    # 기존 주문을 생성 시각이 속한 세션에 연결 + 세션 플래그 계산 (모델별 UPDATE 1회)
+    Order = apps.get_model("order", "Order")
+    OrderMenu = apps.get_model("order", "OrderMenu")
+    TableSession = apps.get_model("booth", "TableSession")
+
+    Order.objects.filter(session__isnull=True).update(session=_session_of(TableSession, "created_at"))
+    TableSession.objects.update(
+        has_ordered=Exists(Order.objects.filter(session_id=OuterRef("pk"))),
+        seat_fee_ordered=Exists(
+            OrderMenu.objects.filter(order__session_id=OuterRef("pk"), menu__menu_category="seat_fee")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booth', '0010_tablesession'),
+        ('order', '0013_session_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='booth.tablesession'),
+        ),
+        migrations.RunPython(backfill_order_sessions, migrations.RunPython.noop),
+    ]
@@ -11,6 +11,10 @@ class Order(models.Model):
         CANCELLED = 'cancelled', '취소됨'
 
     table = models.ForeignKey(Table, on_delete=models.CASCADE)
+    # 주문 시점의 테이블 세션 (생성 시 table.current_session)
+    session = models.ForeignKey(
+        TableSession, null=True, blank=True, on_delete=models.SET_NULL, related_name="orders"
+    )
     order_amount = models.FloatField()
     order_status = models.CharField(
         max_length=20,
@@ -21,9 +25,31 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)       # 주문 수정 시점
     served_at = models.DateTimeField(null=True, blank=True)  # 서빙 완료 시점
 
+    # 주방/서빙 화면에 보이는 항목(메뉴/음료) 상태별 개수 (order/utils/order_progress.py 에서 갱신)
+    pending_items = models.IntegerField(default=0)
+    cooked_items = models.IntegerField(default=0)
+    served_items = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # 테이블 세션 주문 (table_id = ? AND created_at >= activated_at)
+            models.Index(fields=["table", "created_at"], name="order_table_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.pk} - Table {self.table.table_num}"
 
+    def save(self, *args, **kwargs):
+        # 세션을 지정하지 않고 만들면 테이블의 진행 중인 세션
+        if self._state.adding and self.session_id is None and self.table_id:
+            self.session_id = current_session_id(self.table_id)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_all_served(self):
+        # 보이는 항목이 모두 서빙 완료 (빌지 완료)
+        return self.pending_items == 0 and self.cooked_items == 0
+
 
 class OrderMenu(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
@@ -52,6 +78,19 @@ class OrderMenu(models.Model):
     # 새로운 필드들
     cooked_at = models.DateTimeField(null=True, blank=True)
     served_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # 주방 조리 대기열 메뉴별 집계 (order/utils/cook_queue.py)
+            models.Index(fields=["status", "menu"], name="ordermenu_status_menu_idx"),
+            # 주문별 진행 중 항목 (served 는 대부분이라 제외한 부분 인덱스)
+            models.Index(
+                fields=["order", "status"],
+                name="ordermenu_open_order_idx",
+                condition=models.Q(status__in=["pending", "cooked"]),
+            ),
+        ]
+
     def __str__(self):
         return f"OrderMenu #{self.pk} - {self.menu.menu_name} x{self.quantity}"
 
@@ -59,10 +98,14 @@ class OrderMenu(models.Model):
         return self.fixed_price * self.quantity
     
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         # 새로 생성(add)될 때만 강제로 cooked로 시작
-        if self._state.adding and self.menu and self.menu.menu_category == "음료":
+        if adding and self.menu and self.menu.menu_category == "음료":
             self.status = "cooked"
         super().save(*args, **kwargs)
+        if adding:
+            from order.utils.order_progress import count_added_item
+            count_added_item(self)
 
 
 class OrderSetMenu(models.Model):
@@ -85,9 +128,19 @@ class OrderSetMenu(models.Model):
     # 새로운 필드들
     cooked_at = models.DateTimeField(null=True, blank=True)
     served_at = models.DateTimeField(null=True, blank=True)
+
+    # 구성품 상태별 개수 (order/utils/order_progress.py 에서 갱신)
+    pending_items = models.IntegerField(default=0)
+    cooked_items = models.IntegerField(default=0)
+    served_items = models.IntegerField(default=0)
+
     def __str__(self):
         return f"OrderSetMenu #{self.pk} - {self.set_menu.set_name} x{self.quantity}"
 
+    @property
+    def total_items(self):
+        return self.pending_items + self.cooked_items + self.served_items
+
     def get_total_price(self):
         return self.fixed_price * self.quantity
     
@@ -100,6 +153,10 @@ class StaffCall(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # 부스별 최근 호출 목록
+            models.Index(fields=["booth", "-created_at"], name="staffcall_booth_created_idx"),
+        ]
 
     def __str__(self):
         return f"StaffCall #{self.pk} - Booth {self.booth_id}, Table {self.table.table_num}"
\ No newline at end of file
@@ -86,3 +86,13 @@ class CancelItemSerializer(serializers.Serializer):
     )
     quantity = serializers.IntegerField()
 
+
+class TransitionItemSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=["menu", "setmenu"])
+    id = serializers.IntegerField()
+
+
+class BatchTransitionSerializer(serializers.Serializer):
+    target_status = serializers.ChoiceField(choices=["cooked", "served"])
+    items = TransitionItemSerializer(many=True, allow_empty=False, max_length=200)
+
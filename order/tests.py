@@ -0,0 +1,1486 @@
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from booth.models import Booth, Table, TableSession
+from booth.utils.table_session import end_session, start_session
+from cart.models import Cart, CartMenu, CartSetMenu
+from manager.models import Manager
+from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import get_stock
+from order.models import Order, OrderMenu, OrderSetMenu
+from order.consumers import CookQueueConsumer, OrderConsumer, RevenueConsumer
+from order.utils.order_broadcast import (
+    broadcast_order_created, broadcast_order_item_update, broadcast_order_set_update, buffered_broadcasts,
+    broadcast_total_revenue, build_order_snapshot, expand_order, flush_order_events, order_frame,
+    order_updates_frame,
+)
+from order.utils.order_events import current_seq, record_order_event, replay_order_events
+from order.utils.order_progress import transition_item, verify_order_counters
+from project import async_db
+from project.async_db import run_db
+from statistic.utils import cancel_pending_pushes, reconcile_statistics
+from project.auth import ManagerTokenUser, issue_manager_tokens
+from project.middleware import JWTAuthMiddleware, get_user_from_token
+from project.snapshot_cache import get_snapshot, get_snapshot_metrics, invalidate_snapshot
+from project.ws_frames import encode_frame, with_frame
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Manager QR / 메뉴 이미지 등 업로드 파일은 저장소 media/ 가 아닌 임시 디렉터리로
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix="dorder-test-media-")
+
+
+class OrderFixtureMixin:
+    """부스/테이블/메뉴/주문 생성 헬퍼"""
+
+    def create_booth(self, table_count=2, seat_type="NO"):
+        self.user = User.objects.create_user(username="mgr", password="pw")
+        self.booth = Booth.objects.create(booth_name="테스트부스")
+        self.manager = Manager.objects.create(
+            user=self.user,
+            booth=self.booth,
+            table_num=table_count,
+            order_check_password="1234",
+            account="123-456-789",
+            bank="테스트은행",
+            depositor="홍길동",
+            seat_type=seat_type,
+            seat_tax_person=3000,
+            seat_tax_table=5000,
+            table_limit_hours=120,
+        )
+        activated_at = timezone.now() - timedelta(minutes=30)
+        self.tables = [
+            Table.objects.create(
+                booth=self.booth, table_num=i, status="activate", activated_at=activated_at
+            )
+            for i in range(1, table_count + 1)
+        ]
+        for table in self.tables:
+            start_session(table, activated_at)
+            table.save(update_fields=["current_session"])
+        self.food = Menu.objects.create(
+            booth=self.booth, menu_name="떡볶이", menu_category="메뉴",
+            menu_price=5000, menu_amount=1000,
+        )
+        self.drink = Menu.objects.create(
+            booth=self.booth, menu_name="사이다", menu_category="음료",
+            menu_price=2000, menu_amount=1000,
+        )
+        self.seat_fee = Menu.objects.create(
+            booth=self.booth, menu_name="테이블 이용료", menu_category="seat_fee",
+            menu_price=5000, menu_amount=999999,
+        )
+        self.set_menu = SetMenu.objects.create(booth=self.booth, set_name="세트A", set_price=6000)
+        SetMenuItem.objects.create(set_menu=self.set_menu, menu=self.food, quantity=1)
+        SetMenuItem.objects.create(set_menu=self.set_menu, menu=self.drink, quantity=1)
+
+    def tearDown(self):
+        # 통계 push 타이머가 롤백 이후 다음 테스트 도중 실행되지 않도록
+        cancel_pending_pushes()
+        super().tearDown()
+
+    def create_order(self, table, with_set=True, with_seat_fee=False):
+        order = Order.objects.create(table=table, order_amount=0)
+        OrderMenu.objects.create(order=order, menu=self.food, quantity=2, fixed_price=5000)
+        OrderMenu.objects.create(order=order, menu=self.drink, quantity=1, fixed_price=2000)
+        if with_seat_fee:
+            OrderMenu.objects.create(order=order, menu=self.seat_fee, quantity=1, fixed_price=5000)
+        if with_set:
+            osm = OrderSetMenu.objects.create(order=order, set_menu=self.set_menu, quantity=1, fixed_price=6000)
+            OrderMenu.objects.create(order=order, menu=self.food, quantity=1, fixed_price=5000, ordersetmenu=osm)
+            OrderMenu.objects.create(order=order, menu=self.drink, quantity=1, fixed_price=2000, ordersetmenu=osm)
+        return order
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class OrderSnapshotTest(OrderFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.create_booth()
+
+    def test_expand_order_rows(self):
+        """단품 → 세트 구성품 순서, seat_fee 제외"""
+        order = self.create_order(self.tables[0], with_seat_fee=True)
+        rows = expand_order(order)
+
+        self.assertEqual(
+            [(r["menu_name"], r["from_set"]) for r in rows],
+            [("떡볶이", False), ("사이다", False), ("떡볶이", True), ("사이다", True)],
+        )
+        self.assertEqual(rows[2]["set_id"], self.set_menu.id)
+        self.assertEqual(rows[2]["set_name"], "세트A")
+        self.assertTrue(all(r["table_num"] == 1 for r in rows))
+
+    def test_snapshot_skips_previous_session_and_old_served(self):
+        old = self.create_order(self.tables[0], with_set=False)
+        # 재입장: 이전 세션의 주문은 제외
+        start_session(self.tables[0], timezone.now())
+        self.tables[0].save(update_fields=["current_session"])
+
+        served = self.create_order(self.tables[1], with_set=False)
+        OrderMenu.objects.filter(order=served).update(status="served")
+        Order.objects.filter(pk=served.pk).update(served_at=timezone.now() - timedelta(minutes=5))
+
+        # served 지만 빌지가 아직 완료되지 않은 주문은 그대로 노출
+        open_order = self.create_order(self.tables[1], with_set=False)
+        OrderMenu.objects.filter(order=open_order, menu=self.drink).update(status="served")
+
+        rows = build_order_snapshot(self.booth.id)
+        self.assertEqual({r["order_id"] for r in rows}, {open_order.id})
+        self.assertEqual(len(rows), 2)
+
+    def test_snapshot_matches_expand_order(self):
+        orders = [self.create_order(t) for t in self.tables for _ in range(3)]
+        expected = [row for order in sorted(orders, key=lambda o: o.id) for row in expand_order(order)]
+        self.assertEqual(build_order_snapshot(self.booth.id), expected)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class OrderSnapshotBenchmarkTest(OrderFixtureMixin, TestCase):
+    """snapshot 쿼리 수가 주문량과 무관하게 일정한지 확인"""
+
+    def setUp(self):
+        self.create_booth(table_count=10)
+
+    def _snapshot_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = build_order_snapshot(self.booth.id)
+        return len(ctx.captured_queries), rows
+
+    def test_query_count_is_flat(self):
+        for table in self.tables:
+            self.create_order(table)
+        small_queries, small_rows = self._snapshot_queries()
+
+        for table in self.tables:
+            for _ in range(20):
+                self.create_order(table)
+        large_queries, large_rows = self._snapshot_queries()
+
+        self.assertEqual(len(small_rows), 10 * 4)
+        self.assertEqual(len(large_rows), 10 * 21 * 4)
+        self.assertEqual(small_queries, 1)
+        self.assertEqual(large_queries, small_queries)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class OrderListViewTest(OrderFixtureMixin, TestCase):
+    url = "/api/v2/booth/orders/"
+
+    def setUp(self):
+        self.create_booth(table_count=4, seat_type="PT")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_kitchen_board(self):
+        order = self.create_order(self.tables[0], with_seat_fee=True)
+        OrderMenu.objects.filter(order=order, menu=self.food, ordersetmenu__isnull=True).update(status="served")
+
+        resp = self.client.get(self.url, {"type": "kitchen"})
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.data["data"]["orders"]
+        # seat_fee, served 제외 → 단품 음료 + 세트 구성품 2개
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(r["status"] in ("pending", "cooked") for r in rows))
+        self.assertEqual(sum(r["from_set"] for r in rows), 2)
+
+    def test_serving_board_hides_old_served(self):
+        done = self.create_order(self.tables[0], with_set=False)
+        OrderMenu.objects.filter(order=done).update(status="served")
+        Order.objects.filter(pk=done.pk).update(served_at=timezone.now() - timedelta(minutes=10))
+        recent = self.create_order(self.tables[1], with_set=False)
+        OrderMenu.objects.filter(order=recent).update(status="served")
+
+        resp = self.client.get(self.url, {"type": "serving"})
+        rows = resp.data["data"]["orders"]
+        self.assertEqual({r["order_id"] for r in rows}, {recent.id})
+
+    def test_menu_and_category_filters(self):
+        self.create_order(self.tables[0])
+        resp = self.client.get(self.url, {"type": "kitchen", "menu": "떡볶"})
+        self.assertEqual({r["menu_name"] for r in resp.data["data"]["orders"]}, {"떡볶이"})
+
+        resp = self.client.get(self.url, {"type": "kitchen", "category": "음료"})
+        self.assertEqual({r["menu_category"] for r in resp.data["data"]["orders"]}, {"음료"})
+
+    def test_sorted_by_created_at(self):
+        first = self.create_order(self.tables[1], with_set=False)
+        second = self.create_order(self.tables[0], with_set=False)
+        Order.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        rows = self.client.get(self.url, {"type": "kitchen"}).data["data"]["orders"]
+        self.assertEqual([r["order_id"] for r in rows], [first.id, first.id, second.id, second.id])
+
+    def test_query_count_is_constant(self):
+        for table in self.tables:
+            self.create_order(table)
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"type": "kitchen"})
+
+        for table in self.tables:
+            for _ in range(10):
+                self.create_order(table)
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.url, {"type": "kitchen"})
+        self.assertEqual(len(resp.data["data"]["orders"]), 4 * 11 * 4)
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrderCheckoutTest(OrderFixtureMixin, TestCase):
+    url = "/api/v2/tables/orders/order_check/"
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.client = APIClient()
+
+    def checkout(self, cart):
+        return self.client.post(
+            self.url, {"password": "1234", "cart_id": cart.id},
+            format="json", HTTP_BOOTH_ID=str(self.booth.id),
+        )
+
+    def test_checkout_creates_rows_and_decrements_stock(self):
+        cart = Cart.objects.create(table=self.tables[0])
+        CartMenu.objects.create(cart=cart, menu=self.food, quantity=2)
+        CartMenu.objects.create(cart=cart, menu=self.drink, quantity=1)
+        CartSetMenu.objects.create(cart=cart, set_menu=self.set_menu, quantity=2)
+
+        resp = self.checkout(cart)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["data"]["subtotal"], 2 * 5000 + 2000 + 2 * 6000)
+
+        order = Order.objects.get(pk=resp.data["data"]["order_id"])
+        self.assertEqual(order.order_amount, 24000)
+        rows = [
+            (om.menu_id, om.quantity, om.status, om.ordersetmenu_id is not None)
+            for om in OrderMenu.objects.filter(order=order).order_by("id")
+        ]
+        self.assertEqual(rows, [
+            (self.food.id, 2, "pending", False),
+            (self.drink.id, 1, "cooked", False),
+            (self.food.id, 2, "pending", True),
+            (self.drink.id, 2, "cooked", True),
+        ])
+
+        self.food.refresh_from_db()
+        self.drink.refresh_from_db()
+        self.assertEqual((self.food.menu_amount, self.drink.menu_amount), (996, 997))
+        self.booth.refresh_from_db()
+        self.assertEqual(self.booth.total_revenues, 24000)
+
+    def test_stock_cache_follows_checkout(self):
+        cart = Cart.objects.create(table=self.tables[0])
+        CartMenu.objects.create(cart=cart, menu=self.drink, quantity=1)
+        # 캐시가 실제보다 낮게 어긋나 있어도 DB 재확인 후 주문 성공
+        cache.set(f"menu_stock:{self.drink.pk}", 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.checkout(cart)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(get_stock([self.drink.pk]), {self.drink.pk: 999})
+
+    def test_stock_cache_kept_when_view_rolls_back(self):
+        cart = Cart.objects.create(table=self.tables[0])
+        CartMenu.objects.create(cart=cart, menu=self.drink, quantity=3)
+        get_stock([self.drink.pk])
+
+        # place_order 이후 (같은 atomic 블록) 실패 → DB 롤백, 캐시도 차감되지 않음
+        with mock.patch("statistic.counters.record_order_created", side_effect=RuntimeError("boom")):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.checkout(cart)
+        self.assertEqual(resp.status_code, 500)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(get_stock([self.drink.pk]), {self.drink.pk: 1000})
+
+    def test_shortage_rolls_back(self):
+        Menu.objects.filter(pk=self.drink.pk).update(menu_amount=2)
+        cart = Cart.objects.create(table=self.tables[0])
+        CartMenu.objects.create(cart=cart, menu=self.drink, quantity=1)
+        CartSetMenu.objects.create(cart=cart, set_menu=self.set_menu, quantity=2)
+
+        resp = self.checkout(cart)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["message"], "세트 '세트A' 구성 '사이다' 재고 부족")
+        self.assertFalse(Order.objects.exists())
+        self.drink.refresh_from_db()
+        self.assertEqual(self.drink.menu_amount, 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrderCheckoutConcurrencyTest(OrderFixtureMixin, TransactionTestCase):
+    """동시 체크아웃 50건: 재고 초과 판매 없음 + 지연 시간 상한"""
+    url = "/api/v2/tables/orders/order_check/"
+    workers = 50
+    stock = 30
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=self.workers)
+        Menu.objects.filter(pk=self.food.pk).update(menu_amount=self.stock)
+        self.carts = []
+        for table in self.tables:
+            cart = Cart.objects.create(table=table)
+            CartMenu.objects.create(cart=cart, menu=self.food, quantity=1)
+            self.carts.append(cart)
+
+    def test_no_oversell_under_parallel_checkout(self):
+        results = []
+        barrier = threading.Barrier(self.workers)
+
+        def worker(cart):
+            client = APIClient()
+            try:
+                barrier.wait()
+                started = time.monotonic()
+                resp = client.post(
+                    self.url, {"password": "1234", "cart_id": cart.id},
+                    format="json", HTTP_BOOTH_ID=str(self.booth.id),
+                )
+                results.append((resp.status_code, time.monotonic() - started))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(cart,)) for cart in self.carts]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        statuses = [code for code, _ in results]
+        self.assertEqual(statuses.count(201), self.stock)
+        self.assertEqual(statuses.count(400), self.workers - self.stock)
+
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.menu_amount, 0)
+        self.assertEqual(OrderMenu.objects.filter(menu=self.food).count(), self.stock)
+        self.booth.refresh_from_db()
+        self.assertEqual(self.booth.total_revenues, self.stock * 5000)
+        self.assertLess(max(elapsed for _, elapsed in results), 10)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ORDER_EVENT_LOG_SIZE=5)
+class OrderEventLogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sequence_and_replay(self):
+        seqs = [record_order_event(1, {"type": "order_update", "data": i})["seq"] for i in range(3)]
+        record_order_event(2, {"type": "order_update", "data": "other booth"})
+
+        self.assertEqual(seqs, [1, 2, 3])
+        self.assertEqual(current_seq(1), 3)
+        self.assertEqual([e["data"] for e in replay_order_events(1, 1)], [1, 2])
+        self.assertEqual(replay_order_events(1, 3), [])
+
+    def test_rolled_over_log_falls_back(self):
+        for i in range(8):
+            record_order_event(1, {"type": "order_update", "data": i})
+
+        self.assertEqual([e["seq"] for e in replay_order_events(1, 3)], [4, 5, 6, 7, 8])
+        self.assertIsNone(replay_order_events(1, 2))   # 5개 초과 → snapshot
+        self.assertIsNone(replay_order_events(1, 9))   # 알 수 없는 seq (캐시 초기화 등)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class OrderConsumerResumeTest(OrderFixtureMixin, TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.order = self.create_order(self.tables[0], with_set=False)
+
+    async def connect(self, path="/ws/orders/"):
+        communicator = WebsocketCommunicator(OrderConsumer.as_asgi(), path)
+        communicator.scope["user"] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_snapshot_then_resume_with_missed_events(self):
+        first = await self.connect()
+        snapshot = await first.receive_json_from()
+        self.assertEqual(snapshot["type"], "ORDER_SNAPSHOT")
+        self.assertEqual(snapshot["seq"], 0)
+        self.assertEqual(len(snapshot["data"]["orders"]), 2)
+
+        om = await sync_to_async(OrderMenu.objects.select_related("order__table__booth", "menu").first)()
+        await sync_to_async(broadcast_order_item_update)(om)
+        live = await first.receive_json_from()
+        self.assertEqual((live["type"], live["seq"]), ("ORDER_UPDATE", 1))
+        await first.disconnect()
+
+        # 끊긴 동안 발생한 이벤트
+        await sync_to_async(broadcast_order_item_update)(om)
+        await sync_to_async(broadcast_order_item_update)(om)
+
+        second = await self.connect(f"/ws/orders/?last_seq={live['seq']}")
+        replay = await second.receive_json_from()
+        self.assertEqual(replay["type"], "ORDER_REPLAY")
+        self.assertEqual([e["seq"] for e in replay["data"]["events"]], [2, 3])
+        self.assertEqual(replay["seq"], 3)
+
+        # 연결 중 RESUME 요청 (최신 상태면 빈 목록)
+        await second.send_json_to({"type": "RESUME", "last_seq": 3})
+        self.assertEqual((await second.receive_json_from())["data"]["events"], [])
+        await second.disconnect()
+
+    async def test_batched_frame(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await sync_to_async(flush_order_events)({self.booth.id: [
+            {"type": "order_update", "data": {"ordermenu_id": 1}},
+            {"type": "order_completed", "data": {"order_id": self.order.id}},
+        ]})
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame["type"], "ORDER_UPDATES")
+        self.assertEqual(frame["seq"], 2)
+        self.assertEqual(
+            [(e["type"], e["seq"]) for e in frame["data"]["events"]],
+            [("ORDER_UPDATE", 1), ("ORDER_COMPLETED", 2)],
+        )
+        await communicator.disconnect()
+
+    async def test_unknown_seq_falls_back_to_snapshot(self):
+        communicator = await self.connect("/ws/orders/?last_seq=42")
+        self.assertEqual((await communicator.receive_json_from())["type"], "ORDER_SNAPSHOT")
+        await communicator.disconnect()
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class BufferedBroadcastTest(OrderFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.order = self.create_order(self.tables[0])
+        self.osm = OrderSetMenu.objects.get(order=self.order)
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f"booth_{self.booth.id}_orders", self.channel)
+
+    def received(self):
+        async def drain():
+            messages = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.layer.receive(self.channel), 0.05)
+                    messages.append(json.loads(message["frame"]))
+                except asyncio.TimeoutError:
+                    return messages
+        return async_to_sync(drain)()
+
+    def test_set_update_collapses_into_one_frame(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered_broadcasts():
+                broadcast_order_set_update(self.osm)
+            self.assertEqual(self.received(), [])   # 커밋 전에는 전송 안 함
+
+        messages = self.received()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["type"], "ORDER_UPDATES")
+        self.assertEqual([e["seq"] for e in messages[0]["data"]["events"]], [1, 2, 3])
+
+    def test_rolled_back_events_are_dropped(self):
+        om = OrderMenu.objects.filter(order=self.order).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered_broadcasts():
+                broadcast_order_item_update(om)
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    broadcast_order_item_update(om)
+                    raise RuntimeError
+
+        messages = self.received()
+        self.assertEqual([m["type"] for m in messages], ["ORDER_UPDATE"])
+
+    def test_serving_view_sends_single_frame(self):
+        OrderSetMenu.objects.filter(pk=self.osm.pk).update(status="cooked")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = client.post("/api/v2/booth/serving/orders/", {"type": "setmenu", "id": self.osm.id}, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+        messages = self.received()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(len(messages[0]["data"]["events"]), 3)
+
+    def test_new_order_sends_item_added_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered_broadcasts():
+                broadcast_order_created(self.order)
+
+        events = self.received()[0]["data"]["events"]
+        self.assertEqual({e["type"] for e in events}, {"ORDER_ITEM_ADDED"})
+        self.assertEqual(
+            sorted(e["data"]["ordermenu_id"] for e in events),
+            sorted(OrderMenu.objects.filter(order=self.order).values_list("id", flat=True)),
+        )
+
+    def test_cancel_sends_only_own_items_per_order(self):
+        other = self.create_order(self.tables[1])
+        foods = dict(OrderMenu.objects.filter(menu=self.food, ordersetmenu__isnull=True).values_list("order_id", "id"))
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = client.patch(
+                "/api/v2/booth/orders/cancel/",
+                {"cancel_items": [{"type": "menu", "order_item_ids": list(foods.values()), "quantity": 4}]},
+                format="json", HTTP_BOOTH_ID=str(self.booth.id),
+            )
+        self.assertEqual(resp.status_code, 200, resp.data)
+
+        messages = self.received()
+        events = [e for m in messages for e in (m["data"]["events"] if m["type"] == "ORDER_UPDATES" else [m])]
+        self.assertEqual({e["type"] for e in events}, {"ORDER_CANCELLED"})
+        by_order = {e["data"]["order_id"]: e["data"]["cancelled_items"] for e in events}
+        self.assertEqual(set(by_order), {self.order.id, other.id})
+        for order_id, items in by_order.items():
+            self.assertEqual([(i["order_menu_id"], i["rest_quantity"]) for i in items], [(foods[order_id], 0)])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrderProgressCounterTest(OrderFixtureMixin, TestCase):
+    """Order / OrderSetMenu 진행 카운터 (형제 항목 조회 없이 세트 상태·빌지 완료 판단)"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.order = self.create_order(self.tables[0], with_seat_fee=True)
+        self.osm = OrderSetMenu.objects.get(order=self.order)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def counters(self, obj):
+        obj.refresh_from_db()
+        return obj.pending_items, obj.cooked_items, obj.served_items
+
+    def post(self, url, om):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, {"type": "menu", "id": om.id}, format="json")
+
+    def test_created_items_are_counted(self):
+        # seat_fee 제외, 음료는 cooked 로 시작
+        self.assertEqual(self.counters(self.order), (2, 2, 0))
+        self.assertEqual(self.counters(self.osm), (1, 1, 0))
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def test_checkout_counts_bulk_created_items(self):
+        cart = Cart.objects.create(table=self.tables[1])
+        CartMenu.objects.create(cart=cart, menu=self.food, quantity=1)
+        CartMenu.objects.create(cart=cart, menu=self.seat_fee, quantity=1)
+        CartSetMenu.objects.create(cart=cart, set_menu=self.set_menu, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = APIClient().post(
+                "/api/v2/tables/orders/order_check/", {"password": "1234", "cart_id": cart.id},
+                format="json", HTTP_BOOTH_ID=str(self.booth.id),
+            )
+        self.assertEqual(resp.status_code, 201)
+        order = Order.objects.get(pk=resp.data["data"]["order_id"])
+        self.assertEqual(self.counters(order), (2, 1, 0))
+        self.assertEqual(self.counters(OrderSetMenu.objects.get(order=order)), (1, 1, 0))
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def test_cook_and_serve_complete_order_without_item_scans(self):
+        items = list(OrderMenu.objects.filter(order=self.order).exclude(menu=self.seat_fee).order_by("id"))
+        food, drink, set_food, set_drink = items
+
+        self.assertEqual(self.post("/api/v2/booth/kitchen/orders/", set_food).status_code, 200)
+        self.osm.refresh_from_db()
+        self.assertEqual(self.osm.status, "cooked")
+        # 이미 조리 완료된 항목은 거부
+        self.assertEqual(self.post("/api/v2/booth/kitchen/orders/", set_food).status_code, 400)
+
+        self.assertEqual(self.post("/api/v2/booth/kitchen/orders/", food).status_code, 200)
+        for om in (drink, set_drink, set_food):
+            self.assertEqual(self.post("/api/v2/booth/serving/orders/", om).status_code, 200)
+        self.osm.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.osm.status, "served")
+        self.assertIsNone(self.order.served_at)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.post("/api/v2/booth/serving/orders/", food).status_code, 200)
+        # 항목 조회는 처리 대상 1건뿐 (형제 항목 / 세트별 조회 없음)
+        item_selects = [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and ('FROM "order_ordermenu"' in q["sql"] or 'FROM "order_ordersetmenu"' in q["sql"])
+        ]
+        self.assertEqual(len(item_selects), 1)
+        self.assertEqual(self.counters(self.order), (0, 0, 4))
+        self.assertIsNotNone(self.order.served_at)
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def test_revert_and_cancel_keep_counters(self):
+        food = OrderMenu.objects.filter(order=self.order, menu=self.food, ordersetmenu__isnull=True).get()
+        self.post("/api/v2/booth/kitchen/orders/", food)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.patch(
+                "/api/v2/booth/revert/orders/", {"id": food.id, "target_status": "pending"}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.counters(self.order), (2, 2, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.patch("/api/v2/booth/orders/cancel/", {
+                "cancel_items": [
+                    {"type": "menu", "order_item_ids": [food.id], "quantity": 2},
+                    {"type": "set", "order_item_ids": [self.osm.id], "quantity": 1},
+                ],
+            }, format="json", HTTP_BOOTH_ID=str(self.booth.id))
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(self.counters(self.order), (0, 1, 0))
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def test_check_command_reports_and_fixes(self):
+        Order.objects.filter(pk=self.order.pk).update(pending_items=9)
+        OrderSetMenu.objects.filter(pk=self.osm.pk).update(served_items=1)
+        self.assertEqual(verify_order_counters(self.booth.id), [
+            ("Order", self.order.pk, (9, 2, 0), (2, 2, 0)),
+            ("OrderSetMenu", self.osm.pk, (1, 1, 1), (1, 1, 0)),
+        ])
+
+        out = StringIO()
+        call_command("check_order_counters", "--fix", stdout=out)
+        self.assertIn("2개 행 카운터 수정", out.getvalue())
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrderBatchTransitionTest(OrderFixtureMixin, TestCase):
+    """여러 항목 일괄 조리/서빙 완료"""
+    url = "/api/v2/booth/orders/transition/"
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=4)
+        self.orders = [self.create_order(table) for table in self.tables]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f"booth_{self.booth.id}_orders", self.channel)
+
+    def received(self):
+        async def drain():
+            messages = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.layer.receive(self.channel), 0.05)
+                    messages.append(json.loads(message["frame"]))
+                except asyncio.TimeoutError:
+                    return messages
+        return async_to_sync(drain)()
+
+    def items(self, orders, menu):
+        return [
+            {"type": "menu", "id": pk}
+            for pk in OrderMenu.objects.filter(order__in=orders, menu=menu).order_by("id").values_list("id", flat=True)
+        ]
+
+    def transition(self, target_status, items, commit=True):
+        body = {"target_status": target_status, "items": items}
+        if not commit:
+            return self.client.post(self.url, body, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, format="json")
+
+    def test_cook_batch_reports_each_item(self):
+        food = self.items(self.orders[:2], self.food)
+        drink = self.items(self.orders[:1], self.drink)[:1]
+        resp = self.transition("cooked", food + drink + [{"type": "menu", "id": 0}])
+        self.assertEqual(resp.status_code, 200)
+
+        results = resp.data["data"]["results"]
+        self.assertEqual(resp.data["data"]["updated"], 4)
+        self.assertEqual([r["result"] for r in results], ["updated"] * 4 + ["invalid_status", "not_found"])
+        self.assertEqual((results[0]["prev_status"], results[0]["status"]), ("pending", "cooked"))
+        self.assertFalse(OrderMenu.objects.filter(order__in=self.orders[:2], menu=self.food, cooked_at__isnull=True).exists())
+
+        # 구성품이 모두 cooked → 세트도 cooked
+        self.assertEqual(
+            set(OrderSetMenu.objects.filter(order__in=self.orders[:2]).values_list("status", flat=True)), {"cooked"}
+        )
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+        messages = self.received()
+        self.assertEqual([m["type"] for m in messages], ["ORDER_UPDATES"])
+        self.assertEqual(len(messages[0]["data"]["events"]), 4)
+
+    def test_serve_batch_completes_orders(self):
+        self.transition("cooked", self.items(self.orders, self.food))
+        self.received()
+
+        items = self.items(self.orders, self.food) + self.items(self.orders, self.drink)
+        resp = self.transition("served", items)
+        self.assertEqual(resp.data["data"]["updated"], len(items))
+
+        self.assertFalse(Order.objects.filter(pk__in=[o.pk for o in self.orders], served_at__isnull=True).exists())
+        self.assertEqual(set(OrderSetMenu.objects.values_list("status", flat=True)), {"served"})
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+        events = self.received()[0]["data"]["events"]
+        self.assertEqual(sum(e["type"] == "ORDER_COMPLETED" for e in events), 4)
+        # 통계 카운터 (served_count / 대기시간) 도 전체 집계와 일치
+        self.assertEqual(reconcile_statistics(self.booth.id), {})
+
+    def test_query_count_does_not_grow_with_items(self):
+        def queries(orders):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.transition("cooked", self.items(orders, self.food), commit=False)
+            self.assertEqual(resp.data["data"]["updated"], 2 * len(orders))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(self.orders[:1]), queries(self.orders[1:]))
+
+    def test_other_booth_items_are_not_found(self):
+        other = Booth.objects.create(booth_name="다른부스")
+        table = Table.objects.create(booth=other, table_num=1)
+        order = Order.objects.create(table=table, order_amount=0)
+        om = OrderMenu.objects.create(order=order, menu=self.food, quantity=1, fixed_price=5000)
+
+        resp = self.transition("cooked", [{"type": "menu", "id": om.id}])
+        self.assertEqual(resp.data["data"]["results"][0]["result"], "not_found")
+        om.refresh_from_db()
+        self.assertEqual(om.status, "pending")
+
+    def test_invalid_body(self):
+        self.assertEqual(self.transition("served", []).status_code, 400)
+        self.assertEqual(self.transition("pending", [{"type": "menu", "id": 1}]).status_code, 400)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, STATISTICS_PUSH_WINDOW_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class OrderCancelTest(OrderFixtureMixin, TestCase):
+    """단품 / 세트 혼합 부분 취소 (한 번의 잠금 조회로 계획 후 일괄 반영)"""
+    url = "/api/v2/booth/orders/cancel/"
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=3)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_set_order(self, table, sets=2):
+        order = Order.objects.create(table=table, order_amount=0)
+        food = OrderMenu.objects.create(order=order, menu=self.food, quantity=3, fixed_price=5000)
+        osm = OrderSetMenu.objects.create(order=order, set_menu=self.set_menu, quantity=sets, fixed_price=6000)
+        OrderMenu.objects.create(order=order, menu=self.food, quantity=sets, fixed_price=5000, ordersetmenu=osm)
+        OrderMenu.objects.create(order=order, menu=self.drink, quantity=sets, fixed_price=2000, ordersetmenu=osm)
+        Order.objects.filter(pk=order.pk).update(order_amount=15000 + 6000 * sets)
+        return order, food, osm
+
+    def cancel(self, *cancel_items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                self.url, {"cancel_items": list(cancel_items)}, format="json", HTTP_BOOTH_ID=str(self.booth.id)
+            )
+
+    def amounts(self):
+        return dict(Menu.objects.filter(booth=self.booth).values_list("id", "menu_amount"))
+
+    def test_mixed_partial_cancel(self):
+        Booth.objects.filter(pk=self.booth.pk).update(total_revenues=100000)
+        order, food, osm = self.create_set_order(self.tables[0])
+        before = self.amounts()
+
+        resp = self.cancel(
+            {"type": "menu", "order_item_ids": [food.id], "quantity": 1},
+            {"type": "set", "order_item_ids": [osm.id], "quantity": 1},
+        )
+        self.assertEqual(resp.status_code, 200, resp.data)
+        data = resp.data["data"]
+        self.assertEqual(data["refund_total"], 11000)
+        self.assertEqual(data["booth_total_revenues"], 89000)
+        self.assertEqual(data["skipped_items"], [])
+        self.assertEqual(data["updated_items"][0]["rest_quantity"], 2)
+        self.assertEqual(
+            [c["rest_child_quantity"] for c in data["updated_items"][1]["child_adjustments"]], [1, 1]
+        )
+
+        food.refresh_from_db()
+        osm.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(food.quantity, 2)
+        self.assertEqual(osm.quantity, 1)
+        self.assertEqual(sorted(osm.order_menus.values_list("quantity", flat=True)), [1, 1])
+        self.assertEqual(order.order_amount, 16000)
+        after = self.amounts()
+        self.assertEqual(after[self.food.id] - before[self.food.id], 2)
+        self.assertEqual(after[self.drink.id] - before[self.drink.id], 1)
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def test_newest_items_consumed_first_and_sets_deleted(self):
+        older, older_food, older_set = self.create_set_order(self.tables[0], sets=1)
+        newer, newer_food, newer_set = self.create_set_order(self.tables[1], sets=1)
+
+        resp = self.cancel(
+            {"type": "menu", "order_item_ids": [older_food.id, newer_food.id], "quantity": 4},
+            {"type": "set", "order_item_ids": [older_set.id, newer_set.id], "quantity": 2},
+        )
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertFalse(OrderMenu.objects.filter(pk=newer_food.pk).exists())
+        self.assertEqual(OrderMenu.objects.get(pk=older_food.pk).quantity, 2)
+        self.assertFalse(OrderSetMenu.objects.filter(pk__in=[older_set.pk, newer_set.pk]).exists())
+        self.assertFalse(OrderMenu.objects.filter(ordersetmenu__isnull=False).exists())
+        self.assertEqual(
+            [u["order_menu_id"] for u in resp.data["data"]["updated_items"][:2]], [None, older_food.id]
+        )
+
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        self.assertEqual((older.order_amount, newer.order_amount), (10000, 0))
+        self.assertEqual(self.counters(older), (1, 0, 0))
+        self.assertEqual(self.counters(newer), (0, 0, 0))
+        self.assertEqual(verify_order_counters(self.booth.id), [])
+
+    def counters(self, order):
+        return order.pending_items, order.cooked_items, order.served_items
+
+    def test_served_component_limits_set_cancel(self):
+        order, food, osm = self.create_set_order(self.tables[0])
+        OrderMenu.objects.filter(ordersetmenu=osm, menu=self.drink).update(status="served")
+        before = self.amounts()
+
+        resp = self.cancel(
+            {"type": "menu", "order_item_ids": [food.id], "quantity": 1},
+            {"type": "set", "order_item_ids": [osm.id], "quantity": 1},
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["data"]["reason"], "not_enough_cancellable_due_to_served_or_status")
+        food.refresh_from_db()
+        self.assertEqual(food.quantity, 3)
+        self.assertEqual(self.amounts(), before)
+
+    def test_locks_taken_once_regardless_of_item_count(self):
+        def locking_queries(count):
+            items = [self.create_set_order(self.tables[i % 3]) for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.cancel(
+                    {"type": "menu", "order_item_ids": [food.id for _, food, _ in items], "quantity": count},
+                    {"type": "set", "order_item_ids": [osm.id for _, _, osm in items], "quantity": count},
+                )
+            self.assertEqual(resp.status_code, 200, resp.data)
+            return [
+                q["sql"] for q in ctx.captured_queries
+                if "FOR UPDATE" in q["sql"] and q["sql"].startswith('SELECT "order_')
+            ]
+
+        self.assertEqual(len(locking_queries(1)), 2)
+        self.assertEqual(len(locking_queries(3)), 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, COOK_QUEUE_PUSH_DEBOUNCE_MS=0,
+    MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0,
+)
+class CookQueueTest(OrderFixtureMixin, TransactionTestCase):
+    """메뉴별 조리 대기열 (GROUP BY 한 번)"""
+    url = "/api/v2/booth/kitchen/queue/"
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth(table_count=3)
+        self.orders = [self.create_order(table, with_seat_fee=True) for table in self.tables]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_pending_items_grouped_by_menu(self):
+        served = OrderMenu.objects.get(order=self.orders[2], menu=self.food, ordersetmenu__isnull=True)
+        transition_item(served, "cooked")
+        end_session(self.tables[1], timezone.now())  # 세션 종료 테이블 제외
+        self.tables[1].save(update_fields=["current_session"])
+
+        with self.assertNumQueries(2):  # 운영자 조회 + 집계
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+
+        # 음료는 cooked 로 시작, seat_fee 제외 → 떡볶이 한 묶음
+        [row] = resp.data["data"]
+        expected_ids = sorted(
+            OrderMenu.objects.filter(order__in=[self.orders[0], self.orders[2]], menu=self.food, status="pending")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(row["menu_id"], self.food.id)
+        self.assertEqual((row["quantity"], row["set_quantity"], row["item_count"]), (2 + 1 + 1, 2, 3))
+        self.assertEqual(row["table_nums"], [1, 3])
+        self.assertEqual(row["order_item_ids"], expected_ids)
+        self.assertEqual(row["oldest_created_at"], self.orders[0].created_at.isoformat())
+
+    def test_stream_refreshes_on_order_events(self):
+        async def run():
+            communicator = WebsocketCommunicator(CookQueueConsumer.as_asgi(), "/ws/kitchen/queue/")
+            communicator.scope["user"] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            first = await communicator.receive_json_from()
+
+            om = await sync_to_async(
+                OrderMenu.objects.select_related("menu", "order__table__booth").filter(menu=self.food).first
+            )()
+            await sync_to_async(transition_item)(om, "cooked")
+            await sync_to_async(broadcast_order_item_update)(om)
+            second = await communicator.receive_json_from(timeout=2)
+            await communicator.disconnect()
+            return first, second
+
+        first, second = async_to_sync(run)()
+        self.assertEqual((first["type"], second["type"]), ("COOK_QUEUE", "COOK_QUEUE"))
+        self.assertEqual(first["data"][0]["quantity"] - second["data"][0]["quantity"], 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, CONSUMER_DB_PER_BOOTH=4, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class ConsumerDataLayerTest(OrderFixtureMixin, TransactionTestCase):
+    """컨슈머 ORM 실행기: 연결 간 병렬 + 부스별 상한"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.create_order(self.tables[0], with_set=False)
+
+    async def test_concurrent_connects_get_snapshot(self):
+        async def connect():
+            communicator = WebsocketCommunicator(OrderConsumer.as_asgi(), "/ws/orders/")
+            communicator.scope["user"] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            frame = await communicator.receive_json_from(timeout=10)
+            await communicator.disconnect()
+            return frame
+
+        frames = await asyncio.gather(*[connect() for _ in range(20)])
+        self.assertTrue(all(f["type"] == "ORDER_SNAPSHOT" and len(f["data"]["orders"]) == 2 for f in frames))
+
+    async def test_per_booth_cap(self):
+        running, peak = {}, {}
+        lock = threading.Lock()
+
+        def work(booth_id):
+            with lock:
+                running[booth_id] = running.get(booth_id, 0) + 1
+                peak[booth_id] = max(peak.get(booth_id, 0), running[booth_id])
+            time.sleep(0.02)
+            with lock:
+                running[booth_id] -= 1
+
+        await asyncio.gather(*[run_db(work, booth_id % 2, booth_id=booth_id % 2) for booth_id in range(24)])
+        self.assertEqual(peak, {0: 4, 1: 4})
+
+    async def test_benchmark_concurrent_connect_latency(self):
+        """
+        재접속 60건의 실제 접속 경로 (토큰 → User 조회, 운영자 / 부스 조회, 주문 snapshot)
+        워커 1개 (기존 thread_sensitive 와 같은 직렬 실행) 대비 풀 - 수치는 로그로만 (CI 부하에 따라 달라짐)
+        """
+        token = str(RefreshToken.for_user(self.user).access_token)   # claim 없는 토큰 → DB 조회 경로
+        app = JWTAuthMiddleware(OrderConsumer.as_asgi())
+
+        async def connect():
+            communicator = WebsocketCommunicator(app, f"/ws/orders/?token={token}")
+            connected, _ = await communicator.connect(timeout=30)   # 60건이 워커 1개에 줄 서므로 기본 1초로는 부족
+            frame = await communicator.receive_json_from(timeout=30)
+            await communicator.disconnect()
+            return connected, frame["type"]
+
+        async def burst(workers):
+            original = async_db._executor
+            async_db._executor = None
+            try:
+                with override_settings(CONSUMER_DB_WORKERS=workers, CONSUMER_DB_PER_BOOTH=workers):
+                    started = time.perf_counter()
+                    results = await asyncio.gather(*[connect() for _ in range(60)])
+                    elapsed = time.perf_counter() - started
+            finally:
+                if async_db._executor is not None:
+                    async_db._executor.shutdown(wait=True)
+                async_db._executor = original
+            self.assertEqual(set(results), {(True, "ORDER_SNAPSHOT")})
+            return elapsed
+
+        serial = await burst(1)
+        pooled = await burst(8)
+        logger.info(f"[consumer connect] 60 connects: 1 worker {serial * 1000:.0f}ms, 8 workers {pooled * 1000:.0f}ms")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SNAPSHOT_CACHE_TTL_MS=60000,
+    MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0,
+)
+class SnapshotCacheTest(OrderFixtureMixin, TransactionTestCase):
+    """재접속 폭주 시 snapshot 단일 계산 + 짧은 보관 + 브로드캐스트 무효화"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.order = self.create_order(self.tables[0], with_set=False)
+        self.calls = 0
+
+    def slow_compute(self, booth_id):
+        self.calls += 1
+        time.sleep(0.05)
+        return self.calls
+
+    def delta(self, before):
+        after = get_snapshot_metrics()
+        return {key: after[key] - before[key] for key in before}
+
+    async def test_concurrent_requests_share_one_compute(self):
+        before = get_snapshot_metrics()
+        results = await asyncio.gather(*[
+            get_snapshot("orders", self.booth.id, self.slow_compute) for _ in range(30)
+        ])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(results), {1})
+        delta = self.delta(before)
+        self.assertEqual(delta["miss"], 1)
+        # 계산이 끝난 뒤 도착한 요청은 보관분 사용
+        self.assertEqual(delta["coalesced"] + delta["hit"], 29)
+        self.assertGreater(delta["coalesced"], 0)
+
+    async def test_cached_until_invalidated(self):
+        before = get_snapshot_metrics()
+        self.assertEqual(await get_snapshot("tables", self.booth.id, self.slow_compute), 1)
+        self.assertEqual(await get_snapshot("tables", self.booth.id, self.slow_compute), 1)
+        # 다른 종류 / 다른 부스는 따로 계산
+        self.assertEqual(await get_snapshot("statistics", self.booth.id, self.slow_compute), 2)
+
+        await run_db(invalidate_snapshot, self.booth.id, "tables")
+        self.assertEqual(await get_snapshot("tables", self.booth.id, self.slow_compute), 3)
+        self.assertEqual(self.delta(before), {"hit": 1, "miss": 3, "coalesced": 0, "invalidated": 1})
+
+    @override_settings(SNAPSHOT_CACHE_TTL_MS=50)
+    async def test_expires_after_ttl(self):
+        await get_snapshot("orders", self.booth.id, self.slow_compute)
+        await asyncio.sleep(0.1)
+        self.assertEqual(await get_snapshot("orders", self.booth.id, self.slow_compute), 2)
+
+    async def test_invalidated_during_compute_is_not_reused(self):
+        async def invalidate_midway():
+            await asyncio.sleep(0.02)
+            await run_db(invalidate_snapshot, self.booth.id, "orders")
+
+        first, _ = await asyncio.gather(
+            get_snapshot("orders", self.booth.id, self.slow_compute), invalidate_midway()
+        )
+        self.assertEqual(first, 1)
+        self.assertEqual(await get_snapshot("orders", self.booth.id, self.slow_compute), 2)
+
+    async def test_compute_error_reaches_every_waiter(self):
+        def broken(booth_id):
+            time.sleep(0.05)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *[get_snapshot("orders", self.booth.id, broken) for _ in range(5)], return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        # 실패는 보관하지 않음
+        self.assertEqual(await get_snapshot("orders", self.booth.id, self.slow_compute), 1)
+
+    async def test_reconnect_sees_broadcast_changes(self):
+        async def snapshot_orders():
+            communicator = WebsocketCommunicator(OrderConsumer.as_asgi(), "/ws/orders/")
+            communicator.scope["user"] = self.user
+            await communicator.connect()
+            frame = await communicator.receive_json_from(timeout=10)
+            await communicator.disconnect()
+            return frame
+
+        first = await snapshot_orders()
+        self.assertEqual(len(first["data"]["orders"]), 2)
+
+        item = await run_db(OrderMenu.objects.get, order=self.order, menu=self.food)
+        item.status = "cooked"
+        await run_db(item.save, update_fields=["status"])
+        await run_db(broadcast_order_item_update, item)
+
+        second = await snapshot_orders()
+        self.assertEqual(second["seq"], first["seq"] + 1)
+        statuses = {row["ordermenu_id"]: row["status"] for row in second["data"]["orders"]}
+        self.assertEqual(statuses[item.id], "cooked")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class BroadcastFrameTest(OrderFixtureMixin, TransactionTestCase):
+    """broadcast 헬퍼가 한 번 직렬화한 frame 을 컨슈머가 그대로 전달"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.order = self.create_order(self.tables[0])
+        self.osm = OrderSetMenu.objects.get(order=self.order)
+        self.layer = get_channel_layer()
+
+    def listen(self, group):
+        channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(group, channel)
+        return lambda: async_to_sync(self.layer.receive)(channel)
+
+    def test_helpers_attach_frame(self):
+        receive = self.listen(f"booth_{self.booth.id}_orders")
+        broadcast_order_item_update(OrderMenu.objects.filter(order=self.order).first())
+        message = receive()
+        # group 메시지는 라우팅 필드 + frame 만
+        self.assertEqual(set(message), {"type", "seq", "frame"})
+        frame = json.loads(message["frame"])
+        self.assertEqual((frame["type"], frame["seq"]), ("ORDER_UPDATE", message["seq"]))
+
+        with buffered_broadcasts():   # autocommit → 블록을 나올 때 바로 전송
+            broadcast_order_set_update(self.osm)
+        message = receive()
+        self.assertEqual(set(message), {"type", "seq", "frame"})
+        self.assertEqual(len(json.loads(message["frame"])["data"]["events"]), 3)
+
+    @override_settings(WS_FRAME_ENCODER="json")
+    def test_json_encoder_fallback(self):
+        receive = self.listen(f"booth_{self.booth.id}_revenue")
+        broadcast_total_revenue(self.booth.id, 12000)
+        self.assertEqual(
+            json.loads(receive()["frame"]),
+            {"type": "REVENUE_UPDATE", "boothId": self.booth.id, "totalRevenue": 12000},
+        )
+
+    async def test_consumer_forwards_frame_unchanged(self):
+        communicator = WebsocketCommunicator(RevenueConsumer.as_asgi(), "/ws/revenue/")
+        communicator.scope["user"] = self.user
+        await communicator.connect()
+        await communicator.receive_from()
+
+        await run_db(broadcast_total_revenue, self.booth.id, 12000)
+        frame = await communicator.receive_from()
+        self.assertEqual(frame, encode_frame({"type": "REVENUE_UPDATE", "boothId": self.booth.id, "totalRevenue": 12000}))
+
+        # frame 없는 메시지 (이전 버전 프로세스) 도 처리
+        await self.layer.group_send(
+            f"booth_{self.booth.id}_revenue", {"type": "revenue_update", "boothId": self.booth.id, "totalRevenue": 1}
+        )
+        self.assertEqual(json.loads(await communicator.receive_from())["totalRevenue"], 1)
+        await communicator.disconnect()
+
+    async def test_benchmark_broadcast_delivery(self):
+        """
+        ORDER_UPDATES 1회를 OrderConsumer N 개에 전달하는 CPU 시간 (InMemoryChannelLayer 경유)
+        frame 없는 dict (연결마다 직렬화) 대비 한 번 직렬화한 frame - 수치는 로그로만
+        """
+        def build_message():
+            orders = [self.create_order(t) for t in self.tables for _ in range(10)]
+            rows = [row for order in orders for row in expand_order(order)]
+            events = [{"type": "order_item_added", "seq": i, "data": row} for i, row in enumerate(rows, 1)]
+            return {"type": "order_updates", "seq": len(events), "events": events}
+
+        message = await run_db(build_message)
+        group = f"booth_{self.booth.id}_orders"
+
+        lines = []
+        for group_size in (1, 10, 50):
+            communicators = []
+            for _ in range(group_size):
+                communicator = WebsocketCommunicator(OrderConsumer.as_asgi(), "/ws/orders/")
+                communicator.scope["user"] = self.user
+                await communicator.connect()
+                await communicator.receive_from()   # ORDER_SNAPSHOT
+                communicators.append(communicator)
+
+            timings, decoded = [], []
+            for framed in (False, True):
+                started = time.process_time()
+                await self.layer.group_send(
+                    group, with_frame(message, order_updates_frame(message)) if framed else message
+                )
+                frames = [await communicator.receive_from() for communicator in communicators]
+                timings.append(time.process_time() - started)
+                self.assertEqual(len(set(frames)), 1)
+                decoded.append(json.loads(frames[0]))
+            self.assertEqual(decoded[0], decoded[1])
+
+            for communicator in communicators:
+                await communicator.disconnect()
+            lines.append(f"{group_size:>3} sockets: {timings[0] * 1000:.2f}ms → {timings[1] * 1000:.2f}ms")
+
+        logger.info("[broadcast delivery] per ORDER_UPDATES\n  " + "\n  ".join(lines))
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STATISTICS_PUSH_WINDOW_MS=0,
+)
+class ManagerClaimAuthTest(OrderFixtureMixin, TransactionTestCase):
+    """booth_id claim 토큰 → 주방/서빙 조회·웹소켓 접속 시 User / Manager 조회 없음"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_booth()
+        self.create_order(self.tables[0])
+        self.access = str(issue_manager_tokens(self.user, self.booth.id).access_token)
+
+    def test_login_issues_booth_claim(self):
+        resp = APIClient().post("/api/v2/manager/auth/", {"username": "mgr", "password": "pw"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        user = async_to_sync(get_user_from_token)(resp.data["token"]["access"])
+        self.assertIsInstance(user, ManagerTokenUser)
+        self.assertEqual((int(user.id), user.booth_id), (self.user.id, self.booth.id))
+
+    def test_kitchen_board_skips_user_and_manager_lookup(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/v2/booth/orders/", {"type": "kitchen"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data["data"]["orders"]), 4)
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("auth_user", tables)
+        self.assertNotIn("manager_manager", tables)
+
+        resp = client.get("/api/v2/booth/tables/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data["data"]), 2)
+
+    def test_token_without_claims_falls_back_to_db(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        resp = client.get("/api/v2/booth/orders/", {"type": "kitchen"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data["data"]["orders"]), 4)
+
+        user = async_to_sync(get_user_from_token)(str(RefreshToken.for_user(self.user).access_token))
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_mutations_check_user_and_manager_in_db(self):
+        """변경 API 는 claim 토큰이어도 DB 인증 → 비활성화 / 탈퇴한 운영자는 거부"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        om = OrderMenu.objects.filter(order__table=self.tables[0], ordersetmenu__isnull=True).first()
+        urls = ["/api/v2/booth/kitchen/orders/", "/api/v2/booth/serving/orders/"]
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        for url in urls:
+            self.assertEqual(client.post(url, {"type": "menu", "id": om.id}, format="json").status_code, 401)
+        resp = client.post(
+            "/api/v2/booth/orders/transition/",
+            {"target_status": "cooked", "items": [{"type": "menu", "id": om.id}]}, format="json",
+        )
+        self.assertEqual(resp.status_code, 401)
+
+        # 탈퇴 (User 삭제 → Manager 도 삭제)
+        User.objects.filter(pk=self.user.pk).delete()
+        resp = client.post(urls[0], {"type": "menu", "id": om.id}, format="json")
+        self.assertEqual(resp.status_code, 401)
+        om.refresh_from_db()
+        self.assertEqual(om.status, "pending")
+
+    def test_socket_connect_without_db_auth(self):
+        with self.assertNumQueries(0):
+            user = async_to_sync(get_user_from_token)(self.access)
+
+        async def connect():
+            communicator = WebsocketCommunicator(OrderConsumer.as_asgi(), "/ws/orders/")
+            communicator.scope["user"] = user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            snapshot = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return snapshot
+
+        snapshot = async_to_sync(connect)()
+        self.assertEqual(snapshot["type"], "ORDER_SNAPSHOT")
+        self.assertEqual(len(snapshot["data"]["orders"]), 4)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class QueryPlanTest(TestCase):
+    """
+    부스/테이블 세션 조회의 실행 계획 회귀 테스트
+    축제 규모 데이터 (부스 20 × 테이블 25, 주문 1만, 주문 항목 4만) 에서 큰 테이블을 Seq Scan 하면 실패
+    """
+    BOOTHS, TABLES, ORDERS_PER_TABLE = 20, 25, 20
+    BIG_TABLES = {
+        "order_order", "order_ordermenu", "order_ordersetmenu", "order_staffcall",
+        "booth_table", "cart_cart", "coupon_couponcode",
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        from coupon.models import Coupon, CouponCode
+        from order.models import StaffCall
+
+        activated_at = timezone.now() - timedelta(hours=1)
+        booths = Booth.objects.bulk_create(Booth(booth_name=f"부스{i}") for i in range(cls.BOOTHS))
+        tables = Table.objects.bulk_create(
+            Table(booth=booth, table_num=n, status="activate", activated_at=activated_at)
+            for booth in booths for n in range(1, cls.TABLES + 1)
+        )
+        menus = {
+            booth.id: Menu.objects.bulk_create([
+                Menu(booth=booth, menu_name="떡볶이", menu_category="메뉴", menu_price=5000, menu_amount=100),
+                Menu(booth=booth, menu_name="사이다", menu_category="음료", menu_price=2000, menu_amount=100),
+                Menu(booth=booth, menu_name="이용료", menu_category="seat_fee", menu_price=3000, menu_amount=100),
+            ])
+            for booth in booths
+        }
+        set_menus = {
+            booth.id: SetMenu.objects.create(booth=booth, set_name="세트", set_price=6000) for booth in booths
+        }
+        orders = Order.objects.bulk_create(
+            Order(table=table, order_amount=10000) for table in tables for _ in range(cls.ORDERS_PER_TABLE)
+        )
+        # 지난 세션 주문이 대부분 (현재 세션은 테이블당 1/5)
+        Order.objects.update(created_at=activated_at - timedelta(hours=3))
+        Order.objects.filter(pk__in=[order.pk for order in orders[::5]]).update(created_at=activated_at + timedelta(minutes=5))
+        booth_of = {table.id: table.booth_id for table in tables}
+        sets = OrderSetMenu.objects.bulk_create(
+            OrderSetMenu(order=order, set_menu=set_menus[booth_of[order.table_id]], quantity=1, fixed_price=6000)
+            for order in orders[::10]
+        )
+        set_of = {osm.order_id: osm for osm in sets}
+
+        def status(i):
+            # 대부분 서빙 완료, 일부만 진행 중
+            return "served" if i % 10 else ("pending", "cooked")[i // 10 % 2]
+
+        items = []
+        for i, order in enumerate(orders):
+            food, drink, seat_fee = menus[booth_of[order.table_id]]
+            items += [
+                OrderMenu(order=order, menu=food, quantity=1, fixed_price=5000, status=status(i)),
+                OrderMenu(order=order, menu=drink, quantity=1, fixed_price=2000, status=status(i + 1)),
+                OrderMenu(order=order, menu=seat_fee, quantity=1, fixed_price=3000, status="served"),
+            ]
+            if order.id in set_of:
+                items.append(OrderMenu(
+                    order=order, menu=food, quantity=1, fixed_price=5000,
+                    status=status(i), ordersetmenu=set_of[order.id],
+                ))
+        OrderMenu.objects.bulk_create(items, batch_size=5000)
+
+        Cart.objects.bulk_create(
+            Cart(table=table, is_ordered=n > 0) for table in tables for n in range(cls.ORDERS_PER_TABLE)
+        )
+        StaffCall.objects.bulk_create(StaffCall(booth_id=table.booth_id, table=table) for table in tables for _ in range(10))
+        coupons = {booth.id: Coupon.objects.create(
+            booth=booth, coupon_name="쿠폰", discount_type="amount", discount_value=1000, quantity=100,
+        ) for booth in booths}
+        CouponCode.objects.bulk_create(
+            CouponCode(
+                coupon=coupons[table.booth_id], code=f"C{table.id:05d}{n:03d}", issued_to_table=table,
+                used_at=activated_at if n else None,
+            )
+            for table in tables for n in range(10)
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.table = tables[len(tables) // 2]
+        cls.order = orders[len(orders) // 2]
+        cls.order_set = sets[len(sets) // 2]
+
+    def plan_nodes(self, queryset):
+        def walk(node):
+            yield node
+            for child in node.get("Plans", []):
+                yield from walk(child)
+
+        return list(walk(json.loads(queryset.explain(format="json"))[0]["Plan"]))
+
+    def assertIndexed(self, queryset, index=None):
+        """큰 테이블 Seq Scan 없음 (+ index 가 주어지면 해당 인덱스 사용)"""
+        nodes = self.plan_nodes(queryset)
+        seq_scans = [
+            node["Relation Name"] for node in nodes
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in self.BIG_TABLES
+        ]
+        self.assertEqual(seq_scans, [], queryset.explain())
+        if index:
+            self.assertIn(index, {node.get("Index Name") for node in nodes}, queryset.explain())
+
+    def test_table_session_orders(self):
+        self.assertIndexed(Order.objects.filter(
+            table_id=self.table.id, created_at__gte=self.table.activated_at,
+        ), "order_table_created_idx")
+
+    def test_open_items_of_order(self):
+        self.assertIndexed(OrderMenu.objects.filter(order_id=self.order.id, status__in=["pending", "cooked"]), "ordermenu_open_order_idx")
+
+    def test_set_components(self):
+        self.assertIndexed(OrderMenu.objects.filter(ordersetmenu_id=self.order_set.id))
+
+    def test_table_seat_fee(self):
+        self.assertIndexed(OrderMenu.objects.filter(
+            order__table_id=self.table.id, menu__menu_category="seat_fee",
+        ))
+
+    def test_booth_table_lookup(self):
+        self.assertIndexed(Table.objects.filter(booth_id=self.table.booth_id, table_num=self.table.table_num), "table_booth_num_idx")
+
+    def test_open_cart_of_table(self):
+        self.assertIndexed(Cart.objects.filter(table_id=self.table.id, is_ordered=False), "cart_open_table_idx")
+
+    def test_recent_staff_calls(self):
+        from order.models import StaffCall
+
+        self.assertIndexed(StaffCall.objects.filter(booth_id=self.table.booth_id).order_by("-created_at")[:7], "staffcall_booth_created_idx")
+
+    def test_unused_coupon_codes_of_table(self):
+        from coupon.models import CouponCode
+
+        self.assertIndexed(CouponCode.objects.filter(issued_to_table_id=self.table.id, used_at__isnull=True), "couponcode_table_used_idx")
+
+    def test_cook_queue(self):
+        from order.utils.cook_queue import pending_menu_groups
+
+        self.assertIndexed(pending_menu_groups(self.table.booth_id))
@@ -5,7 +5,9 @@ urlpatterns = [
     path("orders/cancel/", OrderCancelView.as_view(), name="order-cancel"),
     path("orders/", OrderListView.as_view(), name="order-list"),
     path('kitchen/orders/', KitchenOrderCookedView.as_view()),
+    path("kitchen/queue/", CookQueueView.as_view(), name="cook-queue"),
     path('serving/orders/', ServingOrderCompleteView.as_view()),
+    path("orders/transition/", OrderBatchTransitionView.as_view(), name="order-batch-transition"),
     path("revert/orders/", OrderRevertStatusView.as_view(), name="order-revert-status"),  # 추가
     path("staff-calls/", StaffCallListAPIView.as_view(), name="staff-call-list"),  # 추가
 ]
\ No newline at end of file
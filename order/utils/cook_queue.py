@@ -0,0 +1,60 @@
+"""
+주방 조리 대기열 (메뉴별 묶음)
+
+주방 화면은 OrderMenu 한 줄씩 받아 태블릿에서 메뉴별로 다시 묶었음
+→ DB 에서 GROUP BY menu_id 한 번으로 대기(pending) 수량을 메뉴별로 집계
+- 세트 구성품 포함 (set_quantity 로 구분), seat_fee 제외
+- 진행 중인 테이블 세션 주문만 (OrderListView 와 동일 범위)
+- 묶음별 가장 오래된 주문 시각 / 테이블 번호 / OrderMenu id (일괄 조리 완료 API 에 그대로 사용)
+- (status, menu_id) 인덱스 사용
+"""
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Min, Q, Sum
+
+from booth.utils.table_session import open_session_q
+from order.models import OrderMenu
+
+SEAT_FEE_CATEGORY = "seat_fee"
+
+
+def pending_menu_groups(booth_id: int):
+    """메뉴별 대기 묶음 queryset (GROUP BY menu_id)"""
+    return (
+        OrderMenu.objects
+        .filter(
+            open_session_q("order__"),
+            status="pending",
+            # 메뉴도 부스 소속 → (status, menu_id) 인덱스로 시작 (주문 테이블 전체 스캔 방지)
+            menu__booth_id=booth_id,
+            order__session__booth_id=booth_id,
+        )
+        .exclude(menu__menu_category=SEAT_FEE_CATEGORY)
+        .values("menu_id", "menu__menu_name", "menu__menu_category")
+        .annotate(
+            total_quantity=Sum("quantity"),
+            set_quantity=Sum("quantity", filter=Q(ordersetmenu__isnull=False)),
+            item_count=Count("id"),
+            oldest_created_at=Min("order__created_at"),
+            table_nums=ArrayAgg("order__table__table_num", distinct=True, ordering="order__table__table_num"),
+            order_item_ids=ArrayAgg("id", ordering="id"),
+        )
+        .order_by("oldest_created_at", "menu_id")
+    )
+
+
+def build_cook_queue(booth_id: int):
+    """메뉴별 대기 묶음 목록 (오래 기다린 순)"""
+    return [
+        {
+            "menu_id": row["menu_id"],
+            "menu_name": row["menu__menu_name"],
+            "menu_category": row["menu__menu_category"],
+            "quantity": row["total_quantity"],
+            "set_quantity": row["set_quantity"] or 0,
+            "item_count": row["item_count"],
+            "oldest_created_at": row["oldest_created_at"].isoformat(),
+            "table_nums": row["table_nums"],
+            "order_item_ids": row["order_item_ids"],
+        }
+        for row in pending_menu_groups(booth_id)
+    ]
@@ -1,94 +1,175 @@
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from order.models import Order, OrderMenu, OrderSetMenu
 from menu.models import SetMenuItem
+from django.db import transaction
+from django.db.models import F
 from django.utils.timezone import now
 from datetime import timedelta
+from booth.utils.table_session import open_session_q
+from order.utils.order_events import record_order_event
+from project.snapshot_cache import invalidate_snapshot
+from project.ws_frames import with_frame
 
 VISIBLE_MENU_CATEGORIES = ["메뉴", "음료"]
 
-def expand_order(order: Order):
-    table = order.table
 
-    ### 아직 세션 시작 안 한 테이블이면 빈 리스트
-    if not table.activated_at:
-        return []
+# buffered_broadcasts() 안에서 발생한 주문 이벤트 {booth_id: [message, ...]}
+_pending_order_events = ContextVar("pending_order_events", default=None)
 
-    ### 세션 시작 이전 주문은 무시
-    if order.created_at < table.activated_at:
-        return []
-    
-    expanded = []
 
-    # 단품 메뉴
-    order_menus = OrderMenu.objects.filter(order=order, ordersetmenu__isnull=True).select_related("menu")
-    for om in order_menus:
-        # 수량 0인 항목 제외
-        if om.quantity <= 0:
-            continue
-        if om.menu.menu_category not in VISIBLE_MENU_CATEGORIES:
-            continue
-        if om.status == "served" and order.served_at and order.served_at <= now() - timedelta(minutes=3.5):
-            continue
+class buffered_broadcasts(ContextDecorator):
+    """
+    요청 단위 주문 이벤트 버퍼 (뷰 메서드 데코레이터 / with 블록)
+    블록 안의 broadcast_* 호출은 바로 보내지 않고 모았다가
+    커밋 이후 부스별 ORDER_UPDATES 프레임 하나로 전송 (롤백된 이벤트는 버림)
+    """
 
-        # 보정 삭제: DB status 그대로 사용
-        status = om.status
+    def _recreate_cm(self):
+        # 데코레이터로 쓸 때 호출마다 새 인스턴스 (동시 요청 간 _token 공유 방지)
+        return type(self)()
+
+    def __enter__(self):
+        # 중첩 사용 시 바깥 버퍼에 합류
+        self._token = None
+        if _pending_order_events.get() is None:
+            self._token = _pending_order_events.set({})
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        pending = _pending_order_events.get()
+        _pending_order_events.reset(self._token)
+        if exc_type is None:
+            # 버퍼 추가 콜백들 뒤에 등록되므로 커밋 시 모두 모인 다음 전송
+            transaction.on_commit(lambda: flush_order_events(pending))
+        return False
+
+
+# group 이벤트 type → 클라이언트 메시지 type
+ORDER_FRAME_TYPES = {
+    "order_item_added": "ORDER_ITEM_ADDED",
+    "order_update": "ORDER_UPDATE",
+    "order_completed": "ORDER_COMPLETED",
+    "order_cancelled": "ORDER_CANCELLED",
+}
+
+
+def order_frame(event):
+    """주문 이벤트 1건의 클라이언트 메시지 (재전송 목록 항목 포함)"""
+    return {
+        "type": ORDER_FRAME_TYPES[event["type"]],
+        "seq": event.get("seq"),
+        "data": event["data"],
+    }
 
-        expanded.append({
-            "ordermenu_id": om.id,
-            "order_id": om.order_id,
-            "menu_id": om.menu_id,
-            "menu_name": om.menu.menu_name,
-            "menu_image": om.menu.menu_image.url if om.menu.menu_image else None,
-            "quantity": om.quantity,
-            "status": status,
-            "created_at": om.order.created_at.isoformat(),
-            "table_num": om.order.table.table_num,
-            "from_set": False,
-            "set_id": None,
-            "set_name": None,
-        })
-
-    # 세트 메뉴 처리
-    order_sets = OrderSetMenu.objects.filter(order=order).select_related("set_menu")
-    for osm in order_sets:
-        order_menus = OrderMenu.objects.filter(
-            ordersetmenu=osm
-        ).select_related("menu")
-        for om in order_menus:
-            # 수량 0인 항목 제외
-            if om.quantity <= 0:
-                continue
-            if om.menu.menu_category not in VISIBLE_MENU_CATEGORIES:
-                continue
-            if om.status == "served" and order.served_at and order.served_at <= now() - timedelta(minutes=3.5):
-                continue
-
-            # 보정 삭제
-            status = om.status
-
-            expanded.append({
-                "ordermenu_id": om.id,
-                "order_id": om.order_id,
-                "menu_id": om.menu_id,
-                "menu_name": om.menu.menu_name,
-                "menu_image": om.menu.menu_image.url if om.menu.menu_image else None,
-                "quantity": om.quantity,
-                "status": status,
-                "created_at": om.order.created_at.isoformat(),
-                "table_num": om.order.table.table_num,
-                "from_set": True,
-                "set_id": osm.set_menu.id,
-                "set_name": osm.set_menu.set_name,
+
+def order_updates_frame(event):
+    """order_updates 묶음의 클라이언트 메시지"""
+    return {
+        "type": "ORDER_UPDATES",
+        "seq": event.get("seq"),
+        "data": {"events": [order_frame(e) for e in event["events"]]},
+    }
+
+
+def _group_send_order_event(booth_id: int, message: dict):
+    # 재접속 시 이 이벤트가 빠진 snapshot 을 받지 않도록 먼저 무효화
+    invalidate_snapshot(booth_id, "orders")
+    invalidate_snapshot(booth_id, "cook_queue")
+    build = order_updates_frame if message["type"] == "order_updates" else order_frame
+    async_to_sync(get_channel_layer().group_send)(
+        f"booth_{booth_id}_orders", with_frame(message, build(message))
+    )
+
+
+def flush_order_events(pending: dict):
+    """모인 이벤트 전송: 1건이면 그대로, 여러 건이면 order_updates 한 번"""
+    for booth_id, messages in pending.items():
+        events = [record_order_event(booth_id, message) for message in messages]
+        if len(events) == 1:
+            _group_send_order_event(booth_id, events[0])
+        else:
+            _group_send_order_event(booth_id, {
+                "type": "order_updates",
+                "seq": events[-1]["seq"],
+                "events": events,
             })
 
-    return expanded
+
+def _send_order_event(booth_id: int, message: dict):
+    """booth_{id}_orders 그룹 전송 (seq 부여 + 재전송 로그 기록)"""
+    pending = _pending_order_events.get()
+    if pending is None:
+        _group_send_order_event(booth_id, record_order_event(booth_id, message))
+        return
+    # 트랜잭션 안이면 커밋된 경우에만 버퍼에 추가
+    transaction.on_commit(lambda: pending.setdefault(booth_id, []).append(message))
+
+
+def _expanded_order_menus():
+    """
+    화면에 노출되는 OrderMenu 를 한 번의 JOIN 으로 가져오는 기본 쿼리셋
+    - 진행 중인 테이블 세션 주문만 (session_id)
+    - 수량 0 / seat_fee 등 비노출 카테고리 제외
+    - 서빙 완료 후 3분 30초가 지난 빌지의 served 항목 제외
+    정렬: 주문 → 단품(세트 없음) → 세트(OrderSetMenu id) → OrderMenu id
+    """
+    served_cutoff = now() - timedelta(minutes=3.5)
+    return (
+        OrderMenu.objects
+        .filter(
+            open_session_q("order__"),
+            quantity__gt=0,
+            menu__menu_category__in=VISIBLE_MENU_CATEGORIES,
+        )
+        .exclude(status="served", order__served_at__lte=served_cutoff)
+        .select_related("menu", "order__table", "ordersetmenu__set_menu")
+        .order_by("order_id", F("ordersetmenu_id").asc(nulls_first=True), "id")
+    )
+
+
+def _expanded_row(om: OrderMenu):
+    osm = om.ordersetmenu
+    return {
+        "ordermenu_id": om.id,
+        "order_id": om.order_id,
+        "menu_id": om.menu_id,
+        "menu_name": om.menu.menu_name,
+        "menu_image": om.menu.menu_image.url if om.menu.menu_image else None,
+        "quantity": om.quantity,
+        "status": om.status,
+        "created_at": om.order.created_at.isoformat(),
+        "table_num": om.order.table.table_num,
+        "from_set": osm is not None,
+        "set_id": osm.set_menu.id if osm else None,
+        "set_name": osm.set_menu.set_name if osm else None,
+    }
+
+
+def expand_order(order: Order):
+    """단일 주문을 OrderMenu 단위로 펼침 (쿼리 1회)"""
+    return [_expanded_row(om) for om in _expanded_order_menus().filter(order=order)]
+
+
+def build_order_snapshot(booth_id: int):
+    """
+    부스 전체 주문을 expand_order 와 같은 형태로 펼침
+    주문 수와 상관없이 쿼리 1회 (ORDER_SNAPSHOT 용)
+    """
+    return [
+        _expanded_row(om)
+        for om in _expanded_order_menus().filter(order__session__booth_id=booth_id)
+    ]
 
 
 # 새로 추가: 단건 OrderMenu broadcast
 def broadcast_order_item_update(ordermenu: OrderMenu):
     booth = ordermenu.order.table.booth
-    channel_layer = get_channel_layer()
     
     # 보정 삭제
     status = ordermenu.status
@@ -110,8 +191,8 @@ def broadcast_order_item_update(ordermenu: OrderMenu):
         ),
     }
 
-    async_to_sync(channel_layer.group_send)(
-        f"booth_{booth.id}_orders",
+    _send_order_event(
+        booth.id,
         {
             "type": "order_update",
             "data": data,   # 단건만 push
@@ -122,7 +203,6 @@ def broadcast_order_item_update(ordermenu: OrderMenu):
 # 새로 추가: 단건 OrderSetMenu broadcast
 def broadcast_order_set_update(orderset: OrderSetMenu):
     booth = orderset.order.table.booth
-    channel_layer = get_channel_layer()
 
     # 세트 본체 데이터
     set_status = orderset.status
@@ -139,8 +219,8 @@ def broadcast_order_set_update(orderset: OrderSetMenu):
     }
 
     # 세트 본체 먼저 push
-    async_to_sync(channel_layer.group_send)(
-        f"booth_{booth.id}_orders",
+    _send_order_event(
+        booth.id,
         {
             "type": "order_update",
             "data": set_data,
@@ -148,7 +228,7 @@ def broadcast_order_set_update(orderset: OrderSetMenu):
     )
 
     # 세트 구성품(OrderMenu)도 각각 push
-    order_menus = OrderMenu.objects.filter(ordersetmenu=orderset).select_related("menu")
+    order_menus = OrderMenu.objects.filter(ordersetmenu=orderset).select_related("menu", "order__table")
     for om in order_menus:
         if om.menu.menu_category not in VISIBLE_MENU_CATEGORIES:
             continue
@@ -171,8 +251,8 @@ def broadcast_order_set_update(orderset: OrderSetMenu):
             "set_name": orderset.set_menu.set_name,
         }
 
-        async_to_sync(channel_layer.group_send)(
-            f"booth_{booth.id}_orders",
+        _send_order_event(
+            booth.id,
             {
                 "type": "order_update",
                 "data": item_data,
@@ -180,58 +260,41 @@ def broadcast_order_set_update(orderset: OrderSetMenu):
         )
 
 
-def broadcast_order_update(order: Order, cancelled_items: list = None):
-    booth = order.table.booth
-    channel_layer = get_channel_layer()
+def broadcast_order_created(order: Order):
+    """새 주문: 화면에 노출되는 항목마다 item-added 델타 (buffered_broadcasts 안이면 ORDER_UPDATES 한 프레임)"""
+    booth_id = order.table.booth_id
+    for row in expand_order(order):
+        _send_order_event(booth_id, {"type": "order_item_added", "data": row})
 
-    expanded = expand_order(order)
-    cancelled_payloads = []
-
-    if cancelled_items:
-        for item in cancelled_items:
-            rest_qty = item.get("rest_quantity", 0)
-            # 전량 취소된 경우만 payload 추가
-            if rest_qty == 0:
-                cancelled_payloads.append({
-                    "ordermenu_id": item.get("order_menu_id"),
-                    "order_id": order.id,
-                    "menu_name": item.get("menu_name"),
-                    "quantity": 0,               # 전량 취소 → 0
-                    "status": "cancelled",       # 취소됨
-                    "table_num": order.table.table_num,
-                    "created_at": order.created_at.isoformat(),
-                })
-
-    async_to_sync(channel_layer.group_send)(
-        f"booth_{booth.id}_orders",
-        {
-            "type": "order_update",
-            "data": {
-                "total_revenue": booth.total_revenues,
-                "orders": expanded + cancelled_payloads  # 전량 취소는 cancelled_payloads 로 보존
-            }
-        }
-    )
-    
 
 def broadcast_total_revenue(booth_id: int, total_revenue):
+    # 주문 snapshot 에 총매출도 담기므로 함께 무효화
+    invalidate_snapshot(booth_id, "orders")
     channel_layer = get_channel_layer()
+    message = {
+        "type": "revenue_update",
+        "boothId": int(booth_id),
+        "totalRevenue": int(total_revenue or 0),
+    }
     async_to_sync(channel_layer.group_send)(
         f"booth_{booth_id}_revenue",
-        {
-            "type": "revenue_update",
-            "boothId": int(booth_id),
-            "totalRevenue": int(total_revenue or 0),
-        }
+        with_frame(message, revenue_frame(message)),
     )
 
+
+def revenue_frame(event):
+    return {
+        "type": "REVENUE_UPDATE",
+        "boothId": int(event["boothId"]),
+        "totalRevenue": int(event["totalRevenue"] or 0),  # Decimal → int 변환
+    }
+
 # 새로 추가: 빌지 전체 완료 시 broadcast
 def broadcast_order_completed(order: Order):
     booth = order.table.booth
-    channel_layer = get_channel_layer()
 
-    async_to_sync(channel_layer.group_send)(
-        f"booth_{booth.id}_orders",
+    _send_order_event(
+        booth.id,
         {
             "type": "order_completed",
             "data": {
@@ -245,16 +308,15 @@ def broadcast_order_completed(order: Order):
 # 주문 취소 발생 시 broadcast
 def broadcast_order_cancelled(order: Order, cancelled_items: list):
     """
-    cancelled_items 예시:
+    cancelled_items 예시 (이 주문의 항목만):
     [
-    {"order_menu_id": 123, "menu_name": "사이다", "quantity": 1}
+    {"order_menu_id": 123, "menu_name": "사이다", "quantity": 1, "rest_quantity": 0}
     ]
     """
     booth = order.table.booth
-    channel_layer = get_channel_layer()
 
-    async_to_sync(channel_layer.group_send)(
-        f"booth_{booth.id}_orders",
+    _send_order_event(
+        booth.id,
         {
             "type": "order_cancelled",
             "data": {
@@ -0,0 +1,370 @@
+"""
+주문 항목 취소 (OrderCancelView)
+
+항목마다 select_for_update 를 따로 걸고 재고/금액을 한 건씩 반영하던 방식 대신
+  1) 요청의 단품 / 세트 / 세트 구성품을 한 번씩 잠금 조회 (Order 행도 함께 잠금)
+  2) 기존 규칙 그대로 메모리에서 취소 계획
+     - 사전 가용성 체크 (served 아닌 수량 초과 시 NotCancellable)
+     - 최신 항목(id 큰 순)부터 소진, served 는 스킵, 세트는 구성품 단위(unit) 기준 부분 취소
+  3) 삭제 / 수량 감소 / 진행 카운터 / 재고 복원을 각각 한 번에, 환불은 주문별 F() UPDATE 한 번
+  4) 이용료 행이 지워진 세션 플래그 재계산, 통계 카운터 / 주문별 방송 (호출부의 buffered_broadcasts 안에서)
+- 구성품이 없는 (비정상) 세트는 세트 구성 인덱스 (menu_stock.get_set_components) 로 재고 복원
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+
+from booth.utils.table_session import SEAT_FEE_CATEGORY, refresh_seat_fee_flags
+from order.models import Order, OrderMenu, OrderSetMenu
+from order.utils.order_broadcast import broadcast_order_cancelled
+from order.utils.order_progress import COUNTER_FIELDS, VISIBLE_MENU_CATEGORIES, counter_field, shift_counters
+from menu.utils.menu_stock import get_set_components, restock
+from statistic.counters import record_items_cancelled
+
+
+class NotCancellable(ValueError):
+    """요청 수량이 취소 가능한 수량 (served 아닌 수량) 보다 많음"""
+
+    def __init__(self, item_type, order_item_ids, requested, available):
+        super().__init__(
+            f"요청 수량 {requested}개 중 {requested - available}개는 이미 서빙 완료되어 취소 불가합니다. "
+            f"따라서 최대 {available}개만 취소할 수 있습니다."
+        )
+        self.data = {
+            "type": item_type,
+            "order_item_ids": order_item_ids,
+            "reason": "not_enough_cancellable_due_to_served_or_status",
+        }
+
+
+def _child_units(osm, children):
+    """세트 1개당 구성품 필요 수량 {child.id: unit} (단위 계산 불가면 None)"""
+    if osm.quantity <= 0:
+        return None
+    units = {child.id: child.quantity // osm.quantity for child in children}
+    if any(unit <= 0 for unit in units.values()):
+        return None
+    return units
+
+
+def _max_cancellable_sets(osm, children, units):
+    # 구성품별 취소 가능한 세트 수 (served 구성품이 있으면 0)
+    caps = [0 if child.status == "served" else child.quantity // units[child.id] for child in children]
+    return min([osm.quantity] + caps)
+
+
+class CancelPlan:
+    """잠금 조회한 행 위에서 취소를 계산하고 한 번에 반영"""
+
+    def __init__(self, booth, cancel_items):
+        self.booth = booth
+        self.cancel_items = [item for item in cancel_items if int(item["quantity"]) > 0]
+
+        self.updated_items = []     # 실제 취소/감소 내역
+        self.skipped_items = []     # 스킵된 사유 기록
+        self.cancelled_menus = []   # 통계 카운터용 (order, menu, 취소 수량, 행 삭제 여부)
+        self.cancelled_rows = defaultdict(list)  # 방송용 {order_id: [OrderMenu 단위 취소 델타]}
+        self.refunds = defaultdict(int)
+        self.restocks = defaultdict(int)
+        self.deleted_menus = {}
+        self.deleted_sets = {}
+        self.changed_menus = {}
+        self.changed_sets = {}
+
+        self._lock()
+
+    # ------------------------------------------------------------ 1) 잠금 조회
+
+    def _lock(self):
+        menu_ids = {pk for item in self.cancel_items if item["type"] == "menu" for pk in item["order_item_ids"]}
+        set_ids = {pk for item in self.cancel_items if item["type"] == "set" for pk in item["order_item_ids"]}
+
+        self.sets = {
+            osm.pk: osm
+            for osm in OrderSetMenu.objects.select_for_update(of=("self", "order"))
+            .select_related("order__table__booth", "set_menu")
+            .filter(pk__in=set_ids)
+            .order_by("pk")
+        }
+        self.menus = {
+            om.pk: om
+            for om in OrderMenu.objects.select_for_update(of=("self", "order"))
+            .select_related("order__table__booth", "menu")
+            .filter(Q(pk__in=menu_ids) | Q(ordersetmenu_id__in=self.sets))
+            .order_by("pk")
+        }
+        self.children = defaultdict(list)
+        for om in self.menus.values():
+            if om.ordersetmenu_id in self.sets:
+                self.children[om.ordersetmenu_id].append(om)
+
+        # 같은 주문은 한 인스턴스로 (환불 / 방송)
+        self.orders = {}
+        for row in list(self.sets.values()) + list(self.menus.values()):
+            row.order = self.orders.setdefault(row.order_id, row.order)
+
+        childless = {osm.set_menu_id for osm in self.sets.values() if not self.children[osm.pk]}
+        self.set_components = get_set_components(childless) if childless else {}
+
+    # ------------------------------------------------------------ 2) 계획
+
+    def _live_children(self, osm):
+        return [child for child in self.children[osm.pk] if child.pk not in self.deleted_menus]
+
+    def _available(self, item):
+        if item["type"] == "menu":
+            return sum(
+                self.menus[pk].quantity for pk in set(item["order_item_ids"])
+                if pk in self.menus and self.menus[pk].status != "served"
+            )
+        total = 0
+        for pk in set(item["order_item_ids"]):
+            osm = self.sets.get(pk)
+            if osm is None or osm.status == "served" or osm.quantity <= 0:
+                continue
+            children = self.children[pk]
+            if not children:
+                # 구성품이 없으면 세트 정의 기준으로 전량 가능
+                total += osm.quantity
+                continue
+            units = _child_units(osm, children)
+            if units is not None:
+                total += max(_max_cancellable_sets(osm, children, units), 0)
+        return total
+
+    def check(self):
+        """사전 가용성 체크 (변경 전 상태 기준) - 초과하면 NotCancellable"""
+        for item in self.cancel_items:
+            requested = int(item["quantity"])
+            available = self._available(item)
+            if requested > available:
+                raise NotCancellable(item["type"], item["order_item_ids"], requested, available)
+
+    def plan(self):
+        for item in self.cancel_items:
+            cancel_qty = int(item["quantity"])
+            handler = self._cancel_menu if item["type"] == "menu" else self._cancel_set
+            # 최신 항목부터 소진
+            for pk in sorted(item["order_item_ids"], reverse=True):
+                if cancel_qty <= 0:
+                    break
+                cancel_qty -= handler(pk, cancel_qty)
+
+            # 남은 취소 수량이 있으면 과다 요청 → 스킵 사유 기록
+            if cancel_qty > 0:
+                self.skipped_items.append({
+                    "type": item["type"],
+                    "order_item_ids": item["order_item_ids"],
+                    "reason": "excess_quantity",
+                    "excess": cancel_qty,
+                })
+
+    def _skip(self, item_type, pk, reason, name=None):
+        key = "order_menu_id" if item_type == "menu" else "order_setmenu_id"
+        skipped = {"type": item_type, key: pk}
+        if name is not None:
+            skipped["menu_name" if item_type == "menu" else "set_name"] = name
+        skipped["reason"] = reason
+        self.skipped_items.append(skipped)
+
+    def _decrease_menu(self, om, qty):
+        """OrderMenu 수량 감소 (0 이하면 삭제) + 재고 복원 / 통계 기록, 남은 수량 반환"""
+        self.restocks[om.menu_id] += qty
+        om.quantity -= qty
+        deleted = om.quantity <= 0
+        self.cancelled_menus.append((om.order, om.menu, qty, deleted))
+        self.cancelled_rows[om.order_id].append({
+            "order_menu_id": om.pk,
+            "menu_name": om.menu.menu_name,
+            "quantity": qty,
+            "rest_quantity": max(om.quantity, 0),
+        })
+        if deleted:
+            self.changed_menus.pop(om.pk, None)
+            self.deleted_menus[om.pk] = om
+            return 0
+        self.changed_menus[om.pk] = om
+        return om.quantity
+
+    def _decrease_set(self, osm, qty):
+        """세트 수량 감소 (0 이하면 삭제, 남은 구성품도 함께) + 환불, 남은 세트 수 반환"""
+        refund = (osm.fixed_price or 0) * qty
+        self.refunds[osm.order_id] += refund
+        osm.quantity -= qty
+        if osm.quantity > 0:
+            self.changed_sets[osm.pk] = osm
+            return refund, osm.quantity
+        self.changed_sets.pop(osm.pk, None)
+        self.deleted_sets[osm.pk] = osm
+        for child in self._live_children(osm):
+            self.changed_menus.pop(child.pk, None)
+            self.deleted_menus[child.pk] = child
+        return refund, 0
+
+    def _cancel_menu(self, pk, cancel_qty):
+        om = self.menus.get(pk)
+        if om is None or pk in self.deleted_menus:
+            self._skip("menu", pk, "not_found")
+            return 0
+        # served면 취소 불가 → 스킵 (요청 전체 실패 X)
+        if om.status == "served":
+            self._skip("menu", pk, "served", om.menu.menu_name)
+            return 0
+        if om.quantity <= 0:
+            return 0
+
+        qty = min(cancel_qty, om.quantity)
+        refund = (om.fixed_price or 0) * qty
+        self.refunds[om.order_id] += refund
+        rest = self._decrease_menu(om, qty)
+        self.updated_items.append({
+            "type": "menu",
+            "order_menu_id": om.pk if rest else None,
+            "menu_name": om.menu.menu_name,
+            "canceled_quantity": qty,
+            "rest_quantity": rest,
+            "restored_stock": qty,
+            "refund": refund,
+            "order_id": om.order_id,
+        })
+        return qty
+
+    def _cancel_set(self, pk, cancel_qty):
+        osm = self.sets.get(pk)
+        if osm is None or pk in self.deleted_sets:
+            self._skip("set", pk, "not_found")
+            return 0
+        if osm.order.table.booth_id != self.booth.id:
+            self._skip("set", pk, "booth_mismatch")
+            return 0
+        # 세트 자체가 served면 스킵
+        if osm.status == "served":
+            self._skip("set", pk, "served", osm.set_menu.set_name)
+            return 0
+
+        children = self._live_children(osm)
+        if not children:
+            return self._cancel_childless_set(osm, cancel_qty)
+
+        if osm.quantity <= 0:
+            self._skip("set", pk, "no_quantity", osm.set_menu.set_name)
+            return 0
+        units = _child_units(osm, children)
+        if units is None:
+            # 단위 계산이 불가 (데이터가 비정상적으로 불일치)
+            self._skip("set", pk, "invalid_child_unit", osm.set_menu.set_name)
+            return 0
+        max_sets = _max_cancellable_sets(osm, children, units)
+        if max_sets <= 0:
+            self._skip("set", pk, "partially_served_cannot_cancel", osm.set_menu.set_name)
+            return 0
+
+        qty = min(cancel_qty, max_sets)
+        child_adjustments = []
+        for child in children:
+            decreased = units[child.id] * qty
+            rest = self._decrease_menu(child, decreased)
+            child_adjustments.append({
+                "order_menu_id": child.pk if rest else None,
+                "menu_name": child.menu.menu_name,
+                "decreased_quantity": decreased,
+                "rest_child_quantity": rest,
+            })
+
+        refund, rest_sets = self._decrease_set(osm, qty)
+        self.updated_items.append({
+            "type": "set",
+            "order_setmenu_id": pk if rest_sets > 0 else None,
+            "set_name": osm.set_menu.set_name if rest_sets > 0 else None,
+            "canceled_sets": qty,
+            "rest_quantity": rest_sets,
+            "refund": refund,
+            "order_id": osm.order_id,
+            "child_adjustments": child_adjustments,
+        })
+        return qty
+
+    def _cancel_childless_set(self, osm, cancel_qty):
+        """구성품 행이 없는 (비정상) 세트 → 세트 정의 기준으로만 재고/금액 처리"""
+        components = self.set_components.get(osm.set_menu_id)
+        if not components:
+            self._skip("set", osm.pk, "invalid_set_definition", osm.set_menu.set_name)
+            return 0
+        qty = min(cancel_qty, max(osm.quantity, 0))
+        if qty <= 0:
+            return 0
+
+        for menu_id, quantity in components:
+            self.restocks[menu_id] += (quantity or 0) * qty
+        refund, rest_sets = self._decrease_set(osm, qty)
+        self.updated_items.append({
+            "type": "set",
+            "order_setmenu_id": osm.pk,
+            "set_name": osm.set_menu.set_name if rest_sets > 0 else None,
+            "canceled_sets": qty,
+            "rest_quantity": rest_sets,
+            "refund": refund,
+            "order_id": osm.order_id,
+        })
+        return qty
+
+    # ------------------------------------------------------------ 3) 반영
+
+    def _counter_deltas(self):
+        """삭제되는 항목만큼 진행 카운터 차감 (Order 는 보이는 항목만, 삭제되는 세트는 제외)"""
+        order_deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        set_deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        for om in self.deleted_menus.values():
+            if om.menu.menu_category in VISIBLE_MENU_CATEGORIES:
+                order_deltas[om.order_id][counter_field(om.status)] -= 1
+            if om.ordersetmenu_id and om.ordersetmenu_id not in self.deleted_sets:
+                set_deltas[om.ordersetmenu_id][counter_field(om.status)] -= 1
+        return order_deltas, set_deltas
+
+    def apply(self):
+        """계획한 변경 반영 → 실제 차감된 환불 합계"""
+        order_deltas, set_deltas = self._counter_deltas()
+
+        if self.deleted_menus:
+            OrderMenu.objects.filter(pk__in=self.deleted_menus).delete()
+        if self.deleted_sets:
+            OrderSetMenu.objects.filter(pk__in=self.deleted_sets).delete()
+        if self.changed_menus:
+            OrderMenu.objects.bulk_update(self.changed_menus.values(), ["quantity"])
+        if self.changed_sets:
+            OrderSetMenu.objects.bulk_update(self.changed_sets.values(), ["quantity"])
+        shift_counters(Order, order_deltas)
+        shift_counters(OrderSetMenu, set_deltas)
+
+        restock(self.restocks)
+
+        # 주문 합계 차감 (잠긴 행이라 이전 값으로 실제 차감액 계산)
+        applied_refunds = []  # 통계 카운터용 (order, 실제 차감액)
+        refund_total = 0
+        for order_id, refund in sorted(self.refunds.items()):
+            if refund <= 0:
+                continue
+            order = self.orders[order_id]
+            Order.objects.filter(pk=order_id).update(
+                order_amount=Greatest(F("order_amount") - refund, Value(0))
+            )
+            prev = order.order_amount or 0
+            order.order_amount = max(prev - refund, 0)
+            applied_refunds.append((order, prev - order.order_amount))
+            refund_total += refund
+
+        # 이용료 행이 지워진 세션은 이용료 주문 여부 재계산
+        refresh_seat_fee_flags(
+            om.order.session_id for om in self.deleted_menus.values()
+            if om.menu.menu_category == SEAT_FEE_CATEGORY
+        )
+
+        record_items_cancelled(self.booth.id, self.cancelled_menus, applied_refunds)
+        self._broadcast([order for order, _ in applied_refunds])
+        return refund_total
+
+    def _broadcast(self, orders):
+        for order in orders:
+            # 주문 취소 델타 (그 주문의 OrderMenu 항목만, 남은 수량 포함 / 0 이면 삭제된 행)
+            broadcast_order_cancelled(order, self.cancelled_rows[order.id])
@@ -0,0 +1,154 @@
+"""
+주문 생성 (체크아웃) 엔진
+
+장바구니 전체를 기준으로
+  1) 캐시 재고를 먼저 원자적으로 예약 (menu_stock.reserve), 끝나면 성공 / 실패 모두 반환 (release)
+     → 품절이 확실한 요청은 행 잠금을 기다리지 않고 바로 실패
+     → 캐시의 실제 차감은 commit 이 바깥 트랜잭션 커밋 이후에 (뷰에서 뒤이어 실패해 롤백되면 캐시도 그대로)
+  2) 필요한 메뉴 행을 pk 순서로 한 번에 잠그고 (select_for_update → 동시 체크아웃 데드락 방지)
+  3) 재고 검사는 메모리에서, 차감은 조건부 UPDATE 한 번으로 (menu_stock.commit)
+  4) OrderMenu / OrderSetMenu 는 bulk_create
+     (bulk_create 는 save() 를 거치지 않으므로 진행 카운터는 생성 전에 계산 - order_progress.initial_counts)
+  5) 금액은 잠근 메뉴/세트 가격으로 메모리에서 계산
+  6) 주문은 테이블의 진행 중인 세션에 연결, 세션 플래그 (주문 / 이용료) 갱신
+"""
+from collections import defaultdict
+
+from booth.utils.table_session import mark_ordered
+from menu.models import Menu, SetMenu, SetMenuItem
+from menu.utils.menu_stock import StockShortage, cart_needs, commit, refresh_stock, release, reserve
+from order.models import Order, OrderMenu, OrderSetMenu
+from order.utils.order_progress import initial_counts, initial_status
+
+SEAT_FEE_CATEGORY = "seat_fee"
+
+
+def _check_stock(menus, cart_menus, cart_sets, set_menus, set_items):
+    """메뉴 존재 / 재고 검사 (단품 → 세트 순서, 기존 오류 문구 유지)"""
+    if any(cm.menu_id not in menus for cm in cart_menus):
+        raise StockShortage("존재하지 않는 메뉴가 포함되어 있습니다.")
+
+    remaining = {pk: m.menu_amount for pk, m in menus.items()}
+    for cm in cart_menus:
+        menu = menus[cm.menu_id]
+        if remaining[menu.pk] < cm.quantity:
+            raise StockShortage(f"'{menu.menu_name}' 재고 부족")
+        remaining[menu.pk] -= cm.quantity
+
+    for cs in cart_sets:
+        setmenu = set_menus[cs.set_menu_id]
+        items = set_items[setmenu.pk]
+        for smi in items:
+            if remaining[smi.menu_id] < smi.quantity * cs.quantity:
+                raise StockShortage(
+                    f"세트 '{setmenu.set_name}' 구성 '{menus[smi.menu_id].menu_name}' 재고 부족"
+                )
+        for smi in items:
+            remaining[smi.menu_id] -= smi.quantity * cs.quantity
+
+
+def place_order(table, cart_menus, cart_sets):
+    """
+    장바구니 항목으로 주문 생성 (transaction.atomic 안에서 호출)
+    반환: (order, subtotal, table_fee)
+    """
+    # --- 세트 구성 한 번에 조회
+    set_ids = {cs.set_menu_id for cs in cart_sets}
+    set_menus = SetMenu.objects.in_bulk(set_ids)
+    set_items = defaultdict(list)
+    for smi in SetMenuItem.objects.filter(set_menu_id__in=set_ids).order_by("id"):
+        set_items[smi.set_menu_id].append(smi)
+
+    for cs in cart_sets:
+        if cs.set_menu_id not in set_menus:
+            raise StockShortage("존재하지 않는 세트 메뉴가 포함되어 있습니다.")
+
+    menu_ids = {cm.menu_id for cm in cart_menus}
+    menu_ids.update(smi.menu_id for items in set_items.values() for smi in items)
+    components = {
+        set_id: [(smi.menu_id, smi.quantity) for smi in items]
+        for set_id, items in set_items.items()
+    }
+    needs = cart_needs(cart_menus, cart_sets, components)
+
+    # --- 캐시 재고 예약 (부족하면 잠그기 전에 DB 로 재확인 → 정말 부족하면 여기서 실패)
+    reserved = reserve(needs)
+    if reserved is None:
+        _check_stock(Menu.objects.in_bulk(menu_ids), cart_menus, cart_sets, set_menus, set_items)
+        refresh_stock(menu_ids)
+        reserved = reserve(needs) or {}
+
+    try:
+        return _place_locked(table, cart_menus, cart_sets, set_menus, set_items, menu_ids, needs)
+    finally:
+        release(reserved)
+
+
+def _place_locked(table, cart_menus, cart_sets, set_menus, set_items, menu_ids, needs):
+    # --- 관련 메뉴 pk 순서로 잠금 후 최종 검사
+    menus = {
+        m.pk: m
+        for m in Menu.objects.select_for_update().filter(pk__in=menu_ids).order_by("pk")
+    }
+    _check_stock(menus, cart_menus, cart_sets, set_menus, set_items)
+
+    commit(needs)
+
+    # --- 주문 행 생성 (진행 카운터 포함)
+    item_menus = [menus[cm.menu_id] for cm in cart_menus]
+    item_menus += [menus[smi.menu_id] for cs in cart_sets for smi in set_items[cs.set_menu_id]]
+    order = Order.objects.create(
+        table_id=table.id, session_id=table.current_session_id, order_amount=0,
+        **initial_counts(item_menus, visible_only=True)
+    )
+
+    subtotal, table_fee = 0, 0
+    single_rows = []
+    for cm in cart_menus:
+        menu = menus[cm.menu_id]
+        single_rows.append(OrderMenu(
+            order=order,
+            menu=menu,
+            quantity=cm.quantity,
+            fixed_price=menu.menu_price,
+            status=initial_status(menu),
+        ))
+        if menu.menu_category == SEAT_FEE_CATEGORY:
+            table_fee += menu.menu_price * cm.quantity
+        else:
+            subtotal += menu.menu_price * cm.quantity
+    OrderMenu.objects.bulk_create(single_rows)
+
+    order_sets = OrderSetMenu.objects.bulk_create([
+        OrderSetMenu(
+            order=order,
+            set_menu=set_menus[cs.set_menu_id],
+            quantity=cs.quantity,
+            fixed_price=set_menus[cs.set_menu_id].set_price,
+            status="pending",
+            **initial_counts(menus[smi.menu_id] for smi in set_items[cs.set_menu_id]),
+        )
+        for cs in cart_sets
+    ])
+
+    component_rows = []
+    for cs, osm in zip(cart_sets, order_sets):
+        for smi in set_items[cs.set_menu_id]:
+            menu = menus[smi.menu_id]
+            component_rows.append(OrderMenu(
+                order=order,
+                menu=menu,
+                quantity=smi.quantity * cs.quantity,
+                fixed_price=menu.menu_price,
+                ordersetmenu=osm,
+                status=initial_status(menu),
+            ))
+        subtotal += osm.set_menu.set_price * cs.quantity
+    OrderMenu.objects.bulk_create(component_rows)
+
+    # 세션 플래그 (첫 주문 / 이용료 주문 여부)
+    mark_ordered(
+        order.session_id,
+        with_seat_fee=any(menus[cm.menu_id].menu_category == SEAT_FEE_CATEGORY for cm in cart_menus),
+    )
+    return order, subtotal, table_fee
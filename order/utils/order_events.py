@@ -0,0 +1,86 @@
+"""
+주문 웹소켓(booth_{id}_orders) 이벤트 시퀀스 / 재전송 로그
+
+- 부스별 단조 증가 seq 를 모든 주문 이벤트에 부여 (cache.incr → 프로세스 간 원자적)
+- 최근 ORDER_EVENT_LOG_SIZE 개 이벤트를 seq % SIZE 슬롯에 보관 (링 버퍼)
+- 재연결한 클라이언트가 last_seq 를 보내면 놓친 이벤트만 재전송,
+  로그가 한 바퀴 돌았거나 누락이 있으면 None → ORDER_SNAPSHOT 으로 대체
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 로그 항목 보관 시간 (초) - 하루 영업 기준
+ORDER_EVENT_LOG_TTL = 60 * 60 * 12
+
+
+def _log_size():
+    return getattr(settings, "ORDER_EVENT_LOG_SIZE", 500)
+
+
+def _seq_key(booth_id):
+    return f"order_events:{booth_id}:seq"
+
+
+def _slot_key(booth_id, seq):
+    return f"order_events:{booth_id}:log:{seq % _log_size()}"
+
+
+def _next_seq(booth_id) -> int:
+    key = _seq_key(booth_id)
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
+
+
+def current_seq(booth_id) -> int:
+    try:
+        return cache.get(_seq_key(booth_id), 0)
+    except Exception:
+        logger.warning(f"order event seq unavailable for booth {booth_id}", exc_info=True)
+        return 0
+
+
+def record_order_event(booth_id, message: dict) -> dict:
+    """
+    group_send 할 메시지에 seq 를 붙이고 재전송 로그에 저장
+    캐시 장애 시에도 방송은 되도록 seq=None 으로 반환 (클라이언트는 스냅샷으로 복구)
+    """
+    try:
+        seq = _next_seq(booth_id)
+        message = {**message, "seq": seq}
+        cache.set(_slot_key(booth_id, seq), message, timeout=ORDER_EVENT_LOG_TTL)
+    except Exception:
+        logger.warning(f"order event log unavailable for booth {booth_id}", exc_info=True)
+        message = {**message, "seq": None}
+    return message
+
+
+def replay_order_events(booth_id, last_seq: int):
+    """
+    last_seq 이후 이벤트 목록 (seq 오름차순)
+    재전송이 불가능하면 None
+    """
+    latest = current_seq(booth_id)
+    if last_seq > latest or latest - last_seq > _log_size():
+        return None
+    if last_seq == latest:
+        return []
+
+    seqs = range(last_seq + 1, latest + 1)
+    try:
+        stored = cache.get_many([_slot_key(booth_id, seq) for seq in seqs])
+    except Exception:
+        logger.warning(f"order event log unavailable for booth {booth_id}", exc_info=True)
+        return None
+
+    events = []
+    for seq in seqs:
+        message = stored.get(_slot_key(booth_id, seq))
+        # 만료 / 덮어쓰기 / 아직 기록 전인 슬롯 → 재전송 불가
+        if not message or message.get("seq") != seq:
+            return None
+        events.append(message)
+    return events
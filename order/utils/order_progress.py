@@ -0,0 +1,180 @@
+"""
+주문 / 세트 진행 카운터
+
+Order, OrderSetMenu 에 상태별 항목 수 (pending_items / cooked_items / served_items) 를 보관
+→ 항목 하나를 조리/서빙 처리할 때마다 형제 항목을 다시 조회하던 세트 동기화, 빌지 완료 검사를 O(1) 로
+- Order 카운터는 주방/서빙 화면에 보이는 항목 (메뉴/음료) 만, OrderSetMenu 카운터는 구성품 전체
+- 상태 전이는 이전 상태가 일치할 때만 바꾸는 조건부 UPDATE + 같은 트랜잭션의 F() 증감
+  (동시에 같은 항목을 처리하면 한 요청만 성공)
+- 생성: OrderMenu.save() (count_added_item), 체크아웃 bulk_create 는 initial_counts 로 미리 계산
+- 삭제: order_cancel.CancelPlan (삭제되는 항목만큼 shift_counters)
+- 정합성 점검: verify_order_counters (manage.py check_order_counters)
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from order.models import Order, OrderMenu, OrderSetMenu
+
+VISIBLE_MENU_CATEGORIES = ["메뉴", "음료"]
+ITEM_STATUSES = ("pending", "cooked", "served")
+COUNTER_FIELDS = tuple(f"{status}_items" for status in ITEM_STATUSES)
+
+
+def counter_field(status):
+    return f"{status}_items"
+
+
+def initial_status(menu):
+    # OrderMenu.save() 와 동일: 음료는 cooked 로 시작
+    return "cooked" if menu.menu_category == "음료" else "pending"
+
+
+def initial_counts(menus, visible_only=False) -> dict:
+    """새로 만들 항목 메뉴 목록 → 카운터 필드 값 (bulk_create 전 Order / OrderSetMenu 생성용)"""
+    counts = Counter(
+        initial_status(menu) for menu in menus
+        if not visible_only or menu.menu_category in VISIBLE_MENU_CATEGORIES
+    )
+    return {counter_field(status): counts.get(status, 0) for status in ITEM_STATUSES}
+
+
+def _shift(from_status, to_status, n=1) -> dict:
+    updates = {}
+    if from_status:
+        updates[counter_field(from_status)] = F(counter_field(from_status)) - n
+    if to_status:
+        updates[counter_field(to_status)] = F(counter_field(to_status)) + n
+    return updates
+
+
+def _apply(order_menu, category, from_status, to_status):
+    updates = _shift(from_status, to_status)
+    if category in VISIBLE_MENU_CATEGORIES:
+        Order.objects.filter(pk=order_menu.order_id).update(**updates)
+    if order_menu.ordersetmenu_id:
+        OrderSetMenu.objects.filter(pk=order_menu.ordersetmenu_id).update(**updates)
+
+
+def _refresh_cached(order_menu):
+    # 이미 불러온 Order / OrderSetMenu 는 카운터만 다시 읽음 (안 불러왔으면 다음 접근 때 최신 값)
+    for name in ("order", "ordersetmenu"):
+        if getattr(OrderMenu, name).is_cached(order_menu):
+            parent = getattr(order_menu, name)
+            if parent is not None:
+                parent.refresh_from_db(fields=COUNTER_FIELDS)
+
+
+def count_added_item(order_menu):
+    """OrderMenu.save() 로 새로 만든 항목 반영"""
+    _apply(order_menu, order_menu.menu.menu_category, None, order_menu.status)
+    _refresh_cached(order_menu)
+
+
+def transition_item(order_menu, to_status, **fields) -> bool:
+    """
+    OrderMenu 상태 전이 (현재 order_menu.status → to_status) + 카운터 갱신
+    fields: 함께 저장할 값 (cooked_at / served_at)
+    다른 요청이 먼저 상태를 바꿨으면 아무것도 바꾸지 않고 False
+    """
+    from_status = order_menu.status
+    with transaction.atomic():
+        updated = OrderMenu.objects.filter(pk=order_menu.pk, status=from_status).update(
+            status=to_status, **fields
+        )
+        if not updated:
+            return False
+        _apply(order_menu, order_menu.menu.menu_category, from_status, to_status)
+
+    order_menu.status = to_status
+    for name, value in fields.items():
+        setattr(order_menu, name, value)
+    _refresh_cached(order_menu)
+    return True
+
+
+def shift_counters(model, deltas: dict):
+    """
+    여러 행의 카운터를 UPDATE 한 번으로 증감 (일괄 전이용)
+    deltas: {pk: {"pending_items": -2, "cooked_items": 2, ...}}
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+    updates = {}
+    for field in COUNTER_FIELDS:
+        whens = [When(pk=pk, then=Value(delta[field])) for pk, delta in deltas.items() if delta.get(field)]
+        if whens:
+            updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+    model.objects.filter(pk__in=deltas).update(**updates)
+
+
+def synced_set_status(order_set, event):
+    """
+    구성품 하나가 event (cooked / served) 로 바뀐 뒤의 세트 상태 (카운터 기준, 조회 없음)
+    조리 완료: 전부 cooked → cooked / pending 남음 → pending / 그 외 유지
+    서빙 완료: 전부 served → served / cooked 남음 → cooked / 그 외 pending
+    """
+    total = order_set.total_items
+    if event == "cooked":
+        if order_set.cooked_items == total:
+            return "cooked"
+        if order_set.pending_items:
+            return "pending"
+        return order_set.status
+    if order_set.served_items == total:
+        return "served"
+    if order_set.cooked_items:
+        return "cooked"
+    return "pending"
+
+
+# ---------------------------------------------------------------------------
+# 정합성 점검
+# ---------------------------------------------------------------------------
+
+def _scanned(queryset, relation, visible_only):
+    """항목 행 전체 집계로 계산한 카운터 (annotate)"""
+    annotations = {}
+    for status in ITEM_STATUSES:
+        condition = Q(**{f"{relation}__status": status})
+        if visible_only:
+            condition &= Q(**{f"{relation}__menu__menu_category__in": VISIBLE_MENU_CATEGORIES})
+        annotations[f"scanned_{status}"] = Count(relation, filter=condition)
+    return queryset.annotate(**annotations)
+
+
+def _verify(model, queryset, relation, visible_only, fix):
+    mismatches, stale = [], []
+    for obj in _scanned(queryset, relation, visible_only).order_by("pk"):
+        counted = tuple(getattr(obj, field) for field in COUNTER_FIELDS)
+        scanned = tuple(getattr(obj, f"scanned_{status}") for status in ITEM_STATUSES)
+        if counted == scanned:
+            continue
+        mismatches.append((model.__name__, obj.pk, counted, scanned))
+        for field, value in zip(COUNTER_FIELDS, scanned):
+            setattr(obj, field, value)
+        stale.append(obj)
+    if fix and stale:
+        model.objects.bulk_update(stale, COUNTER_FIELDS, batch_size=500)
+    return mismatches
+
+
+def verify_order_counters(booth_id=None, fix=False) -> list:
+    """
+    카운터와 항목 행 집계 비교
+    반환: [(모델 이름, pk, (pending, cooked, served) 카운터, 전체 집계), ...]
+    fix=True 면 불일치 행을 집계 값으로 수정
+    """
+    orders = Order.objects.all()
+    order_sets = OrderSetMenu.objects.all()
+    if booth_id is not None:
+        orders = orders.filter(table__booth_id=booth_id)
+        order_sets = order_sets.filter(order__table__booth_id=booth_id)
+
+    with transaction.atomic():
+        return (
+            _verify(Order, orders, "ordermenu", True, fix)
+            + _verify(OrderSetMenu, order_sets, "order_menus", False, fix)
+        )
@@ -0,0 +1,147 @@
+"""
+주방/서빙 일괄 상태 전이
+
+여러 OrderMenu / OrderSetMenu 를 한 요청으로 cooked / served 처리
+(단건 KitchenOrderCookedView / ServingOrderCompleteView 와 같은 전이 규칙)
+  1) 대상 행을 pk 순서로 잠그고 (메뉴 행은 잠그지 않음 → 체크아웃과 경합 없음) 전이 가능 여부 판정
+  2) 항목 / 세트 각각 UPDATE 한 번 (WHERE status IN (...), cooked_at / served_at 은 DB 시각)
+  3) Order / OrderSetMenu 진행 카운터는 CASE 로 UPDATE 한 번씩 (order_progress.shift_counters)
+  4) 세트 상태 동기화 / 빌지 완료는 카운터로 판단
+  5) 방송은 호출부의 buffered_broadcasts 안에서 → 부스별 ORDER_UPDATES 한 번
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from order.models import Order, OrderMenu, OrderSetMenu
+from order.utils.order_broadcast import (
+    broadcast_order_completed, broadcast_order_item_update, broadcast_order_set_update,
+)
+from order.utils.order_progress import (
+    COUNTER_FIELDS, VISIBLE_MENU_CATEGORIES, counter_field, shift_counters, synced_set_status,
+)
+from statistic.counters import record_items_served
+
+TARGET_STATUSES = ("cooked", "served")
+TIMESTAMP_FIELDS = {"cooked": "cooked_at", "served": "served_at"}
+
+# 목표 상태별 전이 가능한 이전 상태 (음료는 pending 에서 바로 서빙 가능)
+MENU_SOURCES = {"cooked": ["pending"], "served": ["cooked", "pending"]}
+SET_SOURCES = {"cooked": ["pending"], "served": ["cooked"]}
+
+
+def _menu_allowed(order_menu, to_status):
+    if to_status == "served" and order_menu.status == "pending":
+        return order_menu.menu.menu_category == "음료"
+    return order_menu.status in MENU_SOURCES[to_status]
+
+
+def _outcome(item_type, pk, result, prev_status=None, status=None):
+    return {"type": item_type, "id": pk, "result": result, "prev_status": prev_status, "status": status}
+
+
+def apply_transitions(booth_id, items, to_status):
+    """
+    items: [{"type": "menu" | "setmenu", "id": pk}, ...] (요청 순서 유지)
+    반환: 항목별 결과 [{"type", "id", "result": "updated" | "not_found" | "invalid_status", "prev_status", "status"}]
+    transaction.atomic / buffered_broadcasts 안에서 호출
+    """
+    menu_ids = {item["id"] for item in items if item["type"] == "menu"}
+    set_ids = {item["id"] for item in items if item["type"] == "setmenu"}
+    timestamp = TIMESTAMP_FIELDS[to_status]
+
+    # --- 1) 잠금 + 판정
+    menus = {
+        om.pk: om
+        for om in OrderMenu.objects.select_for_update(of=("self",))
+        .select_related("menu")
+        .filter(pk__in=menu_ids, order__table__booth_id=booth_id)
+        .order_by("pk")
+    }
+    sets = {
+        osm.pk: osm
+        for osm in OrderSetMenu.objects.select_for_update(of=("self",))
+        .filter(pk__in=set_ids, order__table__booth_id=booth_id)
+        .order_by("pk")
+    }
+    moving_menus = [om for om in menus.values() if _menu_allowed(om, to_status)]
+    moving_sets = [osm for osm in sets.values() if osm.status in SET_SOURCES[to_status]]
+
+    # --- 2) 상태 UPDATE (항목 / 세트 각 1회)
+    if moving_menus:
+        OrderMenu.objects.filter(
+            Q(pk__in=[om.pk for om in moving_menus]),
+            Q(status__in=MENU_SOURCES[to_status]),
+        ).update(status=to_status, **{timestamp: Now()})
+    if moving_sets:
+        OrderSetMenu.objects.filter(
+            pk__in=[osm.pk for osm in moving_sets], status__in=SET_SOURCES[to_status]
+        ).update(status=to_status, **{timestamp: Now()})
+
+    # --- 3) 진행 카운터
+    order_deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    set_deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for om in moving_menus:
+        targets = [set_deltas[om.ordersetmenu_id]] if om.ordersetmenu_id else []
+        if om.menu.menu_category in VISIBLE_MENU_CATEGORIES:
+            targets.append(order_deltas[om.order_id])
+        for delta in targets:
+            delta[counter_field(om.status)] -= 1
+            delta[counter_field(to_status)] += 1
+    shift_counters(Order, order_deltas)
+    shift_counters(OrderSetMenu, set_deltas)
+
+    # --- 4) 구성품이 바뀐 세트 상태 동기화 (바뀌는 상태별 UPDATE)
+    set_changes = defaultdict(list)
+    for osm in OrderSetMenu.objects.filter(pk__in=set_deltas):
+        status = synced_set_status(osm, to_status)
+        if status != osm.status:
+            set_changes[status].append(osm.pk)
+    for status, pks in set_changes.items():
+        OrderSetMenu.objects.filter(pk__in=pks).update(status=status)
+
+    moved = {("menu", om.pk) for om in moving_menus} | {("setmenu", osm.pk) for osm in moving_sets}
+    results = []
+    for item in items:
+        item_type, pk = item["type"], item["id"]
+        row = menus.get(pk) if item_type == "menu" else sets.get(pk)
+        if row is None:
+            results.append(_outcome(item_type, pk, "not_found"))
+        elif (item_type, pk) in moved:
+            results.append(_outcome(item_type, pk, "updated", row.status, to_status))
+        else:
+            results.append(_outcome(item_type, pk, "invalid_status", row.status, row.status))
+
+    _publish(booth_id, to_status, moving_menus, moving_sets)
+    return results
+
+
+def _publish(booth_id, to_status, moving_menus, moving_sets):
+    """바뀐 행을 다시 읽어 (DB 시각 포함) 통계 / 빌지 완료 / 방송"""
+    updated_menus = list(
+        OrderMenu.objects.filter(pk__in=[om.pk for om in moving_menus])
+        .select_related("menu", "order__table__booth", "ordersetmenu__set_menu")
+        .order_by("order_id", "pk")
+    ) if moving_menus else []
+    updated_sets = list(
+        OrderSetMenu.objects.filter(pk__in=[osm.pk for osm in moving_sets])
+        .select_related("set_menu", "order__table__booth")
+        .order_by("order_id", "pk")
+    ) if moving_sets else []
+
+    if to_status == "served":
+        record_items_served(booth_id, updated_menus)
+
+    for om in updated_menus:
+        broadcast_order_item_update(om)
+    for osm in updated_sets:
+        broadcast_order_set_update(osm)
+
+    # 빌지 완료 (서빙 시에만, 보이는 항목 카운터 기준)
+    if to_status == "served":
+        order_ids = {om.order_id for om in updated_menus} | {osm.order_id for osm in updated_sets}
+        completed = Order.objects.filter(pk__in=order_ids, pending_items=0, cooked_items=0)
+        if order_ids and completed.update(served_at=Now()):
+            for order in completed.select_related("table__booth").order_by("pk"):
+                broadcast_order_completed(order)
@@ -2,15 +2,23 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils.timezone import now
 from django.utils import timezone
 from datetime import timedelta
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from order.utils.order_broadcast import broadcast_order_update
+from order.utils.order_broadcast import broadcast_order_created, buffered_broadcasts
+from order.utils.order_checkout import place_order
+from booth.utils.booth_context import get_booth_context
+from booth.utils.table_session import is_first_order
+from cart.utils.cart_store import get_cart_store
+from cart.utils.cart_quote import build_quote, coupon_discount, get_quote
 
 from order.models import *
 from menu.models import *
@@ -24,28 +32,6 @@ SEAT_MENU_CATEGORY = "seat"
 SEAT_FEE_CATEGORY = "seat_fee"
 
 
-def _is_first_session(table: Table, now_dt=None) -> bool:
-    """
-    테이블이 '리셋 이후' 또는 '재입장 이후' 첫 주문인지 확인
-    """
-    activated_at = getattr(table, "activated_at", None)
-    deactivated_at = getattr(table, "deactivated_at", None)
-
-    qs = Order.objects.filter(table_id=table.id)
-
-    # 기준 시각 = activated_at, deactivated_at 중 더 나중 시간
-    baseline = None
-    if activated_at and deactivated_at:
-        baseline = max(activated_at, deactivated_at)
-    else:
-        baseline = activated_at or deactivated_at
-
-    if baseline:
-        qs = qs.filter(created_at__gte=baseline)
-
-    return not qs.exists()
-
-
 def get_table_fee_and_type_by_booth(booth_id: int):
     m = Manager.objects.filter(booth_id=booth_id).first()
     if not m:
@@ -57,18 +43,6 @@ def get_table_fee_and_type_by_booth(booth_id: int):
     return 0, "none"
 
 
-def is_first_order_for_table_session(table_id: int, booth_id: int, now_dt):
-    table = Table.objects.filter(pk=table_id, booth_id=booth_id).first()
-    if not table:
-        return True
-
-    activated_at = getattr(table, "activated_at", None)
-    qs = Order.objects.filter(table_id=table_id)
-    if activated_at:
-        qs = qs.filter(created_at__gte=activated_at)
-
-    return not qs.exists()
-
 class OrderPasswordVerifyView(APIView):
     permission_classes = []
 
@@ -84,10 +58,16 @@ class OrderPasswordVerifyView(APIView):
                 "message": "Booth-ID 헤더와 cart_id 파라미터가 필요합니다."
             })
 
-        booth = get_object_or_404(Booth, pk=booth_id)
-        cart = get_object_or_404(Cart, id=cart_id, table__booth=booth, is_ordered=False)
+        # 부스/운영자/seat_fee 메뉴는 부스 컨텍스트 캐시에서
+        context = get_booth_context(booth_id)
+        if not context:
+            raise Http404
+        cart = get_cart_store().get(cart_id, booth_id=context.booth_id)
+        if cart is None:
+            raise Http404
         table = cart.table
-        manager = get_object_or_404(Manager, booth=booth)
+        if not context.has_manager:
+            raise Http404
         activated_at = table.activated_at
 
         if not activated_at:
@@ -96,49 +76,27 @@ class OrderPasswordVerifyView(APIView):
                 "code": 200,
                 "data": {
                     "order_amount": 0,
-                    "seat_count": 0 if manager.seat_type == "PP" else None
+                    "seat_count": 0 if context.seat_type == "PP" else None
                 }
             }, status=200)
 
+        # 장바구니 금액 / 쿠폰 할인은 견적에서 (장바구니 버전 + 쿠폰 코드별 캐시)
+        quote = get_quote(cart, coupon_code_input)
+
         # seat_type 이 PP인 경우 → seat_fee 수량 불러오기
         seat_count = None
-        if manager.seat_type == "PP":
-            seat_fee_menu = Menu.objects.filter(
-                booth=booth,
-                menu_category=SEAT_FEE_CATEGORY
-            ).first()
-
-            if seat_fee_menu:
-                order_qs = Order.objects.filter(
-                    table=table,
-                    created_at__gte=activated_at
-                )
+        if context.seat_type == "PP":
+            seat_fee_menu_id = context.seat_fee_menu_id
+
+            if seat_fee_menu_id:
+                order_qs = Order.objects.filter(session_id=table.current_session_id)
                 ordered_seat_count = OrderMenu.objects.filter(
                     order__in=order_qs,
-                    menu=seat_fee_menu
+                    menu_id=seat_fee_menu_id
                 ).aggregate(total=models.Sum("quantity"))["total"] or 0
 
                 # 장바구니 seat_fee
-                cart_seat_count = CartMenu.objects.filter(
-                    cart=cart,
-                    menu=seat_fee_menu
-                ).aggregate(total=models.Sum("quantity"))["total"] or 0
-
-                seat_count = ordered_seat_count + cart_seat_count
-
-        # 장바구니 금액 계산
-        cart_amount, coupon_info, coupon_discount = 0, None, 0
-
-        cart_menu_amount = CartMenu.objects.filter(cart=cart).aggregate(
-            total=models.Sum(models.F("quantity") * models.F("menu__menu_price"))
-        )["total"] or 0
-
-        cart_set_amount = CartSetMenu.objects.filter(cart=cart).aggregate(
-            total=models.Sum(models.F("quantity") * models.F("set_menu__set_price"))
-        )["total"] or 0
-
-        pre_discount_total = cart_menu_amount + cart_set_amount
-        cart_amount = pre_discount_total
+                seat_count = ordered_seat_count + quote.menu_quantity(seat_fee_menu_id)
 
         # 쿠폰 처리 로직
         if coupon_code_input:
@@ -147,30 +105,12 @@ class OrderPasswordVerifyView(APIView):
                 used_at__isnull=True
             ).update(issued_to_table=None)
 
-            coupon_code = CouponCode.objects.filter(
-                code=coupon_code_input.upper(),
-                coupon__booth=booth,
-                used_at__isnull=True
-            ).select_related("coupon").first()
-
-            if coupon_code:
-                cpn = coupon_code.coupon
-                if cpn.discount_type.lower() == "percent":
-                    coupon_discount = min(int(pre_discount_total * cpn.discount_value / 100), pre_discount_total)
-                else:
-                    coupon_discount = min(int(cpn.discount_value), pre_discount_total)
-
-                cart_amount = max(pre_discount_total - coupon_discount, 0)
-                coupon_info = {
-                    "coupon_name": cpn.coupon_name,
-                    "discount_type": cpn.discount_type.lower(),
-                    "discount_value": cpn.discount_value,
-                    "code": coupon_code.code,
-                }
+        cart_amount = quote.total_after_discount
+        discount, coupon_info = quote.discount, quote.coupon_info()
 
         data = {
             "order_amount": cart_amount,
-            "coupon_discount": coupon_discount,
+            "coupon_discount": discount,
             "coupon": coupon_info  # 없으면 null
         }
         if seat_count is not None:
@@ -183,6 +123,7 @@ class OrderPasswordVerifyView(APIView):
         }, status=200)
 
         
+    @buffered_broadcasts()
     def post(self, request):
         booth_id = request.headers.get('Booth-ID')
         password = request.data.get('password')
@@ -211,25 +152,24 @@ class OrderPasswordVerifyView(APIView):
         if not cart_id:
             return Response({"status": "error", "code": 400, "message": "cart_id가 필요합니다."}, status=400)
 
-        cart = Cart.objects.filter(id=cart_id, table__booth=booth, is_ordered=False).first()
+        # 장바구니 저장소 (CART_BACKEND) 에서 읽고, 주문 행은 여기서만 생성
+        store = get_cart_store()
+        cart = store.get(cart_id, booth_id=booth.pk)
         if not cart:
             return Response({"status": "error", "code": 404, "message": "주문 가능한 장바구니가 없습니다."}, status=404)
 
         table = cart.table
-        cart_menus = list(CartMenu.objects.filter(cart=cart))
-        cart_sets = list(CartSetMenu.objects.filter(cart=cart))
-        if not cart_menus and not cart_sets:
+        # 체크아웃은 캐시 없이 견적 계산 (금액은 place_order 가 잠근 행 기준으로 다시 계산)
+        quote = build_quote(cart)
+        if quote.missing:
+            return Response({"status": "error", "code": 400, "message": "존재하지 않는 메뉴가 포함되어 있습니다."}, status=400)
+        if quote.is_empty:
             return Response({"status": "error", "code": 400, "message": "장바구니가 비어 있습니다."}, status=400)
 
         # --- 첫 주문 seat_fee 강제 (PT/PP 공통) ---
-        if _is_first_session(table, now_dt) and manager.seat_type in ("PT", "PP"):
-            fee_menu = Menu.objects.filter(
-                booth=booth,
-                menu_category=SEAT_FEE_CATEGORY  # "seat_fee"
-            ).first()
-
+        if is_first_order(table) and manager.seat_type in ("PT", "PP"):
             # 장바구니에 seat_fee 포함 여부 검사
-            if not any(cm.menu_id == fee_menu.id for cm in cart_menus):
+            if not quote.has_seat_fee:
                 label = "테이블 이용료" if manager.seat_type == "PT" else "인당 이용료"
                 return Response(
                     {
@@ -243,69 +183,11 @@ class OrderPasswordVerifyView(APIView):
         # --- 주문 생성 ---
         try:
             with transaction.atomic():
-                order = Order.objects.create(
-                    table_id=table.id,
-                    order_amount=0,
-                )
-
-                subtotal, table_fee = 0, 0
-
-                # 일반 메뉴 처리
-                for cm in cart_menus:
-                    menu = get_object_or_404(Menu, pk=cm.menu_id)
-                    if menu.menu_amount < cm.quantity:
-                        raise ValueError(f"'{menu.menu_name}' 재고 부족")
-                    menu.menu_amount -= cm.quantity
-                    menu.save()
-
-                    OrderMenu.objects.create(
-                        order=order,
-                        menu=menu,
-                        quantity=cm.quantity,
-                        fixed_price=menu.menu_price,
-                        status="pending"
-                    )
-                    if menu.menu_category == SEAT_FEE_CATEGORY:
-                        table_fee += menu.menu_price * cm.quantity
-                    else:
-                        subtotal += menu.menu_price * cm.quantity
-
-                # 세트메뉴 처리
-                for cs in cart_sets:
-                    setmenu = get_object_or_404(SetMenu, pk=cs.set_menu_id)
-                    sm_items = SetMenuItem.objects.filter(set_menu_id=setmenu.pk)
-
-                    # 재고 확인
-                    for smi in sm_items:
-                        need = smi.quantity * cs.quantity
-                        if smi.menu.menu_amount < need:
-                            raise ValueError(f"세트 '{setmenu.set_name}' 구성 '{smi.menu.menu_name}' 재고 부족")
-
-                    # 재고 차감
-                    for smi in sm_items:
-                        need = smi.quantity * cs.quantity
-                        smi.menu.menu_amount -= need
-                        smi.menu.save()
-
-                    osm = OrderSetMenu.objects.create(
-                        order=order,
-                        set_menu=setmenu,
-                        quantity=cs.quantity,
-                        fixed_price=setmenu.set_price,
-                        status="pending"
-                    )
-                    for smi in sm_items:
-                        OrderMenu.objects.create(
-                            order=order,
-                            menu=smi.menu,
-                            quantity=smi.quantity * cs.quantity,
-                            fixed_price=smi.menu.menu_price,
-                            ordersetmenu=osm
-                        )
-                    subtotal += setmenu.set_price * cs.quantity
+                # 재고 잠금/차감 + 주문 행 일괄 생성
+                order, subtotal, table_fee = place_order(table, list(quote.cart_menus), list(quote.cart_sets))
 
                 # --- 쿠폰 확정 처리 ---
-                coupon_discount, applied_coupon_code = 0, None
+                discount, applied_coupon_code = 0, None
                 if coupon_code_input:
                     CouponCode.objects.filter(
                         issued_to_table=table,
@@ -320,12 +202,7 @@ class OrderPasswordVerifyView(APIView):
 
                     if coupon_code:
                         cpn = coupon_code.coupon
-                        pre_discount_total = subtotal + table_fee
-
-                        if cpn.discount_type.lower() == "percent":
-                            coupon_discount = min(int(pre_discount_total * cpn.discount_value / 100), pre_discount_total)
-                        else:
-                            coupon_discount = min(int(cpn.discount_value), pre_discount_total)
+                        discount = coupon_discount(cpn, subtotal + table_fee)
 
                         coupon_code.used_at = now_dt
                         coupon_code.issued_to_table = None
@@ -338,30 +215,32 @@ class OrderPasswordVerifyView(APIView):
 
                         applied_coupon_code = coupon_code.code
 
-                total_price = subtotal + table_fee - coupon_discount
+                total_price = subtotal + table_fee - discount
                 if total_price < 0:
                     total_price = 0
 
                 order.order_amount = total_price
-                order.save()
+                order.save(update_fields=["order_amount"])
 
-                booth.total_revenues = (booth.total_revenues or 0) + total_price
-                booth.save()
+                # 동시 주문에도 누락되지 않도록 DB 에서 누적
+                Booth.objects.filter(pk=booth.pk).update(
+                    total_revenues=Coalesce(F("total_revenues"), 0.0) + total_price
+                )
+                booth.refresh_from_db(fields=["total_revenues"])
 
                 from order.utils.order_broadcast import broadcast_total_revenue
                 broadcast_total_revenue(booth.id, booth.total_revenues)
 
-                # 장바구니 비우기
-                CartMenu.objects.filter(cart=cart).delete()
-                CartSetMenu.objects.filter(cart=cart).delete()
-                cart.is_ordered = True
-                cart.save()
+                # 장바구니 비우기 (redis 백엔드는 이때 Cart 행으로 남김)
+                store.checkout(cart)
 
-                # 운영자 브로드캐스트
-                broadcast_order_update(order)
+                # 운영자 브로드캐스트 (새 항목 델타)
+                broadcast_order_created(order)
 
-                from statistic.utils import push_statistics
-                push_statistics(booth.id)
+                from statistic.counters import record_order_created
+                from statistic.utils import schedule_push_statistics
+                record_order_created(order)
+                schedule_push_statistics(booth.id)
 
                 return Response({
                     "status": "success",
@@ -372,7 +251,7 @@ class OrderPasswordVerifyView(APIView):
                         "order_amount": order.order_amount,
                         "subtotal": subtotal,
                         "table_fee": table_fee,
-                        "coupon_discount": coupon_discount,
+                        "coupon_discount": discount,
                         "coupon": applied_coupon_code,
                         "booth_total_revenues": booth.total_revenues,
                         "table_num": table.table_num,   # 응답에 table_num 추가
@@ -406,10 +285,9 @@ class TableOrderListView(APIView):
         if not table:
             return Response({"status": "error", "code": 404, "message": "해당 테이블을 찾을 수 없습니다."}, status=404)
 
-        activated_at = getattr(table, "activated_at", None)
-        # ✅ 활성화 시점 이후 주문만 조회, 없으면 주문 없음 처리
-        if activated_at:
-            valid_orders = Order.objects.filter(table=table, created_at__gte=activated_at)
+        # ✅ 진행 중인 세션 주문만 조회, 없으면 주문 없음 처리
+        if table.current_session_id:
+            valid_orders = Order.objects.filter(session_id=table.current_session_id)
         else:
             valid_orders = Order.objects.none()
 
@@ -494,12 +372,16 @@ class CallStaffAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        table = get_object_or_404(Table, booth_id=booth_id, table_num=table_num)
+        # 테이블 번호 → id 는 부스 컨텍스트 캐시에서
+        context = get_booth_context(booth_id)
+        table_id = context.table_id(table_num) if context else None
+        if not table_id:
+            raise Http404
 
         # DB 기록 남기기
         staff_call = StaffCall.objects.create(
-            booth_id=booth_id,
-            table=table,
+            booth_id=context.booth_id,
+            table_id=table_id,
             message=message
         )
 
@@ -508,7 +390,7 @@ class CallStaffAPIView(APIView):
             f"booth_{booth_id}_staff_calls",
             {
                 "type": "staff_call",
-                "tableNumber": table.table_num,
+                "tableNumber": int(table_num),
                 "boothId": booth_id,
                 "message": message,
                 "createdAt": staff_call.created_at.isoformat()  # 기록 시각도 같이 push
@@ -518,7 +400,7 @@ class CallStaffAPIView(APIView):
         return Response({
             "message": "직원 호출이 전송되었습니다.",
             "boothId": booth_id,
-            "tableNumber": table.table_num,
+            "tableNumber": int(table_num),
             "data": {
                 "message": message,
                 "createdAt": staff_call.created_at.isoformat()
@@ -0,0 +1,92 @@
+"""
+웹소켓 컨슈머 / 미들웨어용 ORM 실행기
+
+sync_to_async(thread_sensitive=True) 는 모든 연결의 ORM 작업을 스레드 하나에 줄 세움
+→ 태블릿 수십 대가 한꺼번에 재접속하면 snapshot 조회가 차례로 밀림
+
+- 전용 스레드 풀 (CONSUMER_DB_WORKERS 개) 에서 실행 → 연결 간 병렬 처리
+  DB 커넥션 수 상한도 이 값으로 묶임
+- 부스별 동시 실행 상한 (CONSUMER_DB_PER_BOOTH) → 한 부스의 재접속 폭주가 풀을 독점하지 않음
+- 매 호출 전후 close_old_connections (HTTP 요청 한 번과 같은 커넥션 수명)
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 이벤트 루프별 {booth_id: Semaphore} (세마포어는 루프에 묶이므로 루프마다 따로)
+_booth_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "CONSUMER_DB_WORKERS", 16),
+                    thread_name_prefix="consumer-db",
+                )
+    return _executor
+
+
+def _booth_semaphore(booth_id):
+    loop = asyncio.get_running_loop()
+    semaphores = _booth_semaphores.setdefault(loop, {})
+    if booth_id not in semaphores:
+        semaphores[booth_id] = asyncio.Semaphore(getattr(settings, "CONSUMER_DB_PER_BOOTH", 4))
+    return semaphores[booth_id]
+
+
+def _call(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, booth_id=None, **kwargs):
+    """
+    동기 ORM 함수를 풀 스레드에서 실행하고 결과를 기다림
+    booth_id 가 있으면 부스별 동시 실행 상한 적용
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_call, func, args, kwargs)
+    if booth_id is None:
+        return await loop.run_in_executor(get_executor(), call)
+    async with _booth_semaphore(booth_id):
+        return await loop.run_in_executor(get_executor(), call)
+
+
+def db_task(func=None, *, booth_arg=None):
+    """
+    run_db 로 실행되는 async 함수로 감싸는 데코레이터
+    booth_arg: 부스 상한을 적용할 인자 이름 (booth 객체 또는 id)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            booth_id = None
+            if booth_arg is not None:
+                bound = _bind(func, args, kwargs)
+                booth = bound.get(booth_arg)
+                booth_id = getattr(booth, "id", booth)
+            return await run_db(func, *args, booth_id=booth_id, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _bind(func, args, kwargs):
+    return inspect.signature(func).bind_partial(*args, **kwargs).arguments
@@ -0,0 +1,115 @@
+"""
+운영자 JWT claims + 요청 단위 운영자 조회
+
+- 로그인/회원가입 토큰에 booth_id, is_manager claim 을 넣음 (refresh → access 재발급 시에도 복사됨)
+- BoothClaimAuthentication: claim 이 있는 토큰이면 User 조회 없이 ManagerTokenUser 로 인증
+  조회 API 전용 (OrderListView / CookQueueView / TableListView / TableDetailView / StaffCallListAPIView),
+  claim 이 없는 예전 토큰은 기존처럼 DB 조회
+  조리 / 서빙 완료, 취소, 초기화 등 변경 API 는 기본 JWTAuthentication (DB 의 User.is_active / Manager) 그대로
+  → 비활성화 / 삭제된 운영자는 access 토큰이 남아 있어도 변경 불가
+- get_request_booth_id / get_request_manager / get_request_booth:
+  요청 하나에서 운영자/부스 조회를 한 번만 (request 에 보관)
+"""
+import jwt
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BOOTH_ID_CLAIM = "booth_id"
+MANAGER_CLAIM = "is_manager"
+
+
+def issue_manager_tokens(user, booth_id) -> RefreshToken:
+    """booth_id / is_manager claim 을 담은 refresh 토큰 (access_token 도 같은 claim)"""
+    refresh = RefreshToken.for_user(user)
+    refresh[BOOTH_ID_CLAIM] = booth_id
+    refresh[MANAGER_CLAIM] = True
+    return refresh
+
+
+def has_manager_claims(token) -> bool:
+    return bool(token.get(MANAGER_CLAIM)) and token.get(BOOTH_ID_CLAIM) is not None
+
+
+class ManagerTokenUser(TokenUser):
+    """토큰 claim 만으로 만든 운영자 (DB 조회 없음)"""
+
+    @cached_property
+    def booth_id(self):
+        return self.token[BOOTH_ID_CLAIM]
+
+    @cached_property
+    def is_manager(self):
+        return bool(self.token.get(MANAGER_CLAIM))
+
+    @cached_property
+    def manager_profile(self):
+        # claim 으로 충분하지 않은 코드 경로용 (없으면 AttributeError → hasattr 호환)
+        from manager.models import Manager
+
+        try:
+            return Manager.objects.select_related("booth").get(user_id=self.id)
+        except Manager.DoesNotExist:
+            raise AttributeError("manager_profile")
+
+
+class BoothClaimAuthentication(JWTAuthentication):
+    """운영자 claim 이 있는 access 토큰은 User 조회 없이 인증"""
+
+    def get_user(self, validated_token):
+        if has_manager_claims(validated_token):
+            return ManagerTokenUser(validated_token)
+        return super().get_user(validated_token)
+
+
+def user_from_payload(payload):
+    """웹소켓용: claim 이 있으면 ManagerTokenUser, 없으면 None (호출부에서 DB 조회)"""
+    if has_manager_claims(payload):
+        return ManagerTokenUser(payload)
+    return None
+
+
+def decode_token(token: str) -> dict:
+    """서명/만료 검증 (실패 시 jwt.InvalidTokenError)"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+
+
+# ---------------------------------------------------------------- 요청 단위 조회
+
+def get_request_manager(request):
+    """요청 사용자의 Manager (+booth) - 요청당 DB 조회 1회, 운영자가 아니면 None"""
+    if not hasattr(request, "_request_manager"):
+        from manager.models import Manager
+
+        user = request.user
+        manager = None
+        if user and user.is_authenticated:
+            manager = Manager.objects.select_related("booth").filter(user_id=user.pk).first()
+        request._request_manager = manager
+    return request._request_manager
+
+
+def get_request_booth_id(request):
+    """요청 사용자의 부스 id - 토큰 claim 이 있으면 DB 조회 없음"""
+    booth_id = getattr(request.user, "booth_id", None)
+    if booth_id is not None:
+        return booth_id
+    manager = get_request_manager(request)
+    return manager.booth_id if manager else None
+
+
+def get_request_booth(request):
+    """요청 사용자의 Booth 행 - claim 사용자는 Booth 만, 아니면 Manager 와 함께 1회 조회"""
+    if not hasattr(request, "_request_booth"):
+        from booth.models import Booth
+
+        booth_id = getattr(request.user, "booth_id", None)
+        if booth_id is not None:
+            booth = Booth.objects.filter(pk=booth_id).first()
+        else:
+            manager = get_request_manager(request)
+            booth = manager.booth if manager else None
+        request._request_booth = booth
+    return request._request_booth
@@ -1,25 +1,41 @@
-import jwt
 from channels.middleware import BaseMiddleware
-from asgiref.sync import sync_to_async
-from django.conf import settings
+from project.async_db import db_task
+from project.auth import decode_token, user_from_payload
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs
 import logging
 
 logger = logging.getLogger(__name__)
 
-@sync_to_async(thread_sensitive=True)
-def get_user_from_token(token: str):
+@db_task
+def get_user_by_id(user_id):
+    User = get_user_model()
     try:
-        User = get_user_model()
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user = User.objects.get(id=payload["user_id"])
-        logger.debug(f"[JWTAuthMiddleware] JWT decoded → user={user}")
-        return user
+        return User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        logger.warning(f"[JWTAuthMiddleware] No user for id {user_id}")
+        return None
+
+
+async def get_user_from_token(token: str):
+    """
+    운영자 claim (booth_id) 이 있는 토큰은 DB 조회 없이 ManagerTokenUser
+    예전 토큰은 User 조회
+    """
+    try:
+        payload = decode_token(token)
     except Exception as e:
         logger.error(f"[JWTAuthMiddleware] Invalid token: {e}", exc_info=True)
         return None
 
+    user = user_from_payload(payload)
+    if user is not None:
+        logger.debug(f"[JWTAuthMiddleware] JWT claims → user={user}, booth={user.booth_id}")
+        return user
+    user = await get_user_by_id(payload.get("user_id"))
+    logger.debug(f"[JWTAuthMiddleware] JWT decoded → user={user}")
+    return user
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
@@ -108,6 +108,56 @@ CHANNEL_LAYERS = {
     },
 }
 
+# 부스 단위 공유 상태 (주문 이벤트 시퀀스/재전송 로그 등) → 프로세스 간 공유를 위해 Redis 사용
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env('CACHE_URL', default='redis://127.0.0.1:6379/1'),
+    }
+}
+
+# 주문 웹소켓 재연결 시 재전송할 이벤트 수 (부스별, 초과 시 ORDER_SNAPSHOT 으로 대체)
+ORDER_EVENT_LOG_SIZE = env.int('ORDER_EVENT_LOG_SIZE', default=500)
+
+# 통계 push 병합 구간 (ms, 0 이면 요청마다 즉시 계산/전송)
+STATISTICS_PUSH_WINDOW_MS = env.int('STATISTICS_PUSH_WINDOW_MS', default=500)
+
+# 메뉴 재고 캐시 미러 보관 시간 (초, 원본은 Menu.menu_amount)
+MENU_STOCK_CACHE_TTL = env.int('MENU_STOCK_CACHE_TTL', default=60)
+
+# 웹소켓 컨슈머 ORM 스레드 풀 크기 / 부스별 동시 실행 상한 (project/async_db.py)
+CONSUMER_DB_WORKERS = env.int('CONSUMER_DB_WORKERS', default=16)
+CONSUMER_DB_PER_BOOTH = env.int('CONSUMER_DB_PER_BOOTH', default=4)
+
+# 웹소켓 접속 snapshot (주문/테이블/통계) 보관 시간 (ms) - 동시 접속은 계산 1회 공유
+SNAPSHOT_CACHE_TTL_MS = env.int('SNAPSHOT_CACHE_TTL_MS', default=2000)
+
+# 웹소켓 브로드캐스트 프레임 직렬화 ("orjson": 설치되어 있으면 사용 / "json": 표준 라이브러리)
+WS_FRAME_ENCODER = env('WS_FRAME_ENCODER', default='orjson')
+
+# 주방 조리 대기열 웹소켓 갱신 병합 구간 (ms) - 주문 이벤트가 몰려도 구간당 한 번 전송
+COOK_QUEUE_PUSH_DEBOUNCE_MS = env.int('COOK_QUEUE_PUSH_DEBOUNCE_MS', default=300)
+
+# 테이블 이용 시간 타이머 휠 (booth/utils/table_timer.py)
+# 만료 임박 / 만료 시각에 TABLE_STATUS_UPDATE push, TABLE_AUTO_EXPIRE 면 만료 테이블 자동 초기화
+# 전용 워커로 실행: python manage.py run_timer_worker
+TABLE_TIMER_ENABLED = env.bool('TABLE_TIMER_ENABLED', default=True)
+TABLE_TIMER_TICK_SECONDS = env.float('TABLE_TIMER_TICK_SECONDS', default=1.0)
+TABLE_TIMER_SLOTS = env.int('TABLE_TIMER_SLOTS', default=3600)
+TABLE_EXPIRY_WARNING_MINUTES = env.int('TABLE_EXPIRY_WARNING_MINUTES', default=10)
+TABLE_AUTO_EXPIRE = env.bool('TABLE_AUTO_EXPIRE', default=False)
+
+# 장바구니 저장소 (cart/utils/cart_store.py) - "orm": Cart 행 / "redis": Redis 해시 (체크아웃 때만 Cart 행)
+CART_BACKEND = env('CART_BACKEND', default='orm')
+CART_REDIS_URL = env('CART_REDIS_URL', default=env('CACHE_URL', default='redis://127.0.0.1:6379/1'))
+CART_TTL_SECONDS = env.int('CART_TTL_SECONDS', default=60 * 60 * 6)
+# 장바구니 견적 캐시 (cart/utils/cart_quote.py, 장바구니 버전별) - 0 이면 사용 안 함
+CART_QUOTE_CACHE_TTL = env.int('CART_QUOTE_CACHE_TTL', default=5)
+# 버려진 장바구니 정리 (cart/utils/cart_sweeper.py, 관리 명령 sweep_carts 를 cron 으로)
+# 주기 Task 는 run_timer_worker 에서 CART_SWEEP_INTERVAL_SECONDS 마다 - 0 이면 사용 안 함
+CART_SWEEP_CHUNK_SIZE = env.int('CART_SWEEP_CHUNK_SIZE', default=5000)
+CART_SWEEP_INTERVAL_SECONDS = env.int('CART_SWEEP_INTERVAL_SECONDS', default=0)
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
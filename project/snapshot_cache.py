@@ -0,0 +1,137 @@
+"""
+웹소켓 접속 snapshot 단일 계산 캐시 (주문 / 테이블 현황 / 통계)
+
+태블릿 여러 대가 한꺼번에 재접속하면 같은 부스 snapshot 을 접속 수만큼 다시 계산함
+- 같은 (종류, 부스) 를 동시에 요청하면 먼저 온 요청 하나만 계산하고 나머지는 그 결과를 기다림
+- 계산 결과는 프로세스 메모리에 SNAPSHOT_CACHE_TTL_MS 동안 보관
+- 무효화는 세대 번호 (캐시 키 snapshot_gen:{종류}:{부스}) +1
+  브로드캐스트 헬퍼가 group_send 직전에 올림 → 다른 프로세스의 보관분도 다음 조회 때 버려짐
+  계산 도중 세대가 바뀌면 그 결과는 이전 세대로 저장되어 다시 쓰이지 않음
+- 캐시 장애 시 세대를 모르므로 보관/합류 없이 바로 계산
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+from project.async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_entries = {}  # (kind, booth_id) → (expires_at, generation, value)
+_metrics = {"hit": 0, "miss": 0, "coalesced": 0, "invalidated": 0}
+
+# 이벤트 루프별 {(kind, booth_id, generation): 계산 Task} (Task 는 루프에 묶이므로 루프마다 따로)
+_inflight = weakref.WeakKeyDictionary()
+
+
+def get_snapshot_metrics() -> dict:
+    """hit: 보관분 사용 / miss: 직접 계산 / coalesced: 진행 중인 계산에 합류 / invalidated: 무효화 횟수"""
+    with _lock:
+        return dict(_metrics)
+
+
+def _count(name):
+    with _lock:
+        _metrics[name] += 1
+
+
+def _ttl():
+    return getattr(settings, "SNAPSHOT_CACHE_TTL_MS", 2000) / 1000
+
+
+def _generation_key(kind, booth_id):
+    return f"snapshot_gen:{kind}:{booth_id}"
+
+
+def _generation(kind, booth_id):
+    try:
+        return cache.get(_generation_key(kind, booth_id), 0)
+    except Exception:
+        logger.warning(f"snapshot generation unavailable for {kind} booth {booth_id}", exc_info=True)
+        return None
+
+
+def invalidate_snapshot(booth_id, kind):
+    """부스의 kind snapshot 무효화 (브로드캐스트 헬퍼에서 호출)"""
+    _count("invalidated")
+    with _lock:
+        _entries.pop((kind, booth_id), None)
+    try:
+        key = _generation_key(kind, booth_id)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        logger.warning(f"snapshot invalidation failed for {kind} booth {booth_id}", exc_info=True)
+
+
+def _lookup(kind, booth_id, generation):
+    with _lock:
+        entry = _entries.get((kind, booth_id))
+    if entry is None:
+        return None
+    expires_at, entry_generation, value = entry
+    if entry_generation != generation or expires_at <= time.monotonic():
+        return None
+    return entry
+
+
+def _store(kind, booth_id, generation, value):
+    # 늦게 끝난 이전 세대 결과가 덮어써도 조회 시 세대가 달라 쓰이지 않음
+    with _lock:
+        _entries[(kind, booth_id)] = (time.monotonic() + _ttl(), generation, value)
+
+
+def _peek(kind, booth_id):
+    """(세대, 보관분) - 세대 조회와 보관분 확인을 풀 스레드 한 번에"""
+    generation = _generation(kind, booth_id)
+    if generation is None:
+        return None, None
+    return generation, _lookup(kind, booth_id, generation)
+
+
+async def get_snapshot(kind, booth_id, compute):
+    """
+    부스 snapshot 조회 - compute(booth_id) 는 동기 ORM 함수 (풀 스레드에서 실행)
+    반환값은 여러 연결이 같이 쓰므로 호출부에서 수정하지 않음
+    """
+    generation, entry = await run_db(_peek, kind, booth_id)
+    if generation is None:
+        _count("miss")
+        return await run_db(compute, booth_id, booth_id=booth_id)
+    if entry is not None:
+        _count("hit")
+        return entry[2]
+
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.setdefault(loop, {})
+    key = (kind, booth_id, generation)
+    task = inflight.get(key)
+    if task is not None:
+        _count("coalesced")
+        return await asyncio.shield(task)
+
+    _count("miss")
+    task = loop.create_task(_compute(kind, booth_id, generation, compute))
+    inflight[key] = task
+    task.add_done_callback(lambda done: _finish(inflight, key, done))
+    # 먼저 온 연결이 끊겨도 (취소) 계산은 계속 → 합류한 연결들은 결과를 받음
+    return await asyncio.shield(task)
+
+
+async def _compute(kind, booth_id, generation, compute):
+    value = await run_db(compute, booth_id, booth_id=booth_id)
+    _store(kind, booth_id, generation, value)
+    return value
+
+
+def _finish(inflight, key, task):
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        task.exception()  # 기다리는 연결이 모두 끊긴 경우 "never retrieved" 경고 방지
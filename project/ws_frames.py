@@ -0,0 +1,49 @@
+"""
+웹소켓 브로드캐스트 프레임 직렬화
+
+group_send 한 번에 그룹의 모든 연결이 같은 dict 를 각자 json.dumps 하던 구조
+→ 보내는 쪽 (broadcast 헬퍼 / push_statistics) 에서 클라이언트 프레임을 한 번만 직렬화해
+  메시지의 "frame" 에 싣고, 컨슈머는 그대로 전달
+- orjson 사용 (requirements.txt), 설치되어 있지 않거나 WS_FRAME_ENCODER="json" 이면 표준 json
+- ASGI 텍스트 프레임은 str 이므로 UTF-8 JSON 문자열로 보관
+- group 메시지에는 라우팅 필드 (type, seq) + frame 만 → channel layer 가 msgpack 으로 싣는 양도 한 벌
+  frame 이 없는 메시지 (이전 버전 프로세스) 는 컨슈머가 받은 dict 로 직접 직렬화 (event_frame)
+"""
+import json
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+
+def _use_orjson():
+    return orjson is not None and getattr(settings, "WS_FRAME_ENCODER", "orjson") == "orjson"
+
+
+def encode_frame(payload) -> str:
+    """클라이언트로 보낼 JSON 텍스트 프레임"""
+    if _use_orjson():
+        # 정수 키 dict 도 json.dumps 처럼 문자열 키로
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+ROUTING_FIELDS = ("type", "seq")
+
+
+def with_frame(message: dict, payload) -> dict:
+    """group 으로 보낼 메시지: 라우팅 필드 + 직렬화한 프레임 (data / events 등 본문은 싣지 않음)"""
+    routed = {key: message[key] for key in ROUTING_FIELDS if key in message}
+    routed["frame"] = encode_frame(payload)
+    return routed
+
+
+def event_frame(event: dict, build) -> str:
+    """메시지에 실린 프레임, 없으면 build(event) 를 직접 직렬화"""
+    frame = event.get("frame")
+    if frame is not None:
+        return frame
+    return encode_frame(build(event))
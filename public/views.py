@@ -6,6 +6,7 @@ from rest_framework.permissions import AllowAny
 
 from booth.models import Booth, Table
 from menu.models import Menu, SetMenu  # ✅ 세트 모델 import
+from menu.utils.menu_stock import set_capacity
 
 
 
@@ -36,20 +37,10 @@ def compute_set_remaining(set_menu: SetMenu) -> int:
     """
     # menu_items는 FK related_name='menu_items'
     items = list(set_menu.menu_items.all())
-    if not items:
-        return 0
-    caps = []
-    for item in items:
-        req = int(item.quantity or 0)
-        amt = getattr(item.menu, "menu_amount", None)
-        if req <= 0 or amt is None:
-            return 0
-        try:
-            amt = int(amt)
-        except (TypeError, ValueError):
-            return 0
-        caps.append(amt // req)
-    return min(caps) if caps else 0
+    return set_capacity(
+        [(item.menu_id, int(item.quantity or 0)) for item in items],
+        {item.menu_id: int(item.menu.menu_amount or 0) for item in items},
+    )
 
 class BoothOverviewView(APIView):
     permission_classes = [AllowAny]
@@ -1,7 +1,9 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
-from statistic.utils import get_statistics
+from project.async_db import run_db
+from project.snapshot_cache import get_snapshot
+from project.ws_frames import event_frame
+from statistic.utils import get_statistics, statistics_frame
 from manager.models import Manager
 
 class StatisticConsumer(AsyncWebsocketConsumer):
@@ -10,23 +12,23 @@ class StatisticConsumer(AsyncWebsocketConsumer):
         if not user or not user.is_authenticated:
             return await self.close(code=4001)
 
-        manager = await sync_to_async(Manager.objects.select_related("booth").get)(user=user)
-        self.booth_id = manager.booth.id
+        # 토큰에 booth_id claim 이 있으면 DB 조회 없음 (project/auth.py)
+        self.booth_id = getattr(user, "booth_id", None)
+        if self.booth_id is None:
+            manager = await run_db(Manager.objects.select_related("booth").get, user=user)
+            self.booth_id = manager.booth.id
         self.room_group_name = f"booth_{self.booth_id}_statistics"
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
         # 초기 통계 전달
-        stats = await sync_to_async(get_statistics)(self.booth_id)
+        stats = await get_snapshot("statistics", self.booth_id, get_statistics)
         await self.send(text_data=json.dumps({"type": "INIT_STATISTICS", "data": stats}))
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     async def statistics_update(self, event):
-        """다른 API/Consumer에서 push하는 통계 이벤트"""
-        await self.send(text_data=json.dumps({
-            "type": "STATISTICS_UPDATED",
-            "data": event["data"]
-        }))
\ No newline at end of file
+        """다른 API/Consumer에서 push하는 통계 이벤트 (push_statistics 에서 직렬화한 frame 전달)"""
+        await self.send(text_data=event_frame(event, statistics_frame))
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+부스 통계 증분 카운터
+
+주문 생성/서빙/되돌리기/취소, 테이블 사용 기록 이벤트마다 BoothStatistic 한 행만 갱신한다.
+카운터 행이 없으면 그 시점의 DB 상태로 전체 집계(build_counters)해서 만든다.
+정합성은 statistic.utils.reconcile_statistics (manage.py reconcile_statistics) 로 주기 점검.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncMinute
+from django.utils import timezone
+
+from booth.models import TableUsage
+from order.models import Order, OrderMenu
+from statistic.models import BoothStatistic
+
+SEAT_FEE_CATEGORY = "seat_fee"
+SEAT_CATEGORIES = ["seat", "seat_fee"]          # 서빙/대기/대기시간 집계 제외
+TOP_MENU_EXCLUDED = ["seat_fee", "음료"]         # TOP3 집계 제외
+RECENT_WINDOW = timedelta(hours=1)
+BUCKET_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def _bucket_key(dt):
+    return dt.strftime(BUCKET_FORMAT)
+
+
+def _empty_bucket():
+    return {"orders": 0, "seat_fee_quantity": 0, "seat_fee_tables": []}
+
+
+def wait_seconds(category, created_at, cooked_at, served_at):
+    """대기 시간(초): 음료는 cooked_at, 일반 메뉴는 created_at 부터 served_at 까지"""
+    start = cooked_at if category == "음료" else created_at
+    if start and served_at and served_at > start:
+        return (served_at - start).total_seconds()
+    return None
+
+
+# ---------------------------------------------------------------------------
+# 전체 집계 (초기 생성 / 재구축)
+# ---------------------------------------------------------------------------
+
+def build_counters(booth_id: int, now=None) -> dict:
+    """현재 DB 상태로 BoothStatistic 필드 값을 계산 (주문 이력 전체 스캔)"""
+    now = now or timezone.now()
+    orders = Order.objects.filter(table__booth_id=booth_id)
+    live_orders = orders.exclude(order_status="cancelled")
+    order_menus = OrderMenu.objects.filter(order__table__booth_id=booth_id)
+    live_menus = order_menus.exclude(order__order_status="cancelled")
+    seat_fee_menus = live_menus.filter(menu__menu_category=SEAT_FEE_CATEGORY)
+
+    first = orders.order_by("created_at").values_list("created_at", flat=True).first()
+
+    wait_time_sum, wait_time_count = 0.0, 0
+    served_rows = (
+        live_menus.filter(status="served")
+        .exclude(menu__menu_category__in=SEAT_CATEGORIES)
+        .values_list("menu__menu_category", "created_at", "cooked_at", "served_at")
+    )
+    for category, created_at, cooked_at, served_at in served_rows:
+        seconds = wait_seconds(category, created_at, cooked_at, served_at)
+        if seconds is not None:
+            wait_time_sum += seconds
+            wait_time_count += 1
+
+    menu_quantities = {
+        str(row["menu_id"]): row["total"]
+        for row in order_menus.exclude(menu__menu_category__in=TOP_MENU_EXCLUDED)
+        .values("menu_id").annotate(total=Sum("quantity"))
+        if row["total"]
+    }
+
+    day_revenues = {
+        row["day"].isoformat(): row["total"] or 0
+        for row in live_orders.annotate(day=TruncDate("created_at"))
+        .values("day").annotate(total=Sum("order_amount"))
+    }
+
+    # 최근 1시간 버킷
+    since = now - RECENT_WINDOW
+    recent_buckets = {}
+    for row in (
+        live_orders.filter(created_at__gte=since)
+        .annotate(minute=TruncMinute("created_at"))
+        .values("minute").annotate(count=Count("id"))
+    ):
+        recent_buckets.setdefault(_bucket_key(row["minute"]), _empty_bucket())["orders"] = row["count"]
+    for row in (
+        seat_fee_menus.filter(order__created_at__gte=since)
+        .annotate(minute=TruncMinute("order__created_at"))
+        .values("minute", "order__table_id").annotate(total=Sum("quantity"))
+    ):
+        bucket = recent_buckets.setdefault(_bucket_key(row["minute"]), _empty_bucket())
+        bucket["seat_fee_quantity"] += row["total"] or 0
+        if row["order__table_id"] not in bucket["seat_fee_tables"]:
+            bucket["seat_fee_tables"].append(row["order__table_id"])
+
+    usage = TableUsage.objects.filter(booth_id=booth_id).aggregate(
+        total=Sum("usage_minutes"), count=Count("id")
+    )
+
+    return {
+        "total_orders": live_orders.count(),
+        "first_order_at": first,
+        "seat_fee_quantity": seat_fee_menus.aggregate(total=Sum("quantity"))["total"] or 0,
+        "seat_fee_tables": sorted(set(seat_fee_menus.values_list("order__table_id", flat=True))),
+        "served_count": live_menus.filter(status="served")
+        .exclude(menu__menu_category__in=SEAT_CATEGORIES).count(),
+        "waiting_count": live_menus.filter(status__in=["pending", "cooked"])
+        .exclude(menu__menu_category__in=SEAT_CATEGORIES).count(),
+        "wait_time_sum": wait_time_sum,
+        "wait_time_count": wait_time_count,
+        "menu_quantities": menu_quantities,
+        "day_revenues": day_revenues,
+        "recent_buckets": recent_buckets,
+        "usage_minutes_sum": usage["total"] or 0,
+        "usage_count": usage["count"],
+    }
+
+
+def rebuild_booth_statistic(booth_id: int) -> BoothStatistic:
+    stat, _ = BoothStatistic.objects.update_or_create(
+        booth_id=booth_id, defaults=build_counters(booth_id)
+    )
+    return stat
+
+
+def get_booth_statistic(booth_id: int) -> BoothStatistic:
+    """카운터 행 조회 (없으면 전체 집계로 생성)"""
+    stat = BoothStatistic.objects.filter(booth_id=booth_id).first()
+    if stat is None:
+        try:
+            with transaction.atomic():
+                stat = rebuild_booth_statistic(booth_id)
+        except IntegrityError:
+            stat = BoothStatistic.objects.get(booth_id=booth_id)
+    return stat
+
+
+def reset_booth_statistic(booth_id: int):
+    """부스 기록 초기화 시 카운터 제거 (다음 조회 때 다시 집계)"""
+    BoothStatistic.objects.filter(booth_id=booth_id).delete()
+
+
+def summarize_recent(stat: BoothStatistic, now=None) -> dict:
+    """최근 1시간 버킷 합산 (분 단위 정밀도)"""
+    since_key = _bucket_key((now or timezone.now()) - RECENT_WINDOW)
+    orders, seat_fee_quantity, seat_fee_tables = 0, 0, set()
+    for key, bucket in stat.recent_buckets.items():
+        if key < since_key:
+            continue
+        orders += bucket["orders"]
+        seat_fee_quantity += bucket["seat_fee_quantity"]
+        seat_fee_tables.update(bucket["seat_fee_tables"])
+    return {
+        "orders": orders,
+        "seat_fee_quantity": seat_fee_quantity,
+        "seat_fee_tables": len(seat_fee_tables),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 증분 갱신
+# ---------------------------------------------------------------------------
+
+def _apply(booth_id: int, mutate):
+    """
+    카운터 행을 잠그고 mutate(stat) 적용
+    행이 없으면 현재 트랜잭션 기준으로 전체 집계해서 생성 (이번 변경도 이미 포함되므로 mutate 생략)
+    """
+    with transaction.atomic():
+        stat = BoothStatistic.objects.select_for_update().filter(booth_id=booth_id).first()
+        if stat is None:
+            try:
+                with transaction.atomic():
+                    rebuild_booth_statistic(booth_id)
+                return
+            except IntegrityError:
+                stat = BoothStatistic.objects.select_for_update().get(booth_id=booth_id)
+
+        mutate(stat)
+
+        # 1시간 지난 버킷 정리
+        since_key = _bucket_key(timezone.now() - RECENT_WINDOW)
+        stat.recent_buckets = {k: v for k, v in stat.recent_buckets.items() if k >= since_key}
+        stat.save()
+
+
+def _add_menu_quantity(stat, menu_id, delta):
+    key = str(menu_id)
+    total = stat.menu_quantities.get(key, 0) + delta
+    if total > 0:
+        stat.menu_quantities[key] = total
+    else:
+        stat.menu_quantities.pop(key, None)
+
+
+def record_order_created(order: Order):
+    """주문 생성 (OrderMenu 생성 및 order_amount 확정 이후 호출)"""
+    rows = list(
+        OrderMenu.objects.filter(order=order)
+        .values_list("menu_id", "menu__menu_category", "quantity")
+    )
+    table_id = order.table_id
+
+    def mutate(stat):
+        stat.total_orders += 1
+        if stat.first_order_at is None or order.created_at < stat.first_order_at:
+            stat.first_order_at = order.created_at
+
+        seat_fee_quantity = 0
+        for menu_id, category, quantity in rows:
+            if category == SEAT_FEE_CATEGORY:
+                seat_fee_quantity += quantity
+            if category not in SEAT_CATEGORIES:
+                stat.waiting_count += 1
+            if category not in TOP_MENU_EXCLUDED:
+                _add_menu_quantity(stat, menu_id, quantity)
+
+        has_seat_fee = any(category == SEAT_FEE_CATEGORY for _, category, _ in rows)
+        stat.seat_fee_quantity += seat_fee_quantity
+        if has_seat_fee and table_id not in stat.seat_fee_tables:
+            stat.seat_fee_tables.append(table_id)
+
+        day = order.created_at.date().isoformat()
+        stat.day_revenues[day] = stat.day_revenues.get(day, 0) + (order.order_amount or 0)
+
+        bucket = stat.recent_buckets.setdefault(_bucket_key(order.created_at), _empty_bucket())
+        bucket["orders"] += 1
+        bucket["seat_fee_quantity"] += seat_fee_quantity
+        if has_seat_fee and table_id not in bucket["seat_fee_tables"]:
+            bucket["seat_fee_tables"].append(table_id)
+
+    _apply(order.table.booth_id, mutate)
+
+
+def record_item_served(order_menu: OrderMenu):
+    """OrderMenu → served 전이"""
+    record_items_served(order_menu.order.table.booth_id, [order_menu])
+
+
+def record_items_served(booth_id: int, order_menus):
+    """여러 OrderMenu → served 전이 (일괄 서빙, 카운터 행 갱신 1회)"""
+    waits = [
+        wait_seconds(om.menu.menu_category, om.created_at, om.cooked_at, om.served_at)
+        for om in order_menus
+        if om.menu.menu_category not in SEAT_CATEGORIES
+    ]
+    if not waits:
+        return
+
+    def mutate(stat):
+        stat.served_count += len(waits)
+        stat.waiting_count -= len(waits)
+        for seconds in waits:
+            if seconds is not None:
+                stat.wait_time_sum += seconds
+                stat.wait_time_count += 1
+
+    _apply(booth_id, mutate)
+
+
+def record_item_unserved(order_menu: OrderMenu, prev_cooked_at, prev_served_at):
+    """served → pending/cooked 되돌리기 (변경 전 타임스탬프 기준으로 대기시간 차감)"""
+    category = order_menu.menu.menu_category
+    if category in SEAT_CATEGORIES:
+        return
+    seconds = wait_seconds(category, order_menu.created_at, prev_cooked_at, prev_served_at)
+
+    def mutate(stat):
+        stat.served_count -= 1
+        stat.waiting_count += 1
+        if seconds is not None:
+            stat.wait_time_sum -= seconds
+            stat.wait_time_count -= 1
+
+    _apply(order_menu.order.table.booth_id, mutate)
+
+
+def record_items_cancelled(booth_id: int, cancelled_menus: list, refunds: list):
+    """
+    주문 항목 취소
+    cancelled_menus: [(order, menu, 취소 수량, 행 삭제 여부), ...]  (served 항목은 취소 불가)
+    refunds: [(order, 실제 차감된 order_amount), ...]
+    """
+    removed_seat_fee_tables = {
+        order.table_id for order, menu, _, deleted in cancelled_menus
+        if deleted and menu.menu_category == SEAT_FEE_CATEGORY
+    }
+    # 행이 삭제된 뒤에도 seat_fee 주문이 남아있는 테이블은 방문자 유지
+    still_seated = set(
+        OrderMenu.objects.filter(
+            order__table_id__in=removed_seat_fee_tables,
+            menu__menu_category=SEAT_FEE_CATEGORY,
+        ).values_list("order__table_id", flat=True)
+    ) if removed_seat_fee_tables else set()
+
+    def mutate(stat):
+        for order, menu, quantity, deleted in cancelled_menus:
+            category = menu.menu_category
+            if category not in TOP_MENU_EXCLUDED:
+                _add_menu_quantity(stat, menu.id, -quantity)
+            if category == SEAT_FEE_CATEGORY:
+                stat.seat_fee_quantity -= quantity
+                bucket = stat.recent_buckets.get(_bucket_key(order.created_at))
+                if bucket:
+                    bucket["seat_fee_quantity"] -= quantity
+            if deleted and category not in SEAT_CATEGORIES:
+                stat.waiting_count -= 1
+
+        gone = removed_seat_fee_tables - still_seated
+        if gone:
+            stat.seat_fee_tables = [t for t in stat.seat_fee_tables if t not in gone]
+            for bucket in stat.recent_buckets.values():
+                bucket["seat_fee_tables"] = [t for t in bucket["seat_fee_tables"] if t not in gone]
+
+        for order, amount in refunds:
+            day = order.created_at.date().isoformat()
+            stat.day_revenues[day] = stat.day_revenues.get(day, 0) - amount
+
+    _apply(booth_id, mutate)
+
+
+def record_table_usage(usage: TableUsage):
+    """TableUsage 로그 생성"""
+    record_table_usages(usage.booth_id, [usage])
+
+
+def record_table_usages(booth_id: int, usages: list):
+    """같은 부스 TableUsage 여러 건 (만료 테이블 일괄 초기화) - 카운터 행 갱신 1회"""
+    def mutate(stat):
+        stat.usage_minutes_sum += sum(usage.usage_minutes for usage in usages)
+        stat.usage_count += len(usages)
+
+    _apply(booth_id, mutate)
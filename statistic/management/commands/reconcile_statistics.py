@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from booth.models import Booth
+from statistic.utils import reconcile_statistics
+
+
+class Command(BaseCommand):
+    help = "부스 통계 카운터(BoothStatistic)를 주문 이력 전체 집계와 비교 (--fix 시 불일치 부스 재구축)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--booth", type=int, help="특정 부스만 점검")
+        parser.add_argument("--fix", action="store_true", help="불일치 시 카운터 재구축")
+
+    def handle(self, *args, **options):
+        booths = Booth.objects.filter(manager__isnull=False).order_by("id")
+        if options["booth"]:
+            booths = booths.filter(id=options["booth"])
+
+        mismatched = 0
+        for booth_id in booths.values_list("id", flat=True):
+            mismatches = reconcile_statistics(booth_id, fix=options["fix"])
+            if not mismatches:
+                continue
+            mismatched += 1
+            for key, (counted, scanned) in mismatches.items():
+                self.stdout.write(f"booth {booth_id} {key}: counter={counted} full_scan={scanned}")
+
+        if mismatched and options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{mismatched}개 부스 카운터 재구축"))
+        elif mismatched:
+            self.stdout.write(self.style.WARNING(f"{mismatched}개 부스 불일치"))
+        else:
+            self.stdout.write(self.style.SUCCESS("모든 부스 통계 일치"))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-17 21:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booth', '0008_booth_booth_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoothStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_orders', models.IntegerField(default=0)),
+                ('first_order_at', models.DateTimeField(blank=True, null=True)),
+                ('seat_fee_quantity', models.IntegerField(default=0)),
+                ('seat_fee_tables', models.JSONField(blank=True, default=list)),
+                ('served_count', models.IntegerField(default=0)),
+                ('waiting_count', models.IntegerField(default=0)),
+                ('wait_time_sum', models.FloatField(default=0.0)),
+                ('wait_time_count', models.IntegerField(default=0)),
+                ('menu_quantities', models.JSONField(blank=True, default=dict)),
+                ('day_revenues', models.JSONField(blank=True, default=dict)),
+                ('recent_buckets', models.JSONField(blank=True, default=dict)),
+                ('usage_minutes_sum', models.IntegerField(default=0)),
+                ('usage_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booth', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistic', to='booth.booth')),
+            ],
+        ),
+    ]
@@ -1,3 +1,47 @@
 from django.db import models
+from booth.models import Booth
 
-# Create your models here.
+
+class BoothStatistic(models.Model):
+    """
+    부스 통계 누적 카운터
+    주문 생성/서빙/취소, 테이블 사용 기록 시점에 증분 갱신되고
+    get_statistics 는 주문 이력 전체 대신 이 행을 읽음
+    (statistic.counters 참고)
+    """
+    booth = models.OneToOneField(Booth, on_delete=models.CASCADE, related_name="statistic")
+
+    # 빌지 기준 주문 수 (취소 제외) / 첫 주문 시각 (회전율 계산용)
+    total_orders = models.IntegerField(default=0)
+    first_order_at = models.DateTimeField(null=True, blank=True)
+
+    # 방문자: PP → seat_fee 수량 합, PT → seat_fee 를 주문한 테이블 id 목록
+    seat_fee_quantity = models.IntegerField(default=0)
+    seat_fee_tables = models.JSONField(default=list, blank=True)
+
+    # OrderMenu 상태별 행 수 (seat/seat_fee 제외)
+    served_count = models.IntegerField(default=0)
+    waiting_count = models.IntegerField(default=0)
+
+    # 평균 대기 시간 = wait_time_sum / wait_time_count (초)
+    wait_time_sum = models.FloatField(default=0.0)
+    wait_time_count = models.IntegerField(default=0)
+
+    # TOP3 메뉴용 {menu_id: 누적 수량} (seat_fee, 음료 제외)
+    menu_quantities = models.JSONField(default=dict, blank=True)
+
+    # 일자별 매출 {"2025-09-24": 금액}
+    day_revenues = models.JSONField(default=dict, blank=True)
+
+    # 최근 1시간 집계용 분 단위 버킷
+    # {"2025-09-24T12:31": {"orders": n, "seat_fee_quantity": m, "seat_fee_tables": [...]}}
+    recent_buckets = models.JSONField(default=dict, blank=True)
+
+    # TableUsage 누적 (평균 테이블 사용시간)
+    usage_minutes_sum = models.IntegerField(default=0)
+    usage_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"BoothStatistic - Booth {self.booth_id}"
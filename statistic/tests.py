@@ -1,3 +1,233 @@
-from django.test import TestCase
+import json
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from booth.models import Booth, Table
+from manager.models import Manager
+from menu.models import Menu
+from order.models import Order, OrderMenu
+from statistic.counters import record_order_created
+from statistic.models import BoothStatistic
+from statistic.utils import (
+    cancel_pending_pushes, get_push_metrics, get_statistics, get_statistics_full_scan, push_statistics,
+    reconcile_statistics, schedule_push_statistics,
+)
+
+User = get_user_model()
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix="dorder-test-media-")
+
+# 조회 시각에 따라 값이 달라지지 않는 키
+COMPARED_KEYS = [
+    "total_orders", "recent_orders", "visitors", "recent_visitors", "avg_wait_time",
+    "served_count", "waiting_count", "top3_menus", "low_stock",
+    "day1_revenue", "day2_revenue", "day3_revenue",
+]
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, MEDIA_ROOT=TEST_MEDIA_ROOT, STATISTICS_PUSH_WINDOW_MS=0)
+class StatisticCounterTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="mgr", password="pw")
+        self.booth = Booth.objects.create(
+            booth_name="테스트부스", event_dates=[timezone.now().date().isoformat()]
+        )
+        self.manager = Manager.objects.create(
+            user=self.user, booth=self.booth, table_num=2, order_check_password="1234",
+            account="123-456-789", bank="테스트은행", depositor="홍길동",
+            seat_type="PT", seat_tax_table=5000, table_limit_hours=120,
+        )
+        activated_at = timezone.now() - timedelta(minutes=30)
+        self.tables = [
+            Table.objects.create(booth=self.booth, table_num=i, status="activate", activated_at=activated_at)
+            for i in (1, 2)
+        ]
+        self.food = Menu.objects.create(
+            booth=self.booth, menu_name="떡볶이", menu_category="메뉴", menu_price=5000, menu_amount=100,
+        )
+        self.drink = Menu.objects.create(
+            booth=self.booth, menu_name="사이다", menu_category="음료", menu_price=2000, menu_amount=3,
+        )
+        self.seat_fee = Menu.objects.create(
+            booth=self.booth, menu_name="테이블 이용료", menu_category="seat_fee",
+            menu_price=5000, menu_amount=999999,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place_order(self, table, food_qty=2, with_seat_fee=True):
+        order = Order.objects.create(table=table, order_amount=0)
+        OrderMenu.objects.create(order=order, menu=self.food, quantity=food_qty, fixed_price=5000)
+        OrderMenu.objects.create(order=order, menu=self.drink, quantity=1, fixed_price=2000, status="cooked")
+        amount = food_qty * 5000 + 2000
+        if with_seat_fee:
+            OrderMenu.objects.create(order=order, menu=self.seat_fee, quantity=1, fixed_price=5000)
+            amount += 5000
+        order.order_amount = amount
+        order.save(update_fields=["order_amount"])
+        record_order_created(order)
+        return order
+
+    def assertMatchesFullScan(self):
+        counted = get_statistics(self.booth.id)
+        scanned = get_statistics_full_scan(self.booth.id)
+        self.assertEqual(
+            {k: counted[k] for k in COMPARED_KEYS},
+            {k: scanned[k] for k in COMPARED_KEYS},
+        )
+        return counted
+
+    def tearDown(self):
+        cancel_pending_pushes()
+
+    def test_order_created(self):
+        self.place_order(self.tables[0])
+        self.place_order(self.tables[0], with_seat_fee=False)
+        self.place_order(self.tables[1], food_qty=1)
+
+        stats = self.assertMatchesFullScan()
+        self.assertEqual(stats["total_orders"], 3)
+        self.assertEqual(stats["visitors"], 2)
+        self.assertEqual(stats["waiting_count"], 6)
+        self.assertEqual(stats["top3_menus"][0]["total_quantity"], 5)
+        self.assertEqual(stats["day1_revenue"], 17000 + 12000 + 12000)
+
+    def test_serve_and_revert(self):
+        order = self.place_order(self.tables[0])
+        food = OrderMenu.objects.get(order=order, menu=self.food)
+        drink = OrderMenu.objects.get(order=order, menu=self.drink)
+        OrderMenu.objects.filter(pk=food.pk).update(status="cooked")
+
+        for om in (food, drink):
+            res = self.client.post("/api/v2/booth/serving/orders/", {"type": "menu", "id": om.id}, format="json")
+            self.assertEqual(res.status_code, 200)
+        stats = self.assertMatchesFullScan()
+        self.assertEqual((stats["served_count"], stats["waiting_count"]), (2, 0))
+
+        res = self.client.patch(
+            "/api/v2/booth/revert/orders/", {"id": drink.id, "target_status": "cooked"}, format="json"
+        )
+        self.assertEqual(res.status_code, 200)
+        stats = self.assertMatchesFullScan()
+        self.assertEqual((stats["served_count"], stats["waiting_count"]), (1, 1))
+
+    def test_cancel(self):
+        order = self.place_order(self.tables[0], food_qty=3)
+        self.place_order(self.tables[1])
+        food = OrderMenu.objects.get(order=order, menu=self.food)
+        seat_fee = OrderMenu.objects.get(order=order, menu=self.seat_fee)
+
+        res = self.client.patch(
+            "/api/v2/booth/orders/cancel/",
+            {"cancel_items": [
+                {"type": "menu", "order_item_ids": [food.id], "quantity": 3},
+                {"type": "menu", "order_item_ids": [seat_fee.id], "quantity": 1},
+            ]},
+            format="json",
+            HTTP_BOOTH_ID=str(self.booth.id),
+        )
+        self.assertEqual(res.status_code, 200)
+
+        stats = self.assertMatchesFullScan()
+        self.assertEqual(stats["visitors"], 1)
+        self.assertEqual(stats["waiting_count"], 3)
+        self.assertEqual(stats["day1_revenue"], 2000 + 17000)
+
+    def test_table_usage(self):
+        self.tables[0].deactivate()
+        stat = BoothStatistic.objects.get(booth=self.booth)
+        self.assertEqual((stat.usage_count, stat.usage_minutes_sum), (1, 30))
+        self.assertEqual(get_statistics(self.booth.id)["avg_table_usage"], 30)
+
+    def test_counter_built_from_existing_orders(self):
+        """카운터 행이 없던 부스는 첫 조회 시 전체 집계로 생성"""
+        self.place_order(self.tables[0])
+        BoothStatistic.objects.filter(booth=self.booth).delete()
+
+        self.assertMatchesFullScan()
+        self.assertTrue(BoothStatistic.objects.filter(booth=self.booth).exists())
+
+    def test_push_sends_encoded_frame(self):
+        self.place_order(self.tables[0])
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"booth_{self.booth.id}_statistics", channel)
+
+        push_statistics(self.booth.id)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(set(message), {"type", "frame"})
+        frame = json.loads(message["frame"])
+        self.assertEqual(frame["type"], "STATISTICS_UPDATED")
+        self.assertEqual(frame["data"], json.loads(json.dumps(get_statistics(self.booth.id))))
+
+    def test_reconcile(self):
+        self.place_order(self.tables[0])
+        self.assertEqual(reconcile_statistics(self.booth.id), {})
+
+        BoothStatistic.objects.filter(booth=self.booth).update(total_orders=10, waiting_count=0)
+        self.assertEqual(
+            reconcile_statistics(self.booth.id),
+            {"total_orders": (10, 1), "waiting_count": (0, 2)},
+        )
+
+        call_command("reconcile_statistics", "--fix", stdout=StringIO())
+        self.assertEqual(reconcile_statistics(self.booth.id), {})
+
+
+class PushStatisticsSchedulerTest(TransactionTestCase):
+
+    def tearDown(self):
+        cancel_pending_pushes()
+
+    def wait_for_pushes(self, expected, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while get_push_metrics()["pushed"] < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @override_settings(STATISTICS_PUSH_WINDOW_MS=50)
+    @mock.patch("statistic.utils.push_statistics")
+    def test_burst_is_coalesced_per_booth(self, push):
+        before = get_push_metrics()
+        for _ in range(20):
+            schedule_push_statistics(1)
+        schedule_push_statistics(2)
+        self.wait_for_pushes(before["pushed"] + 2)
+
+        self.assertEqual(sorted(c.args[0] for c in push.call_args_list), [1, 2])
+        after = get_push_metrics()
+        self.assertEqual(after["requested"] - before["requested"], 21)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 19)
+
+        # 실행이 끝난 뒤의 요청은 다시 예약
+        schedule_push_statistics(1)
+        self.wait_for_pushes(before["pushed"] + 3)
+        self.assertEqual(push.call_count, 3)
+
+    @override_settings(STATISTICS_PUSH_WINDOW_MS=50)
+    @mock.patch("statistic.utils.push_statistics")
+    def test_cancel_pending_pushes(self, push):
+        schedule_push_statistics(1)
+        schedule_push_statistics(2)
+        self.assertEqual(cancel_pending_pushes(), 2)
+        time.sleep(0.15)
+        push.assert_not_called()
+        self.assertEqual(cancel_pending_pushes(), 0)
+
+    @override_settings(STATISTICS_PUSH_WINDOW_MS=0)
+    @mock.patch("statistic.utils.push_statistics")
+    def test_zero_window_pushes_synchronously(self, push):
+        schedule_push_statistics(1)
+        push.assert_called_once_with(1)
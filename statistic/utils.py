@@ -1,4 +1,6 @@
+import logging
 import math
+import threading
 from django.db.models import Sum, F, Avg, DurationField, ExpressionWrapper, Q, Count, FloatField, Value
 from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
@@ -12,9 +14,156 @@ from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from datetime import timedelta, datetime
 from django.conf import settings
+from django.db import connection, transaction
+from project.snapshot_cache import invalidate_snapshot
+from project.ws_frames import with_frame
+from statistic.counters import get_booth_statistic, rebuild_booth_statistic, summarize_recent
+
+logger = logging.getLogger(__name__)
+
+
+def _media_url(request, name):
+    if not name:
+        return None
+    # REST API (request 있는 경우 → 절대경로)
+    if request:
+        return request.build_absolute_uri(f"{settings.MEDIA_URL}{name}")
+    # WS API (request 없는 경우 → 풀 URL 하드코딩으로 함)
+    return f"https://api.test-d-order.store{settings.MEDIA_URL}{name}"
+
+
+def _low_stock(booth, request=None):
+    # --- 품절 임박 메뉴
+    low_stock_qs = (
+        Menu.objects.filter(booth=booth)
+        .exclude(menu_category="seat_fee")
+        .filter(menu_amount__lte=5)   # 남은 수량 그대로 사용
+        .order_by("menu_amount", "menu_name")
+    )
+    return [
+        {
+            "menu_name": m.menu_name,
+            "menu_price": float(m.menu_price),
+            "menu_image": _media_url(request, m.menu_image.name if m.menu_image else None),
+            "remaining": m.menu_amount,   # 운영자가 수정한 수량 그대로 반영
+        }
+        for m in low_stock_qs
+    ]
+
+
+def _event_days(booth):
+    # "2025-09-23" 같은 문자열 → date 객체 (event_dates 기준, 최대 3일)
+    days = []
+    for date_str in (booth.event_dates or [])[:3]:
+        try:
+            days.append(datetime.fromisoformat(date_str).date())
+        except Exception:
+            days.append(None)
+    return days
+
+
+def _save_booth_cache(booth, avg_table_usage, turnover_rate, day_revenues):
+    # 캐시 반영 (값이 바뀐 필드만 저장)
+    values = {
+        "avg_table_usage_cache": avg_table_usage,
+        "turnover_rate_cache": turnover_rate,
+        "day1_revenue_cache": day_revenues[0],
+        "day2_revenue_cache": day_revenues[1],
+        "day3_revenue_cache": day_revenues[2],
+    }
+    changed = [field for field, value in values.items() if getattr(booth, field) != value]
+    for field in changed:
+        setattr(booth, field, values[field])
+    if changed:
+        booth.save(update_fields=changed)
 
 
 def get_statistics(booth_id: int, request=None):
+    """
+    통계 조회 (BoothStatistic 누적 카운터 기반)
+    주문 이력은 다시 집계하지 않고 품절 임박 메뉴 / 테이블 현황만 조회
+    """
+    manager = Manager.objects.select_related("booth").get(booth_id=booth_id)
+    booth = manager.booth
+    now = timezone.now()
+    stat = get_booth_statistic(booth_id)
+    recent = summarize_recent(stat, now)
+
+    # --- 방문자 수 (seat_type 별 계산)
+    if manager.seat_type == "PP":  # 인당 요금
+        visitors, recent_visitors = stat.seat_fee_quantity, recent["seat_fee_quantity"]
+    elif manager.seat_type == "PT":  # 테이블 요금
+        visitors, recent_visitors = len(stat.seat_fee_tables), recent["seat_fee_tables"]
+    else:
+        visitors, recent_visitors = 0, 0
+
+    # --- 평균 대기 시간
+    avg_wait = (
+        round(stat.wait_time_sum / stat.wait_time_count / 60, 1)
+        if stat.wait_time_count else 0
+    )
+
+    # --- TOP3 메뉴
+    top3 = sorted(stat.menu_quantities.items(), key=lambda kv: -kv[1])[:3]
+    menus = Menu.objects.in_bulk([int(menu_id) for menu_id, _ in top3])
+    top3_menus = [
+        {
+            "menu__menu_name": menus[int(menu_id)].menu_name,
+            "menu__menu_price": float(menus[int(menu_id)].menu_price),
+            "menu__menu_image": _media_url(request, menus[int(menu_id)].menu_image.name),
+            "total_quantity": quantity,
+        }
+        for menu_id, quantity in top3
+        if int(menu_id) in menus
+    ]
+
+    # --- 평균 테이블 사용시간 (TableUsage 누적 + 현재 진행 중)
+    tables = list(Table.objects.filter(booth=booth).values_list("activated_at", "deactivated_at"))
+    usage_sum, usage_count = stat.usage_minutes_sum, stat.usage_count
+    for activated_at, deactivated_at in tables:
+        if activated_at and deactivated_at is None:
+            usage_sum += int((now - activated_at).total_seconds() // 60)
+            usage_count += 1
+    avg_table_usage = int(usage_sum / usage_count) if usage_count else 0
+
+    # --- 회전율 (%): 영업시간 ÷ 평균 이용시간 × 테이블 수
+    if stat.first_order_at and avg_table_usage > 0 and tables:
+        business_minutes = (now - stat.first_order_at).total_seconds() // 60
+        turnover_rate = math.floor((business_minutes / avg_table_usage) * len(tables) * 10) / 10
+    else:
+        turnover_rate = 0.0
+
+    # --- 일자별 매출
+    day_revenues = [0, 0, 0]
+    for idx, day in enumerate(_event_days(booth)):
+        if day:
+            day_revenues[idx] = int(stat.day_revenues.get(day.isoformat(), 0))
+
+    _save_booth_cache(booth, avg_table_usage, turnover_rate, day_revenues)
+
+    return {
+        "total_orders": stat.total_orders,
+        "recent_orders": recent["orders"],
+        "visitors": visitors,
+        "recent_visitors": recent_visitors,
+        "avg_wait_time": avg_wait,
+        "served_count": stat.served_count,
+        "waiting_count": stat.waiting_count,
+        "top3_menus": top3_menus,
+        "low_stock": _low_stock(booth, request),
+        "avg_table_usage": avg_table_usage,
+        "turnover_rate": turnover_rate,
+        "seat_type": manager.seat_type,
+        "day1_revenue": day_revenues[0],
+        "day2_revenue": day_revenues[1],
+        "day3_revenue": day_revenues[2],
+    }
+
+
+def get_statistics_full_scan(booth_id: int, request=None):
+    """
+    주문 이력 전체를 다시 집계하는 통계 (카운터 정합성 점검용, 부스 캐시 필드는 갱신하지 않음)
+    """
     manager = Manager.objects.get(booth_id=booth_id)
     booth = manager.booth
     now = timezone.now()
@@ -75,6 +224,8 @@ def get_statistics(booth_id: int, request=None):
             .distinct()
             .count()
         )
+    else:
+        visitors, recent_visitors = 0, 0
 
     # --- 평균 대기 시간 (OrderMenu 단위 created_at → served 시각)
     served_menus = (
@@ -124,54 +275,16 @@ def get_statistics(booth_id: int, request=None):
         .order_by("-total_quantity")[:3]
     )
 
-    # --- TOP3 메뉴
     top3_menus = [
         {
             "menu__menu_name": m["menu__menu_name"],
             "menu__menu_price": float(m["menu__menu_price"]),
-            "menu__menu_image": (
-                # REST API (request 있는 경우 → 절대경로)
-                request.build_absolute_uri(f"{settings.MEDIA_URL}{m['menu__menu_image']}")
-                if request and m.get("menu__menu_image") not in [None, ""]
-                # WS API (request 없는 경우 → 풀 URL 하드코딩으로 함)
-                else (
-                    f"https://api.test-d-order.store{settings.MEDIA_URL}{m['menu__menu_image']}"
-                    if m.get("menu__menu_image") else None
-                )
-            ),
+            "menu__menu_image": _media_url(request, m.get("menu__menu_image")),
             "total_quantity": m["total_quantity"],
         }
         for m in top3
     ]
 
-    # --- 품절 임박 메뉴
-    low_stock_qs = (
-        Menu.objects.filter(booth=booth)
-        .exclude(menu_category="seat_fee")
-        .filter(menu_amount__lte=5)   # 남은 수량 그대로 사용
-        .order_by("menu_amount", "menu_name")
-    )
-
-    low_stock = [
-        {
-            "menu_name": m.menu_name,
-            "menu_price": float(m.menu_price),
-            "menu_image": (
-                # REST API (request 있는 경우 → 절대경로)
-                request.build_absolute_uri(f"{settings.MEDIA_URL}{m.menu_image.name}")
-                if request and m.menu_image
-                # WS API (request 없는 경우 → 풀 URL 하드코딩으로 함)
-                else (
-                    f"https://api.test-d-order.store{settings.MEDIA_URL}{m.menu_image.name}"
-                    if m.menu_image else None
-                )
-            ),
-            "remaining": m.menu_amount,   # 운영자가 수정한 수량 그대로 반영
-        }
-        for m in low_stock_qs
-    ]
-
-
     # --- 평균 테이블 사용시간 (TableUsage + 현재 진행 중)
     table_usages = list(
         TableUsage.objects.filter(booth=booth).values_list("usage_minutes", flat=True)
@@ -192,39 +305,24 @@ def get_statistics(booth_id: int, request=None):
 
     # --- 일자별 매출 (event_dates 기준, 최대 3일)
     day_revenues = [0, 0, 0]
-    if booth.event_dates:
-        for idx, date_str in enumerate(booth.event_dates[:3]):
-            try:
-                # "2025-09-23" 같은 문자열 → date 객체
-                parsed_date = datetime.fromisoformat(date_str).date()
-                start_date = datetime.combine(parsed_date, datetime.min.time())
-                end_date = start_date + timedelta(days=1)
-            except Exception:
-                continue
-
-            revenue = (
-                Order.objects.filter(
-                    table__booth=booth,
-                    created_at__gte=start_date,
-                    created_at__lt=end_date,
-                )
-                .exclude(order_status="cancelled")
-                .aggregate(
-                    total=Coalesce(Sum("order_amount"), Value(0, output_field=FloatField()))
-                )["total"]
+    for idx, day in enumerate(_event_days(booth)):
+        if day is None:
+            continue
+        start_date = datetime.combine(day, datetime.min.time())
+        end_date = start_date + timedelta(days=1)
+
+        revenue = (
+            Order.objects.filter(
+                table__booth=booth,
+                created_at__gte=start_date,
+                created_at__lt=end_date,
             )
-            day_revenues[idx] = int(revenue)
-
-    # 캐시 반영
-    booth.avg_table_usage_cache = avg_table_usage
-    booth.turnover_rate_cache = turnover_rate
-    booth.day1_revenue_cache = day_revenues[0]
-    booth.day2_revenue_cache = day_revenues[1]
-    booth.day3_revenue_cache = day_revenues[2]
-    booth.save(update_fields=[
-        "avg_table_usage_cache", "turnover_rate_cache",
-        "day1_revenue_cache", "day2_revenue_cache", "day3_revenue_cache"
-    ])
+            .exclude(order_status="cancelled")
+            .aggregate(
+                total=Coalesce(Sum("order_amount"), Value(0, output_field=FloatField()))
+            )["total"]
+        )
+        day_revenues[idx] = int(revenue)
 
     return {
         "total_orders": total_orders,
@@ -235,22 +333,129 @@ def get_statistics(booth_id: int, request=None):
         "served_count": served_count,
         "waiting_count": waiting_count,
         "top3_menus": top3_menus,
-        "low_stock": low_stock,
-        "avg_table_usage": booth.avg_table_usage_cache,
-        "turnover_rate": booth.turnover_rate_cache,
+        "low_stock": _low_stock(booth, request),
+        "avg_table_usage": avg_table_usage,
+        "turnover_rate": turnover_rate,
         "seat_type": manager.seat_type,
-        "day1_revenue": booth.day1_revenue_cache,
-        "day2_revenue": booth.day2_revenue_cache,
-        "day3_revenue": booth.day3_revenue_cache,
+        "day1_revenue": day_revenues[0],
+        "day2_revenue": day_revenues[1],
+        "day3_revenue": day_revenues[2],
+    }
+
+
+# 카운터 / 전체 집계 비교 대상 (recent_* 와 사용시간/회전율은 조회 시각에 따라 달라지므로 제외)
+RECONCILE_KEYS = [
+    "total_orders", "visitors", "avg_wait_time", "served_count", "waiting_count",
+    "day1_revenue", "day2_revenue", "day3_revenue",
+]
+
+
+def reconcile_statistics(booth_id: int, fix=False) -> dict:
+    """
+    카운터 기반 통계와 전체 집계 비교
+    불일치 항목 {키: (카운터 값, 전체 집계 값)} 반환, fix=True 면 카운터 재구축
+    """
+    counted = get_statistics(booth_id)
+    scanned = get_statistics_full_scan(booth_id)
+
+    mismatches = {
+        key: (counted[key], scanned[key])
+        for key in RECONCILE_KEYS
+        if counted[key] != scanned[key]
     }
+    # TOP3 는 동률일 때 순서가 달라질 수 있으므로 수량만 비교
+    counted_top = [m["total_quantity"] for m in counted["top3_menus"]]
+    scanned_top = [m["total_quantity"] for m in scanned["top3_menus"]]
+    if counted_top != scanned_top:
+        mismatches["top3_menus"] = (counted_top, scanned_top)
+
+    if mismatches and fix:
+        rebuild_booth_statistic(booth_id)
+    return mismatches
+
 
 def push_statistics(booth_id: int):
     # lazy import → 순환 참조 방지
     from statistic.utils import get_statistics
 
     stats = get_statistics(booth_id)
+    invalidate_snapshot(booth_id, "statistics")
     channel_layer = get_channel_layer()
+    # 화면 수와 상관없이 직렬화는 여기서 한 번 (컨슈머는 frame 을 그대로 전달)
+    message = {"type": "statistics_update", "data": stats}
     async_to_sync(channel_layer.group_send)(
         f"booth_{booth_id}_statistics",
-        {"type": "statistics_update", "data": stats},
-    )
\ No newline at end of file
+        with_frame(message, statistics_frame(message)),
+    )
+
+
+def statistics_frame(event):
+    return {"type": "STATISTICS_UPDATED", "data": event["data"]}
+
+
+# ---------------------------------------------------------------------------
+# 통계 push 스케줄러
+# 부스별로 STATISTICS_PUSH_WINDOW_MS 동안 들어온 요청을 한 번의 계산/전송으로 합침
+# (요청 스레드 / 이벤트 루프가 아닌 타이머 스레드에서 실행)
+# ---------------------------------------------------------------------------
+
+_push_lock = threading.Lock()
+_pending_pushes = {}  # booth_id → threading.Timer
+_push_metrics = {"requested": 0, "coalesced": 0, "pushed": 0, "failed": 0}
+
+
+def get_push_metrics() -> dict:
+    """requested: 요청 수 / coalesced: 대기 중인 push 에 합쳐진 수 / pushed, failed: 실제 실행 결과"""
+    with _push_lock:
+        return dict(_push_metrics)
+
+
+def _run_scheduled_push(booth_id: int):
+    # 실행 직전에 대기 목록에서 빼야 계산 중 들어온 요청이 다음 push 로 예약됨
+    with _push_lock:
+        _pending_pushes.pop(booth_id, None)
+    try:
+        push_statistics(booth_id)
+        result = "pushed"
+    except Exception:
+        logger.exception(f"push_statistics failed for booth {booth_id}")
+        result = "failed"
+    finally:
+        # 타이머 스레드 전용 DB 연결 정리
+        connection.close()
+    with _push_lock:
+        _push_metrics[result] += 1
+
+
+def _schedule(booth_id: int, window: float):
+    with _push_lock:
+        _push_metrics["requested"] += 1
+        if booth_id in _pending_pushes:
+            _push_metrics["coalesced"] += 1
+            return
+        timer = threading.Timer(window, _run_scheduled_push, args=(booth_id,))
+        timer.daemon = True
+        _pending_pushes[booth_id] = timer
+    timer.start()
+
+
+def cancel_pending_pushes() -> int:
+    """대기 중인 통계 push 타이머 취소 (테스트 정리 / 종료 시), 취소한 수 반환"""
+    with _push_lock:
+        timers = list(_pending_pushes.values())
+        _pending_pushes.clear()
+    for timer in timers:
+        timer.cancel()
+    return len(timers)
+
+
+def schedule_push_statistics(booth_id: int):
+    """
+    통계 push 예약 (트랜잭션 안이면 커밋 후 예약)
+    STATISTICS_PUSH_WINDOW_MS 가 0 이면 기존처럼 즉시 동기 실행
+    """
+    window = getattr(settings, "STATISTICS_PUSH_WINDOW_MS", 500) / 1000
+    if window <= 0:
+        push_statistics(booth_id)
+        return
+    transaction.on_commit(lambda: _schedule(booth_id, window))